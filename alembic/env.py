@@ -11,6 +11,8 @@ from src.app.tables import (
     Base,
     Activity,
     Session,
+    SessionActivity,
+    Playtime,
     Member,
     Leadership,
     Role,
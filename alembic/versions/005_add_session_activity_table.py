@@ -0,0 +1,90 @@
+"""add session_activity link table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-02-03 18:12:40.112054
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.app.tables import CustomDateTime, IntegerVariant
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def link_statement() -> sa.Insert:
+    """
+    Links of sessions and activities stored so far, as of this revision.
+    A copy, so later changes of the application leave the migration alone.
+    """
+
+    prescence = sa.table('prescence', sa.column('channel_id'),
+                         sa.column('member_id'), sa.column('begin'),
+                         sa.column('end'))
+    activity = sa.table('activity', sa.column('id'), sa.column('member_id'),
+                        sa.column('begin'), sa.column('end'))
+    member_session = sa.table('member_session', sa.column('channel_id'),
+                              sa.column('member_id'))
+    link = sa.table('session_activity', sa.column('channel_id'),
+                    sa.column('app_id'), sa.column('member_id'),
+                    sa.column('begin'))
+    p, a = prescence.c, activity.c
+
+    overlaps = sa.or_(
+        sa.and_(
+            p.end.isnot(None),
+            a.begin <= p.end,
+            sa.or_(a.begin >= p.begin, a.end.between(p.begin, p.end)),
+        ),
+        sa.and_(p.end.is_(None), a.begin > p.begin),
+    )
+    missing = (
+        sa.select(p.channel_id, a.id, a.member_id, a.begin)
+        .join(activity, a.member_id == p.member_id)
+        .join(member_session, sa.and_(
+            member_session.c.channel_id == p.channel_id,
+            member_session.c.member_id == p.member_id,
+        ))
+        .where(
+            overlaps,
+            ~sa.exists().where(link.c.channel_id == p.channel_id,
+                               link.c.app_id == a.id,
+                               link.c.member_id == a.member_id,
+                               link.c.begin == a.begin),
+        )
+        .distinct()
+    )
+    return sa.insert(link).from_select(
+        ['channel_id', 'app_id', 'member_id', 'begin'], missing
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'session_activity',
+        sa.Column('channel_id', IntegerVariant,
+                  nullable=False),
+        sa.Column('app_id', IntegerVariant, nullable=False),
+        sa.Column('member_id', IntegerVariant,
+                  nullable=False),
+        sa.Column('begin', CustomDateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['channel_id'], ['session.channel_id'], ),
+        sa.ForeignKeyConstraint(
+            ['app_id', 'member_id', 'begin'],
+            ['activity.id', 'activity.member_id', 'activity.begin'],
+        ),
+        sa.PrimaryKeyConstraint('channel_id', 'app_id', 'member_id', 'begin')
+    )
+
+    # backfill links of already stored sessions
+    op.get_bind().execute(link_statement())
+
+
+def downgrade() -> None:
+    op.drop_table('session_activity')
@@ -0,0 +1,35 @@
+"""add member period indexes to activity and prescence
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-02-10 14:27:05.381920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f('ix_activity_member_period'),
+        'activity',
+        ['member_id', 'begin', 'end'],
+        unique=False
+    )
+    op.create_index(
+        op.f('ix_prescence_member_period'),
+        'prescence',
+        ['member_id', 'begin', 'end'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_prescence_member_period'), table_name='prescence')
+    op.drop_index(op.f('ix_activity_member_period'), table_name='activity')
@@ -0,0 +1,53 @@
+"""add playtime rollup table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-02-17 11:40:13.902718
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.app.tables import CustomDateTime, IntegerVariant
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    playtime = op.create_table(
+        'playtime',
+        sa.Column('member_id', IntegerVariant, nullable=False),
+        sa.Column('app_id', IntegerVariant, nullable=False),
+        sa.Column('seconds', IntegerVariant, nullable=False),
+        sa.ForeignKeyConstraint(['member_id'], ['member.id'], ),
+        sa.PrimaryKeyConstraint('member_id', 'app_id')
+    )
+
+    # backfill from already closed activities
+    activity = sa.table('activity', sa.column('id'), sa.column('member_id'),
+                        sa.column('begin', CustomDateTime()),
+                        sa.column('end', CustomDateTime()))
+    closed = op.get_bind().execute(
+        sa.select(activity.c.member_id, activity.c.id,
+                  activity.c.begin, activity.c.end)
+        .where(activity.c.end.isnot(None))
+    )
+
+    totals = defaultdict(int)
+    for member_id, app_id, begin, end in closed:
+        totals[member_id, app_id] += int((end - begin).total_seconds())
+
+    op.bulk_insert(playtime, [
+        {'member_id': member_id, 'app_id': app_id, 'seconds': seconds}
+        for (member_id, app_id), seconds in totals.items()
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('playtime')
@@ -0,0 +1,35 @@
+"""add stored seconds column to activity
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-02-24 16:05:48.219364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.app.tables import IntegerVariant, SecondsBetween
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # sqlite adds stored generated columns only by recreating the table
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('seconds', IntegerVariant,
+                      sa.Computed(SecondsBetween(sa.column('begin'),
+                                                 sa.column('end')),
+                                  persisted=True),
+                      nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.drop_column('seconds')
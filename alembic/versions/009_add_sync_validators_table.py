@@ -0,0 +1,35 @@
+"""add sync validators table
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-03-02 12:21:37.518402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_validators',
+        sa.Column('url',
+                  sa.Text().with_variant(
+                      mysql.VARCHAR(length=512, charset='utf8'), 'mysql'
+                  ),
+                  nullable=False),
+        sa.Column('etag', sa.Text(), nullable=True),
+        sa.Column('last_modified', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('url')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_validators')
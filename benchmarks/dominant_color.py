@@ -0,0 +1,107 @@
+"""
+Dominant colour of a corpus of icons, by adaptive palette quantization of
+Pillow one icon at a time and by NumPy k-means over all icons at once.
+Icons are read from a directory, e.g. the icon cache of the bot, or drawn
+synthetically. Mean distance between colours of both methods is printed
+to tell how far they agree.
+
+Run from the repository root:
+    ENV_PATH=./envs/test.env python -m benchmarks.dominant_color -n 500
+    ENV_PATH=./envs/test.env python -m benchmarks.dominant_color -d ./icons
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from src.bot.icons import dominant_colors, np, palette_dominant_color
+
+SIZE = 256
+
+
+def synthetic(count: int, seed: int = 1) -> list[Image.Image]:
+    rng = random.Random(seed)
+
+    def color() -> tuple:
+        return tuple(rng.randrange(256) for _ in range(3)) + (255,)
+
+    icons = []
+    for _ in range(count):
+        img = Image.new('RGBA', (SIZE, SIZE), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse((8, 8, SIZE - 8, SIZE - 8), fill=color())
+        for _ in range(rng.randrange(2, 8)):
+            x, y = rng.randrange(SIZE), rng.randrange(SIZE)
+            r = rng.randrange(8, SIZE // 3)
+            draw.rectangle((x - r, y - r, x + r, y + r), fill=color())
+        icons.append(img)
+    return icons
+
+
+def from_directory(directory: str) -> list[Image.Image]:
+    icons = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.png'):
+            with Image.open(os.path.join(directory, name)) as img:
+                icons.append(img.convert('RGBA'))
+    return icons
+
+
+def measure(label: str, fn, repeat: int) -> tuple[list, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        colors = fn()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f'{label:<24} best {best * 1e3:10.1f} ms')
+    return colors, best
+
+
+def distance(a: tuple | None, b: tuple | None) -> float | None:
+    if a is None or b is None:
+        return None
+    return math.dist(a, b)
+
+
+def main(icons: list[Image.Image], batch: int, repeat: int) -> None:
+    print(f'{len(icons)} icons, batches of {batch}')
+
+    palette, palette_time = measure(
+        'pillow palette', lambda: [palette_dominant_color(img)
+                                   for img in icons], repeat)
+    single, single_time = measure(
+        'numpy k-means, 1 icon', lambda: [dominant_colors([img])[0]
+                                          for img in icons], repeat)
+    batched, batched_time = measure(
+        f'numpy k-means, {batch} icons',
+        lambda: [color for i in range(0, len(icons), batch)
+                 for color in dominant_colors(icons[i:i + batch])], repeat)
+
+    assert single == batched
+    distances = [d for d in map(distance, palette, batched) if d is not None]
+    print(f'speedup x{palette_time / single_time:.2f} one by one, '
+          f'x{palette_time / batched_time:.2f} batched')
+    if distances:
+        print(f'distance to palette colour: mean '
+              f'{statistics.mean(distances):.1f}, '
+              f'median {statistics.median(distances):.1f} (of 441)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--directory', help='directory of PNG icons')
+    parser.add_argument('-n', '--icons', type=int, default=200,
+                        help='synthetic icons, without --directory')
+    parser.add_argument('-b', '--batch', type=int, default=50)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if np is None:
+        parser.exit(1, 'NumPy is required to compare both methods\n')
+    main(from_directory(args.directory) if args.directory
+         else synthetic(args.icons), args.batch, args.repeat)
@@ -0,0 +1,144 @@
+"""
+Latency of activity/prescence overlap queries on synthetic data, without
+the (member_id, begin, end) indexes of migration 006 and with them. Query
+plans of both runs are printed, so seeks can be told from scans.
+
+Run from the repository root, 10^5 rows by default:
+    ENV_PATH=./envs/test.env python -m benchmarks.overlap_query -r 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Engine, create_engine, insert, select, text
+
+from src.app.links import overlapping, overlaps
+from src.app.tables import Activity, Base, Prescence
+
+PERIOD_INDEXES = {'ix_activity_member_period': Activity,
+                  'ix_prescence_member_period': Prescence}
+EPOCH = datetime(2020, 1, 1)
+CHUNK = 50_000
+
+
+def periods(count: int, members: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        begin = EPOCH + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        end = begin + timedelta(seconds=rng.randrange(60, 4 * 3600))
+        yield rng.randrange(members), begin, end
+
+
+def fill(engine: Engine, rows: int, members: int) -> None:
+    Base.metadata.create_all(engine, tables=[Activity.__table__,
+                                             Prescence.__table__])
+    prescences = max(rows // 10, 1)
+
+    with engine.begin() as connection:
+        chunk = []
+        for app_id, (member_id, begin, end) in enumerate(
+                periods(rows, members, seed=1)):
+            chunk.append({'id': app_id % 500, 'member_id': member_id,
+                          'begin': begin, 'end': end})
+            if len(chunk) == CHUNK:
+                connection.execute(insert(Activity), chunk)
+                chunk.clear()
+        if chunk:
+            connection.execute(insert(Activity), chunk)
+
+        connection.execute(insert(Prescence), [
+            {'channel_id': i, 'member_id': member_id,
+             'begin': begin, 'end': end}
+            for i, (member_id, begin, end) in enumerate(
+                periods(prescences, members, seed=2))
+        ])
+        connection.execute(text('ANALYZE'))
+
+
+def queries(member_id: int, begin: datetime) -> dict:
+    return {
+        'member period': select(Activity).where(
+            Activity.member_id == member_id,
+            overlapping(Activity, begin, begin + timedelta(hours=12))
+        ),
+        'prescence join': select(Activity.id, Prescence.channel_id).join(
+            Prescence, Prescence.member_id == Activity.member_id
+        ).where(Prescence.member_id == member_id, overlaps()),
+    }
+
+
+def plan(engine: Engine, query) -> str:
+    compiled = query.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as connection:
+        rows = connection.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))
+        return '; '.join(row[-1] for row in rows)
+
+
+def measure(engine: Engine, members: int, iterations: int) -> dict:
+    rng = random.Random(3)
+    timings = {}
+    with engine.connect() as connection:
+        for _ in range(iterations):
+            member_id = rng.randrange(members)
+            begin = EPOCH + timedelta(days=rng.randrange(365))
+            for name, query in queries(member_id, begin).items():
+                start = time.perf_counter()
+                connection.execute(query).fetchall()
+                timings.setdefault(name, []).append(
+                    time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, engine: Engine, timings: dict) -> None:
+    print(f'-- {label}')
+    for name, query in queries(0, EPOCH).items():
+        timings_us = sorted(t * 1e6 for t in timings[name])
+        p95 = timings_us[int(len(timings_us) * 0.95) - 1]
+        print(f'{name:<15} mean {statistics.mean(timings_us):10.1f} us  '
+              f'p95 {p95:10.1f} us')
+        print(f'{"":<15} plan: {plan(engine, query)}')
+
+
+def main(rows: int, members: int, iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f'sqlite:///{os.path.join(directory, "overlap.sqlite3")}'
+        )
+        fill(engine, rows, members)
+
+        with engine.begin() as connection:
+            for index in PERIOD_INDEXES:
+                connection.execute(text(f'DROP INDEX {index}'))
+            connection.execute(text('ANALYZE'))
+        before = measure(engine, members, iterations)
+        report('member_id indexes only', engine, before)
+
+        with engine.begin() as connection:
+            for index, table in PERIOD_INDEXES.items():
+                connection.execute(text(
+                    f'CREATE INDEX {index} ON {table.__tablename__} '
+                    f'(member_id, "begin", "end")'
+                ))
+            connection.execute(text('ANALYZE'))
+        after = measure(engine, members, iterations)
+        report('(member_id, begin, end) indexes', engine, after)
+
+        engine.dispose()
+
+    for name in before:
+        speedup = statistics.mean(before[name]) / statistics.mean(after[name])
+        print(f'{name}: speedup x{speedup:.2f} over {rows} activities')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--rows', type=int, default=100_000)
+    parser.add_argument('-m', '--members', type=int, default=1_000)
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    main(args.rows, args.members, args.iterations)
@@ -0,0 +1,63 @@
+"""
+Per-call latency of bot-to-API requests: a fresh ASGI client per call
+(previous behaviour of `src.utils.request`) against the shared client.
+
+Run from the repository root:
+    ENV_PATH=./envs/test.env python -m benchmarks.request_client
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient
+
+from src.config import Config
+from src.utils import api_client, request
+
+
+async def per_call_client(url: str) -> dict:
+    from src.app.main import app
+
+    async with AsyncClient(app=app, base_url=Config.base_uri) as client:
+        response = await client.request('get', url)
+    return response.json()
+
+
+async def measure(fn, url: str, iterations: int) -> list[float]:
+    await fn(url)  # warm up imports, routes and db connection
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn(url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings_us = sorted(t * 1e6 for t in timings)
+    p95 = timings_us[int(len(timings_us) * 0.95) - 1]
+    print(f'{name:<18} mean {statistics.mean(timings_us):9.1f} us  '
+          f'median {statistics.median(timings_us):9.1f} us  '
+          f'p95 {p95:9.1f} us')
+
+
+async def main(iterations: int, url: str) -> None:
+    before = await measure(per_call_client, url, iterations)
+    after = await measure(request, url, iterations)
+    await api_client.close()
+
+    report('client per call', before)
+    report('shared client', after)
+    speedup = statistics.mean(before) / statistics.mean(after)
+    print(f'speedup x{speedup:.2f} over {iterations} calls of GET /{url}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', type=int, default=2_000)
+    parser.add_argument('--url', default='guild')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations, args.url))
@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Hashable, Iterable, Optional
+
+from src.utils import WriteOperation
+
+
+def agrees(values: dict, filters: dict) -> bool:
+    """ No column present in both has different values. """
+    return all(
+        values[k] == v or str(values[k]) == str(v)
+        for k, v in filters.items() if k in values
+    )
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    table: str
+    spec: dict
+    row: Optional[dict]  # columns of looked up row, None when not found
+    tables: frozenset[str]  # every table value was built from
+    expires_at: float
+
+    def touched_by(self, operation: WriteOperation) -> bool:
+        """ Write to own table may change the looked up row. """
+
+        if operation.kind == 'insert':
+            return agrees(operation.values, self.spec)
+
+        moves_in = (operation.values.keys() & self.spec.keys()
+                    and agrees(operation.values, self.spec))
+        hits_row = self.row is not None and agrees(self.row, operation.filters)
+        return bool(moves_in or hits_row)
+
+
+class ReadCache:
+    """
+    TTL and LRU bounded cache of single row lookups. Entries are dropped when
+    a write touches the looked up row, or on any write to other tables
+    they were built from. Values loaded while one of their tables was
+    written to are not stored, so a slow read can't bring stale data back.
+    """
+
+    def __init__(self, ttl: float = 30, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size  # zero disables caching
+
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._versions: defaultdict[str, int] = defaultdict(int)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def lookup(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            del self._entries[key]
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return True, entry.value
+
+    def versions(self, tables: Iterable[str]) -> dict[str, int]:
+        return {table: self._versions[table] for table in tables}
+
+    def store(self,
+              key: Hashable,
+              value: Any,
+              table: str,
+              spec: dict,
+              row: Optional[dict],
+              versions: dict[str, int]) -> None:
+        """ Keep value unless its tables were written to since `versions`. """
+
+        if not self.enabled or versions != self.versions(versions):
+            return
+
+        self._entries[key] = CacheEntry(
+            value=value, table=table, spec=spec, row=row,
+            tables=frozenset(versions),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self,
+                   table: str,
+                   operation: Optional[WriteOperation] = None) -> None:
+        """ Forget entries a write to table may have changed. """
+
+        self._versions[table] += 1
+        stale = [
+            key for key, entry in self._entries.items()
+            if table in entry.tables and (
+                    operation is None or entry.table != table
+                    or entry.touched_by(operation)
+            )
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.,
+            'invalidations': self.invalidations,
+        }
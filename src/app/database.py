@@ -1,3 +1,8 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
 from src.app.tables import SessionFabric
 from src.config import Config
 
@@ -5,9 +10,34 @@ from src.config import Config
 
 get_session_local = SessionFabric.build(
     db_uri=Config.local_db_uri,
-    connect_args={"check_same_thread": False, "timeout": 120}
+    pool=Config.local_pool,
+    sqlite=Config.local_sqlite,
+    name='local',
 )
 
 get_session_remote = SessionFabric.build(
     db_uri=Config.remote_db_uri,
+    pool=Config.remote_pool,
+    sqlite=Config.remote_sqlite,
+    name='remote',
 )
+
+
+def replica_providers() -> tuple[async_sessionmaker, ...]:
+    """ Replica session makers, a session is opened only to write to it. """
+
+    return SessionFabric.fabrics['remote'].session_maker,
+
+
+@asynccontextmanager
+async def open_sessions() -> AsyncIterator[tuple]:
+    """ Same sessions `db_sessions` provides, for calls outside of FastAPI. """
+
+    async with SessionFabric.fabrics['local'].session_maker() as main_session:
+        yield main_session, *replica_providers()
+
+
+async def close_writers() -> None:
+    for fabric in SessionFabric.fabrics.values():
+        if fabric.writer is not None:
+            await fabric.writer.close()
@@ -1,26 +1,230 @@
-from asyncio import Queue as AsyncQueue, sleep, gather
-from typing import TYPE_CHECKING
+import time
+from asyncio import Queue as AsyncQueue, Event, gather, wait_for
+from contextlib import suppress
+from dataclasses import replace
+from enum import Enum
+from itertools import groupby
+from typing import TYPE_CHECKING, Any, Hashable, Iterable, Optional
 
-from fastapi import HTTPException
+from sqlalchemy import Insert, Table, delete, insert, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.tables import Base, SessionFabric
 from src.constants import constants
-from src.utils import logger
+from src.utils import CoroItem, WriteCall, WriteOperation, logger
 
 if TYPE_CHECKING:
     from asyncio import AbstractEventLoop
-    from src.utils import CoroItem
+    from sqlalchemy import Executable
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from src.app.journal import Descriptor, ReplicaJournal
+
+
+def coalesce(operations: Iterable['WriteOperation']) -> list['WriteOperation']:
+    """
+    Fold updates into earlier queued writes of the same rows: an update
+    matching a queued insert becomes part of that insert, an update with
+    the same filters as a queued update is merged into it. Deletes are
+    never merged, nor are updates merged across them. Given operations
+    are left untouched.
+    """
+
+    result: list['WriteOperation'] = []
+    for operation in operations:
+        operation = replace(operation, values=dict(operation.values))
+        if operation.kind != 'update':
+            result.append(operation)
+            continue
+
+        for queued in reversed(result):
+            if queued.table != operation.table:
+                continue
+            if queued.kind == 'delete':
+                if not queued.is_disjoint(operation):
+                    result.append(operation)
+                    break
+            elif queued.kind == 'insert':
+                if queued.matches(operation.filters):
+                    queued.values.update(operation.values)
+                    break
+            elif queued.filters == operation.filters:
+                queued.values.update(operation.values)
+                break
+            elif not queued.is_disjoint(operation):
+                result.append(operation)
+                break
+        else:
+            result.append(operation)
+
+    return result
+
+
+def insert_ignoring_duplicates(table: Table, dialect: str) -> Insert:
+    """
+    Insert skipping rows whose key is already stored. Unlike `INSERT
+    IGNORE`, violated NOT NULL or foreign key constraints still raise.
+    """
+
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'mysql':
+        return mysql.insert(table).on_duplicate_key_update(
+            {column.name: column for column in table.primary_key.columns}
+        )
+    return insert(table)
+
+
+def build_statements(
+        operations: Iterable['WriteOperation'],
+        dialect: str
+) -> list[tuple['Executable', list[dict] | None]]:
+    """
+    Statements with their parameters for database of `dialect`. Each run
+    of inserts is issued as multi-row inserts per table, in foreign key
+    dependency order.
+    """
+
+    table_order = {t.name: i for i, t in enumerate(Base.metadata.sorted_tables)}
+    statements = []
+
+    def insert_key(o: 'WriteOperation') -> tuple:
+        return table_order[o.table], tuple(sorted(o.values))
+
+    for is_insert, run in groupby(operations, lambda o: o.kind == 'insert'):
+        if not is_insert:
+            for operation in run:
+                table = Base.metadata.tables[operation.table]
+                if operation.kind == 'delete':
+                    statement = delete(table).filter_by(**operation.filters)
+                else:
+                    statement = (update(table)
+                                 .filter_by(**operation.filters)
+                                 .values(**operation.values))
+                statements.append((statement, None))
+            continue
+
+        for _, inserts in groupby(sorted(run, key=insert_key), insert_key):
+            inserts = list(inserts)
+            table = Base.metadata.tables[inserts[0].table]
+            statements.append((insert_ignoring_duplicates(table, dialect),
+                               [o.values for o in inserts]))
+
+    return statements
+
+
+async def apply_operations(bind: 'AsyncEngine',
+                           operations: Iterable['WriteOperation']) -> int:
+    """ Apply writes in one transaction, return amount of statements. """
+
+    statements = build_statements(coalesce(operations), bind.dialect.name)
+    async with AsyncSession(bind) as session, session.begin():
+        for statement, params in statements:
+            await session.execute(statement, params)
+    return len(statements)
+
+
+async def replay_operation(backend: str, operation: 'WriteOperation') -> None:
+    await apply_operations(SessionFabric.fabrics[backend].engine, [operation])
+
+
+async def replay_call(backend: str, call: WriteCall) -> Any:
+    engine = SessionFabric.fabrics[backend].engine
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        return await call.resolve()(session=session)
+
+
+def is_unavailable(e: Exception) -> bool:
+    """ Whether failure is about unreachable database, not about the write. """
+
+    if isinstance(e, DBAPIError):
+        return (e.connection_invalidated
+                or isinstance(e, (OperationalError, InterfaceError)))
+    return isinstance(e, (OSError, TimeoutError))
+
+
+def item_bind(item: 'CoroItem') -> 'AsyncEngine':
+    if 'backend' in item.coro_kwargs:
+        return SessionFabric.fabrics[item.coro_kwargs['backend']].engine
+    return item.coro_kwargs['session'].bind
+
+
+class BreakerState(Enum):
+    CLOSED = 'closed'  # writes go through
+    OPEN = 'open'  # backend is down, writes wait
+    HALF_OPEN = 'half_open'  # single probe write is in flight
+
+
+class CircuitBreaker:
+    """
+    Health of one replica backend. After `threshold` consecutive connection
+    failures writes to it stop, then one probe write is let through every
+    `probe_seconds` until it succeeds.
+    """
+
+    def __init__(self, threshold: int = 5, probe_seconds: float = 30):
+        self.threshold = threshold
+        self.probe_seconds = probe_seconds
+
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.
+
+    def allows(self) -> bool:
+        if (self.state is BreakerState.OPEN
+                and time.time() - self.opened_at >= self.probe_seconds):
+            self.state = BreakerState.HALF_OPEN
+            return True
+        return self.state is BreakerState.CLOSED
+
+    def succeeded(self) -> None:
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+
+    def failed(self) -> None:
+        self.failures += 1
+        if (self.state is BreakerState.HALF_OPEN
+                or self.failures >= self.threshold):
+            self.state = BreakerState.OPEN
+            self.opened_at = time.time()
+
+    def stats(self) -> dict:
+        return {'state': self.state.value, 'failures': self.failures}
 
 
 class DeferredTasksProcessor:
     repeat_attempts = 5
     _event_loop = None
 
-    def __init__(self, sleep_seconds: int = 30):
+    def __init__(self,
+                 sleep_seconds: int = 30,
+                 batch_size: int = 0,
+                 wakeup_size: int = 100,
+                 journal: Optional['ReplicaJournal'] = None,
+                 backoff_base: float = 1,
+                 backoff_cap: float = 300,
+                 breaker_threshold: int = 5,
+                 breaker_probe_seconds: float = 30):
 
         self._unordered_items: AsyncQueue['CoroItem'] = AsyncQueue()
         self._ordered_items: AsyncQueue['CoroItem'] = AsyncQueue()
+        self._wakeup = Event()
+        self._started = False
+        self._breakers: dict[Hashable, CircuitBreaker] = {}
 
         self.sleep_seconds = sleep_seconds
+        self.batch_size = batch_size  # zero disables batching drain
+        self.wakeup_size = wakeup_size
+        # with journal queued writes are kept as data and survive restarts
+        self.journal = journal
+
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker_threshold = breaker_threshold
+        self.breaker_probe_seconds = breaker_probe_seconds
 
     @property
     def event_loop(self):
@@ -31,65 +235,333 @@ class DeferredTasksProcessor:
         self._event_loop = loop
         self._ordered_items = AsyncQueue()
 
+    @staticmethod
+    def _descriptor(backend: str,
+                    descriptor: 'Descriptor',
+                    meta_kw: dict) -> 'CoroItem':
+        """ Item that keeps only serializable write, no session or orm. """
+
+        if isinstance(descriptor, WriteCall):
+            return CoroItem(coro_fabric=replay_call,
+                            coro_kwargs=dict(backend=backend, call=descriptor),
+                            meta_kw=meta_kw)
+        return CoroItem(coro_fabric=replay_operation,
+                        coro_kwargs=dict(backend=backend,
+                                         operation=descriptor),
+                        meta_kw=meta_kw,
+                        operation=descriptor)
+
+    @staticmethod
+    def _backend(item: 'CoroItem') -> Optional[Hashable]:
+        """ Database the item writes to, None for arbitrary coroutines. """
+
+        if 'backend' in item.coro_kwargs:
+            return item.coro_kwargs['backend']
+        session = item.coro_kwargs.get('session')
+        if session is None or session.bind is None:
+            return None
+        return SessionFabric.name_of(session.bind) or session.bind
+
+    def _breaker(self, backend: Hashable) -> CircuitBreaker:
+        if backend not in self._breakers:
+            self._breakers[backend] = CircuitBreaker(
+                threshold=self.breaker_threshold,
+                probe_seconds=self.breaker_probe_seconds
+            )
+        return self._breakers[backend]
+
+    async def _journaled(self,
+                         coro_item: 'CoroItem',
+                         is_ordered: bool) -> 'CoroItem':
+        """
+        Append write of item to journal and return item applying the
+        journaled descriptor, which holds neither session nor closure. The
+        write is described by its `operation`, or as `WriteCall` when made
+        by `partial` of module function. Anything else, such as ad hoc
+        closures or arguments journal can't encode, is queued as it is and
+        doesn't survive a restart.
+        """
+
+        if self.journal is None or 'journal_id' in coro_item.meta_kw:
+            return coro_item
+
+        descriptor = coro_item.operation or WriteCall.of(coro_item.coro_fabric)
+        backend = SessionFabric.name_of(item_bind(coro_item))
+        if descriptor is None or backend is None:
+            logger.warning(constants.log_journal_skipped(
+                fabric=coro_item.coro_fabric
+            ))
+            return coro_item
+
+        try:
+            journal_id = await self.journal.append(
+                backend, descriptor, is_ordered, coro_item.meta_kw
+            )
+        except TypeError as e:
+            logger.warning(constants.log_journal_skipped(fabric=e))
+            return coro_item
+
+        if isinstance(session := coro_item.coro_kwargs.get('session'),
+                      AsyncSession):
+            await session.close()  # descriptor opens its own
+        meta_kw = {**coro_item.meta_kw, 'journal_id': journal_id}
+        return self._descriptor(backend, descriptor, meta_kw)
+
+    async def _settle(self, *items: 'CoroItem') -> None:
+        """ Acknowledge journaled items that are applied or given up. """
+
+        if self.journal is not None:
+            await self.journal.ack(*(item.meta_kw['journal_id'] for item in items
+                                     if 'journal_id' in item.meta_kw))
+
     async def add(self,
                   coro_item: 'CoroItem',
                   is_ordered: bool = True) -> None:
         """ Add item to deferred tasks execution container. """
 
+        coro_item = await self._journaled(coro_item, is_ordered)
+
         if is_ordered:
             await self._ordered_items.put(coro_item)
         else:
             await self._unordered_items.put(coro_item)
 
-    async def _run_unordered(self) -> None:
-        unordered = [] #self._unordered_items.copy()
-        while not self._unordered_items.empty():
-            unordered.append(await self._unordered_items.get())
+        queued = self._ordered_items.qsize() + self._unordered_items.qsize()
+        if queued >= self.wakeup_size:
+            self._wakeup.set()
+
+    async def _replay(self, loop: 'AbstractEventLoop') -> None:
+        """
+        Queue writes left unacknowledged by previous run. Delivery is at
+        least once, which is fine as journaled inserts ignore existing rows
+        and updates are idempotent.
+        """
+
+        # queues are reset before reading the journal, items added while it
+        # is read are kept and go after the replayed ones
+        self.event_loop = loop
+        pending = [row async for row in self.journal.pending()]
+        queued = {item.meta_kw.get('journal_id')
+                  for queue in (self._ordered_items, self._unordered_items)
+                  for item in queue._queue}  # noqa
+
+        ordered, unordered = [], []
+        for journal_id, backend, descriptor, is_ordered, meta_kw in pending:
+            if backend not in SessionFabric.fabrics or journal_id in queued:
+                continue
+            item = self._descriptor(backend,
+                                    descriptor,
+                                    {**meta_kw, 'journal_id': journal_id})
+            (ordered if is_ordered else unordered).append(item)
+
+        self._restore(self._ordered_items, ordered)
+        self._restore(self._unordered_items, unordered)
+        replayed = len(ordered) + len(unordered)
+        logger.info(constants.log_journal_replayed(num=replayed))
+
+    @staticmethod
+    def _take(queue: AsyncQueue) -> list['CoroItem']:
+        items = []
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+    def _restore(self, queue: AsyncQueue, postponed: list['CoroItem']):
+        """ Put postponed items back ahead of ones queued meanwhile. """
+
+        for item in (*postponed, *self._take(queue)):
+            queue.put_nowait(item)
+
+    def _runnable(self, item: 'CoroItem', blocked: set) -> bool:
+        """
+        Whether item may run now. Items of the same database queued after
+        a postponed one are postponed too, so ordering is kept.
+        """
+
+        backend = self._backend(item)
+        if backend in blocked:
+            return False
+        if item.is_due and (backend is None or self._breaker(backend).allows()):
+            return True
+        if backend is not None:
+            blocked.add(backend)
+        return False
+
+    def _postponed(self, item: 'CoroItem') -> 'CoroItem':
+        delay = item.backoff(self.backoff_base, self.backoff_cap)
+        logger.debug(constants.log_deferred_postponed(delay=round(delay, 2)))
+        return item
+
+    async def _failed(self, item: 'CoroItem', e: Exception) -> bool:
+        """ Record failure of item, return whether it has to be retried. """
+
+        logger.debug(getattr(e, 'detail', e))
+        backend = self._backend(item)
+        if backend is not None and is_unavailable(e):
+            # nothing wrong with the write itself, it waits for database
+            self._breaker(backend).failed()
+        else:
+            if backend is not None:  # database responded, it is alive
+                self._breaker(backend).succeeded()
+            item.decr()
+            if not item.is_active:
+                await self._settle(item)
+                return False
+
+        self._postponed(item)
+        return True
+
+    async def _attempt(self, item: 'CoroItem') -> bool:
+        """ Run item once, return whether it has to be retried. """
+
         try:
-            logger.debug(constants.log_unordered_tasks(num=len(unordered)))
-            [item.decr() for item in unordered]
-            coroutines = [item.build_coro() for item in unordered]
-            results = await gather(*coroutines, return_exceptions=True)
+            await item.build_coro()
         except Exception as e:  # noqa
-            # If task will not have time to complete, and some coroutine
-            # raises exception this task also raise asyncio.CancelledError
-            # TODO: potentially it can create loop when all items wait for only
-            #  one that raises exception too fast for some reason. Maybe need
-            #  to create additional "chill-container"
-            for r, item in zip(results, unordered):  # noqa
-                if isinstance(r, Exception) and item.is_active:
-                    await self.add(coro_item=item, is_ordered=False)
+            return await self._failed(item, e)
+        finally:
+            # give replica connection back to pool between attempts
+            if isinstance(session := item.coro_kwargs.get('session'),
+                          AsyncSession):
+                await session.close()
+
+        if (backend := self._backend(item)) is not None:
+            self._breaker(backend).succeeded()
+        await self._settle(item)
+        return False
+
+    async def _run_unordered(self) -> None:
+        runnable, postponed = [], []
+        for item in self._take(self._unordered_items):
+            (runnable if self._runnable(item, set()) else postponed).append(item)
+
+        if runnable:
+            logger.debug(constants.log_unordered_tasks(num=len(runnable)))
+            retry = await gather(*map(self._attempt, runnable))
+            postponed += [item for item, r in zip(runnable, retry) if r]
             logger.debug(
                 constants.log_unordered_tasks_complete(
-                    num=len(unordered) - len(self._unordered_items)
+                    num=len(runnable) - sum(retry)
                 )
             )
 
+        self._restore(self._unordered_items, postponed)
+
     async def _run_ordered(self) -> None:
-        while not self._ordered_items.empty():
-            logger.debug(f'Current tasks num: {self._ordered_items.qsize()}')
-
-            coro_item = await self._ordered_items.get()
-            coro = coro_item.build_coro()
-            try:
-                coro_item.decr()
-                logger.debug(f"Execute coro: {coro}")
-                resp = await coro
-                logger.debug(f"Response: {resp}")
-            except HTTPException as e:
-                logger.debug(e.detail)
-                if coro_item.is_active:
-                    await self.add(coro_item)
+        postponed, blocked = [], set()
+        for item in self._take(self._ordered_items):
+            if self._runnable(item, blocked) and not await self._attempt(item):
                 continue
-            except Exception as e:
-                logger.debug(e)
-                if coro_item.is_active:
-                    await self.add(coro_item)
+            if (backend := self._backend(item)) is not None:
+                blocked.add(backend)
+            postponed.append(item)
+
+        self._restore(self._ordered_items, postponed)
+
+    async def _run_batched(self) -> None:
+        # consecutive writes described as data to the same database share
+        # one transaction, anything else runs on its own
+        postponed, blocked = [], set()
+        group: list['CoroItem'] = []
+
+        async def flush():
+            if group:
+                retry = await self._execute_group(group)
+                if retry:
+                    postponed.extend(retry)
+                    if (backend := self._backend(group[0])) is not None:
+                        blocked.add(backend)
+                group.clear()
+
+        for item in self._take(self._ordered_items):
+            backend = self._backend(item)
+            if group and (item.operation is None
+                          or len(group) >= self.batch_size
+                          or backend != self._backend(group[0])):
+                await flush()
+            if not self._runnable(item, blocked):
+                await flush()  # earlier writes of this group go first
+                postponed.append(item)
                 continue
 
+            group.append(item)
+            if item.operation is None:
+                await flush()
+        await flush()
+
+        self._restore(self._ordered_items, postponed)
+
+    async def _execute_group(self,
+                             items: list['CoroItem']) -> list['CoroItem']:
+        """ Run group of items, return ones to retry. """
+
+        if items[0].operation is None:
+            return items if await self._attempt(items[0]) else []
+
+        logger.debug(constants.log_deferred_batch(num=len(items)))
+        backend = self._backend(items[0])
+        try:
+            statements = await apply_operations(
+                item_bind(items[0]), [item.operation for item in items]
+            )
+        except Exception as e:  # noqa
+            logger.debug(constants.log_deferred_batch_failed(error=str(e)))
+            if is_unavailable(e):
+                self._breaker(backend).failed()
+                return [self._postponed(item) for item in items]
+
+            # isolate failing writes, each retried in its own transaction
+            for i, item in enumerate(items):
+                if await self._attempt(item):
+                    return items[i:]
+            return []
+
+        logger.debug(
+            constants.log_deferred_coalesced(num=len(items),
+                                             statements=statements)
+        )
+        self._breaker(backend).succeeded()
+        await self._settle(*items)
+        return []
+
+    def stats(self) -> dict:
+        """ Queue depth, age of the oldest queued item and backends health. """
+
+        queued = [*self._ordered_items._queue,  # noqa
+                  *self._unordered_items._queue]  # noqa
+        oldest = min((item.meta_kw['queued_at'] for item in queued),
+                     default=None)
+        return {
+            'ordered': self._ordered_items.qsize(),
+            'unordered': self._unordered_items.qsize(),
+            'oldest_age': 0 if oldest is None else time.time() - oldest,
+            'backends': {str(backend): breaker.stats()
+                         for backend, breaker in self._breakers.items()},
+        }
+
+    async def close(self) -> None:
+        if self.journal is not None:
+            await self.journal.close()
+
     async def start(self, loop: 'AbstractEventLoop') -> None:
-        self.event_loop = loop
+        if self._started:  # on_ready fires again after every reconnect
+            return
+        self._started = True
+
+        if self.journal is not None:
+            await self._replay(loop)
+        else:
+            self.event_loop = loop
 
         while True:
-            await self._run_ordered()
-            await sleep(self.sleep_seconds)
+            if self.batch_size:
+                await self._run_batched()
+            else:
+                await self._run_ordered()
+            await self._run_unordered()
+
+            if self.journal is not None:
+                await self.journal.compact()
+
+            self._wakeup.clear()
+            with suppress(TimeoutError):
+                await wait_for(self._wakeup.wait(), self.sleep_seconds)
@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 
 from fastapi import Depends
 
-from src.app.database import get_session_local, get_session_remote
+from src.app.database import get_session_local, replica_providers
 from src.utils import now
 
 if TYPE_CHECKING:
@@ -27,6 +27,7 @@ def params_guild_id(guild_id: int = 0) -> int:
 
 def db_sessions(
         main_session: 'AsyncSession' = Depends(get_session_local),
-        remote_session: 'AsyncSession' = Depends(get_session_remote),
-) -> tuple['AsyncSession', ...]:
-    yield main_session, remote_session
+) -> tuple:
+    """ Main session and providers of replica ones, see `Service`. """
+
+    yield main_session, *replica_providers()
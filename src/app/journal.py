@@ -0,0 +1,114 @@
+import json
+from dataclasses import asdict
+from datetime import datetime
+from typing import AsyncIterator, Optional, Union
+
+import aiosqlite
+
+from src.utils import WriteCall, WriteOperation
+
+Descriptor = Union[WriteOperation, WriteCall]
+
+_schema = """
+    CREATE TABLE IF NOT EXISTS journal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        backend TEXT NOT NULL,
+        is_ordered INTEGER NOT NULL,
+        operation TEXT NOT NULL,
+        meta TEXT NOT NULL,
+        acked INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is not journal serializable')
+
+
+def _decode(dct: dict):
+    if '__datetime__' in dct:
+        return datetime.fromisoformat(dct['__datetime__'])
+    return dct
+
+
+class ReplicaJournal:
+    """
+    Append-only sqlite log of deferred replica writes, described as
+    `WriteOperation` or `WriteCall`. Writes are appended when deferred,
+    acknowledged once applied and removed by `compact`. Whatever is left
+    unacknowledged is replayed after a restart.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[aiosqlite.Connection] = None
+
+    async def _db(self) -> aiosqlite.Connection:
+        if self._connection is None:
+            connection = aiosqlite.connect(self.path)
+            # every write is committed before returning, so the journal
+            # thread must not keep process alive when it was not closed
+            connection.daemon = True
+            self._connection = await connection
+            await self._connection.execute('PRAGMA journal_mode=WAL')
+            await self._connection.execute('PRAGMA synchronous=NORMAL')
+            await self._connection.execute(_schema)
+            await self._connection.commit()
+        return self._connection
+
+    async def append(self,
+                     backend: str,
+                     descriptor: Descriptor,
+                     is_ordered: bool,
+                     meta_kw: dict) -> int:
+        """ Id of appended write, TypeError if it can't be encoded. """
+
+        encoded = json.dumps(asdict(descriptor), default=_encode)
+        db = await self._db()
+        cursor = await db.execute(
+            'INSERT INTO journal (backend, is_ordered, operation, meta) '
+            'VALUES (?, ?, ?, ?)',
+            (backend, is_ordered, encoded, json.dumps(meta_kw))
+        )
+        await db.commit()
+        return cursor.lastrowid
+
+    async def ack(self, *ids: int) -> None:
+        if not ids:
+            return
+        db = await self._db()
+        await db.executemany('UPDATE journal SET acked = 1 WHERE id = ?',
+                             [(id_,) for id_ in ids])
+        await db.commit()
+
+    async def pending(self) -> AsyncIterator[
+        tuple[int, str, Descriptor, bool, dict]
+    ]:
+        db = await self._db()
+        async with db.execute(
+                'SELECT id, backend, operation, is_ordered, meta '
+                'FROM journal WHERE acked = 0 ORDER BY id'
+        ) as cursor:
+            async for id_, backend, descriptor, is_ordered, meta in cursor:
+                fields = json.loads(descriptor, object_hook=_decode)
+                descriptor = (WriteCall(**fields) if 'function' in fields
+                              else WriteOperation(**fields))
+                yield (id_, backend, descriptor,
+                       bool(is_ordered), json.loads(meta))
+
+    async def compact(self) -> int:
+        """ Drop acknowledged writes, return amount of removed rows. """
+
+        db = await self._db()
+        cursor = await db.execute('DELETE FROM journal WHERE acked = 1')
+        await db.commit()
+        if cursor.rowcount:
+            await db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return cursor.rowcount
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
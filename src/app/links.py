@@ -0,0 +1,120 @@
+"""
+Materialized overlap of sessions and activities. An activity belongs to a
+session when its member joined the session and played it during a closed
+prescence there, or began it after an open one. Links are added when
+prescences, activities and session members change, instead of joining
+five tables on every read of `Session.activities`. Activity and prescence
+writes link only the row they wrote, not the whole history of the member.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Select, and_, exists, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.tables import (Activity, MemberSessionAssociation, Prescence,
+                            SessionActivity)
+
+
+def overlapping(table, begin, end=None):
+    """
+    Rows of `table` overlapping the period from `begin` to `end`, `end` being
+    None for a period still open, as are rows with `end` None. With member id
+    known `table.begin` bounds a range seek over the (member_id, begin, end)
+    index and `end` is checked from the index, without reading the row.
+    """
+
+    still_running = or_(table.end.is_(None), table.end > begin)
+    if end is None:
+        return still_running
+
+    return and_(table.begin < end, still_running)
+
+
+def overlaps():
+    """
+    Activity belongs to session of prescence: played during a closed
+    prescence or began after an open one. Unlike `overlapping`, an activity
+    begun before an open prescence stays with the session it began in.
+    """
+
+    return or_(
+        and_(
+            Prescence.end.isnot(None),
+            Activity.begin <= Prescence.end,
+            or_(Activity.begin >= Prescence.begin,
+                Activity.end.between(Prescence.begin, Prescence.end)),
+        ),
+        and_(
+            Prescence.end.is_(None),
+            Activity.begin > Prescence.begin,
+        )
+    )
+
+
+def missing_links(*filters) -> Select:
+    """ Overlapping session and activity keys not linked yet. """
+
+    link = SessionActivity
+    return (
+        select(Prescence.channel_id, Activity.id, Activity.member_id,
+               Activity.begin)
+        .join(Activity, Activity.member_id == Prescence.member_id)
+        .join(MemberSessionAssociation, and_(
+            MemberSessionAssociation.channel_id == Prescence.channel_id,
+            MemberSessionAssociation.member_id == Prescence.member_id,
+        ))
+        .where(
+            overlaps(),
+            ~exists().where(link.channel_id == Prescence.channel_id,
+                            link.app_id == Activity.id,
+                            link.member_id == Activity.member_id,
+                            link.begin == Activity.begin),
+            *filters,
+        )
+        .distinct()
+    )
+
+
+def link_statement(*filters):
+    return insert(SessionActivity).from_select(
+        ['channel_id', 'app_id', 'member_id', 'begin'],
+        missing_links(*filters)
+    )
+
+
+async def _link(session: AsyncSession, *filters) -> None:
+    await session.execute(link_statement(*filters))
+    await session.commit()
+
+
+async def link_activities(session: AsyncSession,
+                          member_id: int,
+                          channel_id: Optional[int] = None) -> None:
+    """ Link activities of member to sessions, `channel_id` one only. """
+
+    filters = [Prescence.member_id == member_id]
+    if channel_id is not None:
+        filters.append(Prescence.channel_id == channel_id)
+
+    await _link(session, *filters)
+
+
+async def link_activity(session: AsyncSession,
+                        app_id: int,
+                        member_id: int,
+                        begin: datetime) -> None:
+    """ Link the activity to sessions of its member. """
+
+    await _link(session, Activity.id == app_id,
+                Activity.member_id == member_id, Activity.begin == begin)
+
+
+async def link_prescence(session: AsyncSession,
+                         channel_id: int,
+                         member_id: int,
+                         begin: datetime) -> None:
+    """ Link activities of member to the session of the prescence. """
+
+    await _link(session, Prescence.channel_id == channel_id,
+                Prescence.member_id == member_id, Prescence.begin == begin)
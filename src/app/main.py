@@ -3,6 +3,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, responses
 
+from src.app.database import close_writers
 from src.app.service import Service
 from src.app.routers import router
 from src.config import Config
@@ -14,6 +15,8 @@ async def lifespan(_app: FastAPI):
     loop = asyncio.get_event_loop()
     asyncio.create_task(Service.deferrer.start(loop=loop))  # noqa
     yield
+    await Service.deferrer.close()
+    await close_writers()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -0,0 +1,126 @@
+"""
+Seconds played per member and app. Ending an activity adds its duration to
+the `playtime` rollup, so playtime lookups read one row instead of summing
+the whole activity history of the member. Only the write that actually
+closes the activity adds it, so repeated or concurrent ends count once.
+
+Rebuild the rollup from activities, after migration or drift:
+    python -m src.app.playtime [--backend remote]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Insert, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.deffered import insert_ignoring_duplicates
+from src.app.tables import Activity, Playtime, SessionFabric
+from src.constants import constants
+from src.utils import logger
+
+
+async def add_playtime(session: AsyncSession,
+                       member_id: int,
+                       app_id: int,
+                       seconds: int) -> None:
+    """ Add seconds to playtime of member in app, creating its row. """
+
+    await session.execute(
+        insert_ignoring_duplicates(Playtime.__table__,
+                                   session.bind.dialect.name)
+        .values(member_id=member_id, app_id=app_id, seconds=0)
+    )
+    await session.execute(
+        update(Playtime)
+        .filter_by(member_id=member_id, app_id=app_id)
+        .values(seconds=Playtime.seconds + seconds)
+    )
+
+
+async def end_activity(session: AsyncSession,
+                       member_id: int,
+                       app_id: int,
+                       end: datetime) -> Optional[Activity]:
+    """
+    Close the latest open activity of member in app and add its seconds to
+    playtime, in one transaction. None if no activity was left open, then
+    nothing is written.
+    """
+
+    activity = await session.scalar(
+        select(Activity)
+        .filter_by(id=app_id, member_id=member_id, end=None)
+        .order_by(Activity.begin.desc())
+        .limit(1)
+    )
+    if activity is None:
+        return None
+
+    closed = await session.execute(
+        update(Activity)
+        .filter_by(id=app_id, member_id=member_id, begin=activity.begin,
+                   end=None)
+        .values(end=end)
+        .execution_options(synchronize_session=False)
+    )
+    if closed.rowcount != 1:  # closed meanwhile by another write
+        await session.rollback()
+        return None
+
+    await session.refresh(activity)  # `end` and computed `seconds`
+    await add_playtime(session, member_id, app_id, activity.seconds)
+    await session.commit()
+    return activity
+
+
+def rollup_statement() -> Insert:
+    """ Playtime rows summed from stored seconds of closed activities. """
+
+    return insert(Playtime).from_select(
+        ['member_id', 'app_id', 'seconds'],
+        select(Activity.member_id, Activity.id, func.sum(Activity.seconds))
+        .where(Activity.seconds.isnot(None))
+        .group_by(Activity.member_id, Activity.id)
+    )
+
+
+async def rebuild(session: AsyncSession) -> int:
+    """ Replace the rollup by sums over closed activities. """
+
+    await session.execute(delete(Playtime))
+    await session.execute(rollup_statement())
+    await session.commit()
+
+    rows = await session.scalar(select(func.count()).select_from(Playtime))
+    logger.info(constants.log_playtime_rebuilt(num=rows))
+    return rows
+
+
+async def rebuild_backend(backend: str) -> int:
+    """ `rebuild` on database of backend, through its single writer if any. """
+
+    fabric = SessionFabric.fabrics[backend]
+    if fabric.writer is not None:
+        return await fabric.writer.submit(rebuild)
+
+    async with fabric.session_maker() as session:
+        return await rebuild(session=session)
+
+
+async def main(backend: str) -> None:
+    import src.app.database  # noqa, builds `local` and `remote` fabrics
+
+    await rebuild_backend(backend)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Rebuild playtime rollup from activities.'
+    )
+    parser.add_argument('--backend', choices=('local', 'remote'),
+                        default='local')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.backend))
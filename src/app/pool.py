@@ -0,0 +1,79 @@
+import time
+from typing import Optional, Union
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """ Checkout counts and waits of one engine connection pool. """
+
+    def __init__(self):
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+        self.waits = 0
+
+    def bind(self, engine: Union[AsyncEngine, Engine]) -> None:
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+        event.listen(engine, 'checkout', self._checked_out)
+        event.listen(engine, 'checkin', self._checked_in)
+        if isinstance(engine.pool, MeasuredPool):
+            engine.pool.metrics = self
+
+    def _checked_out(self, *_) -> None:
+        self.checkouts += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _checked_in(self, *_) -> None:
+        self.in_use = max(self.in_use - 1, 0)
+
+    def waited(self, seconds: float) -> None:
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def stats(self, pool: Pool) -> dict:
+        is_queue = isinstance(pool, QueuePool)
+        return {
+            'in_use': self.in_use,
+            'peak_in_use': self.peak_in_use,
+            'checkouts': self.checkouts,
+            'size': pool.size() if is_queue else None,
+            'overflow': pool.overflow() if is_queue else None,
+            'wait_avg_ms': (self.wait_total / self.waits * 1000
+                            if self.waits else 0.),
+            'wait_max_ms': self.wait_max * 1000,
+        }
+
+
+class MeasuredPool:
+    """ Queue pool mixin recording how long getting a connection takes. """
+
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()  # noqa
+        finally:
+            if self.metrics is not None:
+                self.metrics.waited(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()  # noqa
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeasuredQueuePool(MeasuredPool, QueuePool):
+    pass
+
+
+class MeasuredAsyncQueuePool(MeasuredPool, AsyncAdaptedQueuePool):
+    pass
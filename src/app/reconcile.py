@@ -0,0 +1,266 @@
+"""
+Repair drift between local and remote databases, local one being the source
+of truth. Every table is walked in chunks with keyset pagination. For each
+key range of a chunk both sides first compute an aggregate, row count and
+checksums of columns, and rows are fetched and compared only in ranges whose
+aggregates differ. Only rows that are missing, different or extra get
+written. Memory use is bounded by `chunk_size` whatever size of the table.
+
+Run once, or periodically with `--interval`:
+    python -m src.app.reconcile [--table activity ...] [--interval 3600]
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import (Column, DateTime, Integer, String, Table,
+                        UniqueConstraint, and_, bindparam, delete, extract,
+                        func, insert, select, tuple_, update)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from src.app.tables import Base, SessionFabric
+from src.constants import constants
+from src.utils import logger
+
+
+@dataclass
+class TableReport:
+    table: str
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+def table_key(table: Table) -> list[Column]:
+    """
+    Columns identifying a row on both sides: unique constraint of tables
+    with autoincrement surrogate id, which differs between databases, and
+    primary key otherwise.
+    """
+
+    primary_key = list(table.primary_key.columns)
+    if len(primary_key) == 1 and primary_key[0].autoincrement is True:
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                return list(constraint.columns)
+    return primary_key
+
+
+def compared_columns(table: Table) -> list[Column]:
+    """ Written columns, generated ones are computed by each database. """
+
+    key = table_key(table)
+    columns = [c for c in table.columns if c.computed is None]
+    if key == list(table.primary_key.columns):
+        return columns
+    return [c for c in columns if not c.primary_key]
+
+
+async def keyset_chunks(session: AsyncSession,
+                        table: Table,
+                        columns: list[Column],
+                        chunk_size: int) -> AsyncIterator[list[dict]]:
+    """ Rows of table in key order, `chunk_size` rows per query. """
+
+    key = table_key(table)
+    last: Optional[tuple] = None
+    while True:
+        query = select(*columns).order_by(*key).limit(chunk_size)
+        if last is not None:
+            query = query.where(tuple_(*key) > tuple_(*last))
+
+        rows = [row._asdict() for row in await session.execute(query)]
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last = tuple(rows[-1][c.name] for c in key)
+
+
+async def rows_by_key(session: AsyncSession,
+                      table: Table,
+                      columns: list[Column],
+                      keys: Iterable[tuple]) -> dict[tuple, dict]:
+    key = table_key(table)
+    query = select(*columns).where(tuple_(*key).in_(list(keys)))
+    rows = [row._asdict() for row in await session.execute(query)]
+    return {tuple(row[c.name] for c in key): row for row in rows}
+
+
+def key_range(key: list[Column], first: tuple, last: tuple):
+    return and_(tuple_(*key) >= tuple_(*first),
+                tuple_(*key) <= tuple_(*last))
+
+
+def checksum(column: Column):
+    """
+    Portable sum over values of column, likely to change when any of them
+    does. Dialects that store values differently, such as datetimes of
+    SQLite, only make ranges compared row by row.
+    """
+
+    if isinstance(column.type, Integer):
+        return func.sum(column)
+    if isinstance(column.type, DateTime):
+        stamp = 0
+        for field, scale in (('year', 12), ('month', 31), ('day', 24),
+                             ('hour', 60), ('minute', 60), ('second', 1)):
+            stamp = (stamp + extract(field, column)) * scale
+        return func.sum(stamp)
+    if isinstance(column.type, String):
+        return func.sum(func.length(column))
+    return func.count(column)
+
+
+async def range_aggregate(session: AsyncSession,
+                          columns: list[Column],
+                          where) -> tuple:
+    query = select(func.count(), *map(checksum, columns)).where(where)
+    return tuple((await session.execute(query)).one())
+
+
+async def range_rows(session: AsyncSession,
+                     table: Table,
+                     columns: list[Column],
+                     where) -> dict[tuple, dict]:
+    key = table_key(table)
+    query = select(*columns).where(where)
+    rows = [row._asdict() for row in await session.execute(query)]
+    return {tuple(row[c.name] for c in key): row for row in rows}
+
+
+def _key_clause(key: list[Column]):
+    return and_(*(c == bindparam(f'key_{c.name}') for c in key))
+
+
+async def copy_table(source: AsyncSession,
+                     target: AsyncSession,
+                     table: Table,
+                     report: TableReport,
+                     chunk_size: int) -> None:
+    """
+    Insert rows missing on target and update ones that differ. Source is
+    walked by key only, rows are fetched just for key ranges whose
+    aggregates differ between sides.
+    """
+
+    key, columns = table_key(table), compared_columns(table)
+    changed = [c for c in columns if c not in key]
+
+    async for chunk in keyset_chunks(source, table, key, chunk_size):
+        where = key_range(key,
+                          tuple(chunk[0][c.name] for c in key),
+                          tuple(chunk[-1][c.name] for c in key))
+        if await range_aggregate(source, columns, where) == \
+                await range_aggregate(target, columns, where):
+            continue
+
+        rows = await range_rows(source, table, columns, where)
+        existing = await range_rows(target, table, columns, where)
+
+        missing = [row for k, row in rows.items() if k not in existing]
+        different = [row for k, row in rows.items()
+                     if k in existing and existing[k] != row]
+        if not (missing or different):
+            continue
+
+        if missing:
+            await target.execute(insert(table), missing)
+        if different and changed:
+            await target.execute(
+                update(table)
+                .where(_key_clause(key))
+                .values({c.name: bindparam(f'value_{c.name}')
+                         for c in changed}),
+                [{**{f'key_{c.name}': row[c.name] for c in key},
+                  **{f'value_{c.name}': row[c.name] for c in changed}}
+                 for row in different]
+            )
+        await target.commit()
+        report.inserted += len(missing)
+        report.updated += len(different)
+
+
+async def prune_table(source: AsyncSession,
+                      target: AsyncSession,
+                      table: Table,
+                      report: TableReport,
+                      chunk_size: int) -> None:
+    """ Delete target rows absent on source. """
+
+    key = table_key(table)
+    async for chunk in keyset_chunks(target, table, key, chunk_size):
+        keys = [tuple(row[c.name] for c in key) for row in chunk]
+        present = await rows_by_key(source, table, key, keys)
+        extra = [k for k in keys if k not in present]
+        if not extra:
+            continue
+
+        await target.execute(
+            delete(table).where(_key_clause(key)),
+            [{f'key_{c.name}': value for c, value in zip(key, k)}
+             for k in extra]
+        )
+        await target.commit()
+        report.deleted += len(extra)
+
+
+async def reconcile(source: AsyncEngine,
+                    target: AsyncEngine,
+                    table_names: Optional[Iterable[str]] = None,
+                    chunk_size: int = 1000) -> list[TableReport]:
+    """
+    Make target database hold the same rows as source. Rows are copied in
+    foreign key order, parents first, and pruned in the reverse one.
+    """
+
+    tables = [t for t in Base.metadata.sorted_tables
+              if table_names is None or t.name in table_names]
+    reports = {t.name: TableReport(table=t.name) for t in tables}
+
+    async with AsyncSession(source) as source_session, \
+            AsyncSession(target) as target_session:
+        for table in tables:
+            await copy_table(source_session, target_session, table,
+                             reports[table.name], chunk_size)
+            # release read transactions between tables
+            await source_session.rollback()
+            await target_session.rollback()
+        for table in reversed(tables):
+            await prune_table(source_session, target_session, table,
+                              reports[table.name], chunk_size)
+            await source_session.rollback()
+            await target_session.rollback()
+
+    for report in reports.values():
+        logger.info(constants.log_reconciled(**vars(report)))
+    return list(reports.values())
+
+
+async def main(table_names: Optional[list[str]],
+               chunk_size: int,
+               interval: Optional[float]) -> None:
+    import src.app.database  # noqa, builds `local` and `remote` fabrics
+
+    source = SessionFabric.fabrics['local'].engine
+    target = SessionFabric.fabrics['remote'].engine
+    while True:
+        await reconcile(source, target, table_names, chunk_size)
+        if interval is None:
+            return
+        await asyncio.sleep(interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Repair remote database drift from the local one.'
+    )
+    parser.add_argument('--table', action='append', dest='tables',
+                        help='table to reconcile, all tables by default')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--interval', type=float,
+                        help='repeat every this many seconds')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.tables, args.chunk_size, args.interval))
@@ -11,6 +11,7 @@ from src.app.routers.session import router as sess_router
 from src.app.routers.user import router as user_router
 from src.app.routers.sent_message import router as sent_message_router
 from src.app.routers.guild import router as guild_router
+from src.app.routers.metrics import router as metrics_router
 
 router = APIRouter(prefix='')
 router.include_router(sess_router)
@@ -24,3 +25,4 @@ router.include_router(emoji_router)
 router.include_router(music_router)
 router.include_router(sent_message_router)
 router.include_router(guild_router)
+router.include_router(metrics_router)
@@ -1,7 +1,8 @@
 from fastapi import Depends, APIRouter, status
 
 from .services import SrvActivities
-from src.app.schemas import Activity, Role, ActivityInfo, Emoji, EndActivity
+from src.app.schemas import (Activity, Role, ActivityInfo, Emoji, EndActivity,
+                             ActivityEvent, Applied)
 from src.app.specification import AppID
 
 router = APIRouter(prefix='/activity', tags=['activity'])
@@ -23,6 +24,14 @@ async def activity_update(
     return await service.patch(end_activity)
 
 
+@router.post('/batch', response_model=Applied)
+async def activity_batch(
+        events: list[ActivityEvent],
+        service: SrvActivities = Depends()
+):
+    return Applied(applied=await service.ingest(events))
+
+
 @router.get('', response_model=list[Activity])
 async def all_activities(
         timestamps: SrvActivities.filter_by_timeperiod = Depends(),
@@ -63,7 +72,4 @@ async def activity_emoji(
         app_id: AppID = Depends(),
         service: SrvActivities = Depends()
 ):
-    activity = await service.get(app_id)
-    info = activity.info
-    role = info.role
-    return role.emoji
+    return await service.emoji(app_id)
@@ -1,13 +1,24 @@
+import logging
+from datetime import datetime
 from functools import partial
+from typing import Optional, Sequence
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.sql.elements import BinaryExpression
 
 from src.app import tables
-from src.app.specification import AppID, UserID, Unclosed
+from src.app.links import overlapping
+from src.app.playtime import end_activity
+from src.app.specification import Specification
 from src.app.dependencies import default_period
-from src.app.schemas import Activity, EndActivity
+from src.app.schemas import Activity, ActivityEvent, EndActivity, Emoji
 from src.app.service import CreateReadUpdate
+from src.app.routers.session.services import SrvSessionActivity
+from src.constants import constants
+from src.utils import NotFoundException
+
+log = logging.getLogger(name='thrower.routers')
 
 
 class SrvActivities(CreateReadUpdate):
@@ -21,15 +32,74 @@ class SrvActivities(CreateReadUpdate):
     ) -> BinaryExpression:
         return cls.table.begin.between(period['begin'], period['end'])
 
+    async def overlapping(self,
+                          member_id: Specification,
+                          begin: datetime,
+                          end: Optional[datetime] = None) -> Sequence:
+        """ Activities of member overlapping period, `end` None if open. """
+
+        return await self.all(overlapping(self.table, begin, end), member_id)
+
     async def patch(self, activity: EndActivity, *args) -> Activity:
-        specification = (AppID(activity.id) & UserID(activity.member_id)
-                         & Unclosed())
+        """
+        End the current activity of member in app. Every database closes
+        its own open row and adds it to playtime only if still open, so
+        a retried or duplicate end doesn't count twice.
+        """
+
+        ended = await self.replicate(
+            partial(end_activity, member_id=activity.member_id,
+                    app_id=activity.id, end=activity.end),
+        )
+        if ended is None:
+            raise NotFoundException
+
+        await SrvSessionActivity.along(self).link_activity(ended)
+        return ended
+
+    async def post(self,
+                   data: Activity,
+                   repeat_on_failure: bool = True) -> tables.Activity:
+        activity = await super().post(data, repeat_on_failure)
+        await SrvSessionActivity.along(self).link_activity(activity)
+        return activity
+
+    async def ingest(self, events: list[ActivityEvent]) -> int:
+        """
+        Apply activity begins and ends in order. Ends without an open
+        activity and begins without `begin` are skipped. Returns amount of
+        applied events.
+        """
+
+        applied = 0
+        for event in events:
+            try:
+                if event.end is None:
+                    await self.post(Activity(**event.model_dump()))
+                else:
+                    await self.patch(EndActivity(**event.model_dump()))
+            except (HTTPException, ValidationError) as e:
+                log.debug(constants.log_activity_event_skipped(
+                    error=getattr(e, 'detail', e)
+                ))
+            else:
+                applied += 1
+        return applied
+
+    async def emoji(
+            self,
+            app_id: Specification,
+            suppress_error: bool = False
+    ) -> Optional[Emoji]:
+        """ Emoji of role given for the app, through read cache. """
 
-        current_activity = partial(super().get,
-                                   _ordering=self.table.begin.desc())
+        def role_emoji(activity: tables.Activity) -> Optional[tables.Emoji]:
+            if activity.info is None or activity.info.role is None:
+                return None
+            return activity.info.role.emoji
 
-        return await super().patch(
-            specification,
-            activity,
-            get_method=current_activity,  # noqa
+        return await self.cached(
+            app_id, Emoji, resolve=role_emoji,
+            depends_on=(tables.ActivityInfo, tables.Role, tables.Emoji),
+            suppress_error=suppress_error,
         )
@@ -1,10 +1,12 @@
+from fastapi import Depends
+
 from src.utils import CrudType
 from src.app import tables
-from src.app.schemas import ActivityInfo
-from src.app.specification import ActivityID
-from src.app.service import crud_fabric
+from src.app.schemas import ActivityInfo, SyncValidators, Upserted
+from src.app.specification import ActivityID, SyncURL
+from src.app.service import CreateRead, crud_fabric
 
-router, _ = crud_fabric(
+router, SrvActivityInfo = crud_fabric(
     table=tables.ActivityInfo,
     relative_path='activity_info',
     get_path='/{app_id}',
@@ -13,3 +15,33 @@ router, _ = crud_fabric(
     with_all=True,
     crud_type=CrudType.CR
 )
+
+
+class SrvSyncValidators(CreateRead):
+    table = tables.SyncValidators
+
+
+@router.post('/bulk', response_model=Upserted)
+async def activity_info_bulk(
+        infos: list[ActivityInfo],
+        service: SrvActivityInfo = Depends()
+):
+    created, updated = await service.upsert_many(infos)
+    return Upserted(created=created, updated=updated)
+
+
+@router.get('/sync/validators', response_model=SyncValidators)
+async def sync_validators(
+        url: SyncURL = Depends(),
+        service: SrvSyncValidators = Depends()
+):
+    return await service.get(url)
+
+
+@router.put('/sync/validators', response_model=SyncValidators)
+async def sync_validators_store(
+        validators: SyncValidators,
+        service: SrvSyncValidators = Depends()
+):
+    await service.upsert_many([validators])
+    return validators
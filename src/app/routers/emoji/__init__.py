@@ -6,7 +6,7 @@ from src.app.specification import EmojiID
 from src.app.schemas import Emoji, Role
 from src.app.service import crud_fabric
 
-router, Service = crud_fabric(
+router, SrvEmoji = crud_fabric(
     table=tables.Emoji,
     relative_path='emoji',
     get_path='/{emoji_id}',
@@ -20,7 +20,8 @@ router, Service = crud_fabric(
 @router.get('/{emoji_id}/role', response_model=Role)
 async def get_emoji_role(
         emoji_id: EmojiID = Depends(),
-        service: Service = Depends()
+        service: SrvEmoji = Depends()
 ):
-    emoji: tables.Emoji = await service.get(emoji_id)
-    return emoji.role
+    return await service.cached(emoji_id, Role,
+                                resolve=lambda emoji: emoji.role,
+                                depends_on=(tables.Role,))
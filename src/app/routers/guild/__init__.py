@@ -3,7 +3,7 @@ from src.app.service import crud_fabric
 from src.app.schemas import GuildChannels
 from src.app.specification import GuildID
 
-router, _ = crud_fabric(
+router, SrvGuild = crud_fabric(
     table=tables.Guild,
     relative_path='guild',
     get_path='/{guild_id}',
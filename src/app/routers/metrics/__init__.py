@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+
+from src.app.schemas import CacheStats, DeferredStats, PoolStats
+from src.app.service import Service
+from src.app.tables import SessionFabric
+
+router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+
+@router.get('/deferred', response_model=DeferredStats)
+async def deferred():
+    return Service.deferrer.stats()
+
+
+@router.get('/pools', response_model=dict[str, PoolStats])
+async def pools():
+    return {name: fabric.metrics.stats(fabric.engine.pool)
+            for name, fabric in SessionFabric.fabrics.items()}
+
+
+@router.get('/cache', response_model=CacheStats)
+async def cache():
+    return Service.read_cache.stats()
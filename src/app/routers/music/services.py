@@ -1,3 +1,6 @@
+from functools import partial
+from typing import TYPE_CHECKING, Optional
+
 from sqlalchemy import update
 
 from src.app import tables
@@ -5,6 +8,26 @@ from src.app.schemas import FavoriteMusic
 from src.app.service import CreateReadUpdate
 from src.app.specification import MusicUserID, QueryFilter, Specification
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def increment_counter(session: 'AsyncSession',
+                            user_id: int,
+                            query: str) -> Optional[tables.FavoriteMusic]:
+    """ Favorite music with incremented counter, None if there is none. """
+
+    specification = MusicUserID(user_id) & QueryFilter(query)
+    stmt = (
+        update(tables.FavoriteMusic)
+        .filter_by(**specification())
+        .values(counter=tables.FavoriteMusic.counter + 1)
+        .returning(tables.FavoriteMusic)
+    )
+    async with session.begin():
+        r = await session.execute(stmt)
+        return r.scalars().first()
+
 
 class SrvFavoriteMusic(CreateReadUpdate):
     table = tables.FavoriteMusic
@@ -19,20 +42,11 @@ class SrvFavoriteMusic(CreateReadUpdate):
         return records.all()
 
     async def post(self, music_data: FavoriteMusic, *_) -> dict:
-        specification = MusicUserID(music_data.user_id) & QueryFilter(
-            music_data.query)
-        stmt = (
-                update(self.table)
-                .filter_by(**specification())
-                .values(counter=self.table.counter + 1)
-                .returning(self.table.counter)
-            )
-
-        async with self._session.begin():
-            r = await self._session.execute(stmt)
-            if (counter := r.scalars().first()) is not None:
-                return {'user_id': music_data.user_id,
-                        'query': music_data.query,
-                        'counter': counter}
+        increment = partial(increment_counter, user_id=music_data.user_id,
+                            query=music_data.query)
+        if (music := await self.replicate(increment)) is not None:
+            return {'user_id': music_data.user_id,
+                    'query': music_data.query,
+                    'counter': music.counter}
 
         return await super().post(music_data)
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.app import tables
 from src.app.schemas import SessionLike, AnyFields
 from src.app.service import CreateReadUpdate
+from src.app.routers.session.services import SrvSessionActivity
 from src.app.specification import SessionID, UserID, Unclosed
 from src.app.dependencies import db_sessions
 
@@ -65,8 +66,17 @@ class SrvPrescence(CreateReadUpdate):
         )
         member_prescence = partial(super().get, _query=query)
 
-        return await super().patch(
+        ended = await super().patch(
             specification=specification,
             data=AnyFields(end=prescence.end),
             get_method=member_prescence,  # noqa
         )
+        await SrvSessionActivity.along(self).link_prescence(ended)
+        return ended
+
+    async def post(self,
+                   data: SessionLike,
+                   repeat_on_failure: bool = True) -> tables.Prescence:
+        prescence = await super().post(data, repeat_on_failure)
+        await SrvSessionActivity.along(self).link_prescence(prescence)
+        return prescence
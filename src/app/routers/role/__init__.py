@@ -25,7 +25,7 @@ async def role_get_by_app_id(
         guild_id: params_guild_id = Depends(),
         service: SrvRole = Depends()
 ):
-    return await service.get(app_id, guild_id=guild_id)
+    return await service.by_app(app_id, guild_id)
 
 
 @router.delete('/{role_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.app import tables
 from src.app.service import CRUD
+from src.app.schemas import Role
+from src.app.specification import Specification
 from src.app.tables import Base as BaseTable
 
 
@@ -13,7 +15,16 @@ class SrvRole(CRUD):
     def get(self,
             *args,
             guild_id: Optional[int] = None,
-            session_: Optional[AsyncSession] = None) -> BaseTable:
+            session_: Optional[AsyncSession] = None,
+            **kwargs) -> BaseTable:
         if guild_id is not None:
-            return super().get(*args, guild_id=guild_id, session_=session_)
-        return super().get(*args, session_=session_)
+            kwargs['guild_id'] = guild_id
+        return super().get(*args, session_=session_, **kwargs)
+
+    async def by_app(self,
+                     app_id: Specification,
+                     guild_id: Optional[int] = None) -> Optional[Role]:
+        """ Role given for the app, through read cache. """
+
+        filters = {} if guild_id is None else dict(guild_id=guild_id)
+        return await self.cached(app_id, Role, **filters)
@@ -3,7 +3,7 @@ from src.app.service import crud_fabric
 from src.app.schemas import SentMessage
 from src.app.specification import SentMessageID
 
-router, _ = crud_fabric(
+router, SrvSentMessage = crud_fabric(
     table=tables.SentMessage,
     relative_path='sent_message',
     get_path='/{message_id}',
@@ -1,8 +1,11 @@
+from typing import Optional
+
 from fastapi import Depends, APIRouter, status
 
 from .services import SrvSession
 from src.app import tables
-from src.app.schemas import Session, User, SessionLike, Activity, AnyFields
+from src.app.schemas import (Session, User, SessionLike, Activity, AnyFields,
+                             SessionDetail)
 from src.app.specification import SessionID, MessageID, LeaderID, SessionMember
 
 router = APIRouter(prefix='/session', tags=['session'])
@@ -31,7 +34,7 @@ async def get_user_unclosed_session(
         leader_id: LeaderID = Depends(),
         service: SrvSession = Depends()
 ):
-    return await service.user_unclosed(leader_id)
+    return await service.cached_user_unclosed(leader_id)
 
 
 @router.get('/{session_id}', response_model=Session)
@@ -60,6 +63,15 @@ async def session_users(
     return sess.members
 
 
+@router.get('/{session_id}/detail', response_model=SessionDetail)
+async def session_detail(
+        session_id: SessionID = Depends(),
+        app_id: Optional[int] = None,
+        service: SrvSession = Depends()
+):
+    return await service.detail(session_id, app_id)
+
+
 @router.post('/{session_id}/members/{user_id}', response_model=User | None,
              status_code=status.HTTP_201_CREATED)
 async def session_add_member(
@@ -83,8 +95,7 @@ async def session_activities(
         message_id: MessageID = Depends(),
         service: SrvSession = Depends()
 ):
-    sess: tables.Session = await service.get(message_id)
-    return sess.activities
+    return await service.activities(message_id)
 
 
 @router.get('/{message_id}/leadership', response_model=list[SessionLike])
@@ -1,14 +1,18 @@
+from functools import partial
 from typing import TYPE_CHECKING, Optional
 
 from fastapi import Depends
 from sqlalchemy import select
+from sqlalchemy.orm import noload, selectinload
 from sqlalchemy.exc import IntegrityError
 
 from src.app import tables
 from src.app.dependencies import default_period
-from src.app.schemas import Session
-from src.app.service import CreateReadUpdate
+from src.app.schemas import ActivityIcon, Session, SessionDetail, User
+from src.app.links import link_activities, link_activity, link_prescence
+from src.app.service import CreateReadUpdate, Service
 from src.app.specification import Unclosed
+from src.utils import WriteOperation
 
 if TYPE_CHECKING:
     from sqlalchemy import Sequence, BinaryExpression
@@ -18,6 +22,35 @@ if TYPE_CHECKING:
     from src.app.specification import Specification
 
 
+class SrvSessionActivity(Service):
+    """ Writes of session and activity links, see `src.app.links`. """
+
+    table = tables.SessionActivity
+
+    async def link(self,
+                   member_id: int,
+                   channel_id: Optional[int] = None) -> None:
+        await self.replicate(
+            partial(link_activities, member_id=member_id,
+                    channel_id=channel_id),
+            repeat_on_failure=True,
+        )
+
+    async def link_activity(self, activity: tables.Activity) -> None:
+        await self.replicate(
+            partial(link_activity, app_id=activity.id,
+                    member_id=activity.member_id, begin=activity.begin),
+            repeat_on_failure=True,
+        )
+
+    async def link_prescence(self, prescence: tables.Prescence) -> None:
+        await self.replicate(
+            partial(link_prescence, channel_id=prescence.channel_id,
+                    member_id=prescence.member_id, begin=prescence.begin),
+            repeat_on_failure=True,
+        )
+
+
 class SrvSession(CreateReadUpdate):
     table = tables.Session
     order_by = tables.Session.begin
@@ -51,6 +84,69 @@ class SrvSession(CreateReadUpdate):
         )
         return user_unclosed.first()
 
+    async def cached_user_unclosed(
+            self,
+            leader_id: 'Specification'
+    ) -> Optional[Session]:
+        return await self.cached(leader_id & Unclosed(), Session,
+                                 load=partial(self.user_unclosed, leader_id),
+                                 suppress_error=True)
+
+    async def detail(
+            self,
+            specification: 'Specification',
+            app_id: Optional[int] = None
+    ) -> SessionDetail:
+        """
+        Session with its members, leader and icon of `app_id` activity, by
+        default of the one leader plays now. Only relations shown are loaded.
+        """
+
+        query = self._base_query.filter_by(**specification()).options(
+            selectinload(tables.Session.members)
+            .noload(tables.Member.activities),
+            noload(tables.Session.prescence),
+            noload(tables.Session.leadership),
+            noload(tables.Session.activities),
+        )
+        sess: tables.Session = await self.get(specification, _query=query)
+        detail = SessionDetail.model_validate(sess, from_attributes=True)
+
+        leader = next((m for m in sess.members if m.id == sess.leader_id),
+                      None)
+        if leader is None and sess.leader_id is not None:
+            leader = await self._session.get(
+                tables.Member, sess.leader_id,
+                options=[noload(tables.Member.activities)]
+            )
+        if leader is not None:
+            detail.leader = User.model_validate(leader, from_attributes=True)
+
+        info = tables.ActivityInfo
+        if app_id is not None:
+            query = select(info).filter_by(app_id=app_id)
+        else:
+            query = (
+                select(info)
+                .join(tables.Activity, tables.Activity.id == info.app_id)
+                .filter(tables.Activity.member_id == sess.leader_id,
+                        tables.Activity.end.is_(None))
+                .order_by(tables.Activity.begin.desc())
+                .limit(1)
+            )
+        query = query.options(
+            selectinload(info.role).options(noload(tables.Role.info),
+                                            noload(tables.Role.guild))
+        )
+        if (app := (await self._session.scalars(query)).first()) is not None:
+            emoji = app.role.emoji if app.role is not None else None
+            detail.activity = ActivityIcon(
+                app_id=app.app_id, app_name=app.app_name,
+                icon_url=app.icon_url,
+                emoji_id=emoji.id if emoji is not None else None,
+            )
+        return detail
+
     @staticmethod
     async def _add_member_orm(session: 'AsyncSession',
                               session_table: tables.Session,
@@ -81,4 +177,25 @@ class SrvSession(CreateReadUpdate):
 
             return user
 
-        return await self.replicate(_add_member, repeat_on_failure=True)
+        operation = WriteOperation(
+            table=tables.MemberSessionAssociation.__tablename__,
+            kind='insert',
+            values={'member_id': user_specification.value,
+                    'channel_id': sess_specification.value},
+        )
+        user = await self.replicate(_add_member, repeat_on_failure=True,
+                                    operation=operation)
+        await SrvSessionActivity.along(self).link(
+            user_specification.value, sess_specification.value
+        )
+        return user
+
+    async def activities(self, specification: 'Specification') -> 'Sequence':
+        query = self._base_query.filter_by(**specification()).options(
+            selectinload(tables.Session.activities),
+            noload(tables.Session.members),
+            noload(tables.Session.prescence),
+            noload(tables.Session.leadership),
+        )
+        sess: tables.Session = await self.get(specification, _query=query)
+        return sess.activities
@@ -2,7 +2,7 @@ from fastapi import Depends, APIRouter, status
 
 from .services import SrvUser
 from src.app.schemas import (User, Session, IngameSeconds, DurationActivity,
-                             AnyFields)
+                             AnyFields, Created)
 from src.app.specification import AppID, RoleID, SessionMember, UserID
 
 router = APIRouter(prefix='/user', tags=['user'])
@@ -18,13 +18,17 @@ async def user(user_data: User, service: SrvUser = Depends()):
     return await service.post(user_data)
 
 
+@router.post('/bulk', response_model=Created)
+async def users_bulk(users: list[User], service: SrvUser = Depends()):
+    return Created(created=await service.post_many(users))
+
+
 @router.get('/{user_id}', response_model=User)
 async def user_get(
         user_id: SessionMember = Depends(),
         service: SrvUser = Depends()
 ):
-    u = await service.get(user_id)
-    return u
+    return await service.cached(user_id, User)
 
 
 @router.patch('/{user_id}', response_model=User)
@@ -1,13 +1,17 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import Depends
-from sqlalchemy import select, text, Sequence
+from sqlalchemy import select, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.elements import BinaryExpression
 
 from src.app import tables
-from src.constants import constants
 from src.app.service import CreateReadUpdate
 from src.app.schemas import IngameSeconds
 from src.app.specification import Specification
 from src.app.dependencies import default_period
+from src.config import Config
 
 
 class SrvUser(CreateReadUpdate):
@@ -45,17 +49,38 @@ class SrvUser(CreateReadUpdate):
 
         return activities.all()
 
+    @asynccontextmanager
+    async def _statistics_session(self) -> AsyncIterator[AsyncSession]:
+        """ Session of `Config.statistics_backend`, main one if local. """
+
+        if Config.statistics_backend == 'local':
+            yield self._session
+            return
+
+        fabric = tables.SessionFabric.fabrics[Config.statistics_backend]
+        async with fabric.session_maker() as session:
+            yield session
+
     async def durations(self, member_id: Specification) -> Sequence:
-        stmt = text(constants.duration_query(member_id=member_id.value))
-        durations = await self._session.execute(stmt)
-        return durations.fetchall()
+        stmt = (
+            select(tables.Playtime.app_id, tables.Playtime.seconds)
+            .filter_by(member_id=member_id.value)
+        )
+        async with self._statistics_session() as session:
+            durations = await session.execute(stmt)
+            return durations.fetchall()
 
     async def concrete_duration(
             self,
             member_id: Specification,
             role_id: Specification
     ) -> IngameSeconds | None:
-        stmt = text(constants.concrete_duration_query(role_id=role_id.value,
-                                                      member_id=member_id.value))
-        concrete_duration = await self._session.execute(stmt)
-        return concrete_duration.fetchone()
+        stmt = (
+            select(tables.Playtime.app_id, tables.Playtime.seconds)
+            .join(tables.Role, tables.Role.app_id == tables.Playtime.app_id)
+            .where(tables.Role.id == role_id.value,
+                   tables.Playtime.member_id == member_id.value)
+        )
+        async with self._statistics_session() as session:
+            concrete_duration = await session.execute(stmt)
+            return concrete_duration.fetchone()
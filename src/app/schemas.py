@@ -33,6 +33,19 @@ class GuildForeign(BaseModel):
     guild_id: int
 
 
+class Created(BaseModel):
+    created: int
+
+
+class Upserted(BaseModel):
+    created: int
+    updated: int
+
+
+class Applied(BaseModel):
+    applied: int
+
+
 class Session(BaseModel):
     channel_id: int
     name: str
@@ -49,6 +62,12 @@ class ActivityInfo(BaseModel):
     icon_url: str
 
 
+class SyncValidators(BaseModel):
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
 class Activity(BaseModel):
     member_id: int
     id: int
@@ -57,6 +76,15 @@ class Activity(BaseModel):
     end: Optional[datetime] = None
 
 
+class ActivityEvent(BaseModel):
+    """ Activity begin, or end of the open one when `end` is set. """
+    member_id: int
+    id: int
+
+    begin: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+
 class SentMessage(BaseModel):
     id: int
     guild_id: int
@@ -90,6 +118,49 @@ class IngameSeconds(BaseModel):
     seconds: int
 
 
+class ActivityIcon(BaseModel):
+    app_id: int
+    app_name: str
+    icon_url: str
+    emoji_id: Optional[int] = None
+
+
+class SessionDetail(Session):
+    members: list[User] = []
+    leader: Optional[User] = None
+    activity: Optional[ActivityIcon] = None
+
+
+class BackendHealth(BaseModel):
+    state: str
+    failures: int
+
+
+class DeferredStats(BaseModel):
+    ordered: int
+    unordered: int
+    oldest_age: float
+    backends: dict[str, BackendHealth]
+
+
+class PoolStats(BaseModel):
+    in_use: int
+    peak_in_use: int
+    checkouts: int
+    size: Optional[int] = None
+    overflow: Optional[int] = None
+    wait_avg_ms: float
+    wait_max_ms: float
+
+
+class CacheStats(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    hit_rate: float
+    invalidations: int
+
+
 class AnyFields(BaseModel):
     model_config = ConfigDict(extra="allow")
 
@@ -1,4 +1,5 @@
 import logging
+from asyncio import gather
 from contextlib import suppress
 from typing import (Callable, Any, Coroutine, Annotated, Optional, Protocol,
                     Type, TYPE_CHECKING)
@@ -6,18 +7,23 @@ from functools import partial
 
 from fastapi import Depends, HTTPException, APIRouter, status, Query
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, inspect, select, update
 from sqlalchemy.exc import IntegrityError
 
-from src.config import Config
+from src.config import Config, ReplicationMode
 from src.constants import constants
 from src.utils import (NotFoundException, CrudType, format_dict, table_to_json,
-                       CoroItem)
-from src.app.deffered import DeferredTasksProcessor
+                       CoroItem, WriteOperation)
+from src.app.cache import ReadCache
+from src.app.deffered import (DeferredTasksProcessor,
+                              insert_ignoring_duplicates)
+from src.app.journal import ReplicaJournal
+from src.app.tables import Base, SessionFabric
 from src.app.dependencies import db_sessions
 
 if TYPE_CHECKING:
-    from sqlalchemy import UnaryExpression, Sequence, Select, BinaryExpression
+    from sqlalchemy import (UnaryExpression, Sequence, Select,
+                            BinaryExpression)
     from sqlalchemy.ext.asyncio import AsyncSession
 
     from pydantic import BaseModel
@@ -28,6 +34,43 @@ if TYPE_CHECKING:
 log = logging.getLogger(name='thrower.routers')
 
 
+async def create_rows(session: 'AsyncSession',
+                      table: str,
+                      rows: list[dict],
+                      chunk_size: int) -> None:
+    """ Insert rows to table of name, ones with stored key are skipped. """
+
+    statement = insert_ignoring_duplicates(Base.metadata.tables[table],
+                                           session.bind.dialect.name)
+    for i in range(0, len(rows), chunk_size):
+        await session.execute(statement, rows[i:i + chunk_size])
+    await session.commit()
+
+
+async def upsert_rows(session: 'AsyncSession',
+                      table: str,
+                      rows: list[dict],
+                      changed: list[dict],
+                      chunk_size: int) -> None:
+    """ Insert new `rows` and update `changed` ones of table of name. """
+
+    table = Base.metadata.tables[table]
+    key, = table.primary_key.columns
+    # changed rows are inserted too, a replica may not have them yet
+    rows = rows + changed
+    statement = insert_ignoring_duplicates(table, session.bind.dialect.name)
+    for i in range(0, len(rows), chunk_size):
+        await session.execute(statement, rows[i:i + chunk_size])
+
+    statement = update(table).where(key == bindparam('key_'))
+    params = [{'key_': row[key.name],
+               **{k: v for k, v in row.items() if k != key.name}}
+              for row in changed]
+    for i in range(0, len(params), chunk_size):
+        await session.execute(statement, params[i:i + chunk_size])
+    await session.commit()
+
+
 class Service:
     table: Optional['BaseTable'] = None
     order_by: Optional['UnaryExpression'] = None
@@ -36,43 +79,140 @@ class Service:
     def _name(self):
         return self.table.__name__
 
-    deferrer = DeferredTasksProcessor(sleep_seconds=Config.defer_sleep_seconds)
+    deferrer = DeferredTasksProcessor(sleep_seconds=Config.defer_sleep_seconds,
+                                      batch_size=Config.defer_batch_size,
+                                      wakeup_size=Config.defer_wakeup_size,
+                                      journal=ReplicaJournal(
+                                          Config.defer_journal_path
+                                      ) if Config.defer_journal_path else None,
+                                      backoff_base=Config.defer_backoff_base,
+                                      backoff_cap=Config.defer_backoff_cap,
+                                      breaker_threshold=(
+                                          Config.defer_breaker_threshold
+                                      ),
+                                      breaker_probe_seconds=(
+                                          Config.defer_breaker_probe_seconds
+                                      ))
+    read_cache = ReadCache(ttl=Config.read_cache_ttl,
+                           max_size=Config.read_cache_size)
+
+    @classmethod
+    def along(cls, service: 'Service') -> 'Service':
+        """ Bound to the same sessions as `service`. """
+        return cls((service._session, *service._other_sessions),  # noqa
+                   service.defer_handle)
 
     @staticmethod
-    async def wait_coro(coro: Coroutine, *args, **kwargs) -> Any:
-        return await coro
+    async def wait_coro(coro_item: CoroItem, *args, **kwargs) -> Any:
+        return await coro_item.build_coro()
+
+    def write_operation(self,
+                        kind: str,
+                        values: dict,
+                        filters: Optional[dict] = None) -> WriteOperation:
+        """ Describe write to own table, dropping unknown fields. """
+
+        columns = self.table.__table__.columns
+        values = {
+            k: v for k, v in values.items() if k in columns and not (
+                    kind == 'insert' and v is None and
+                    (columns[k].default or columns[k].server_default)
+            )
+        }
+        return WriteOperation(table=self.table.__tablename__, kind=kind,
+                              values=values, filters=filters or {})
 
     async def replicate(self,
                         coro_fabric: Callable,
                         repeat_on_failure: bool = False,
-                        is_ordered: bool = True) -> Any:
+                        is_ordered: bool = True,
+                        operation: Optional[WriteOperation] = None) -> Any:
         """
         Replicate simple coroutine execution
         require:
             positional first argument `session`.
+        Fan out of replicas follows `Config.replication_mode` or, for
+        ordered items, `Config.ordered_replication_mode`. `operation`
+        describes the same write as data for batched deferred execution.
+        Replicas given as session makers are opened only here, so requests
+        that do not write never touch them.
         """
         log.debug(constants.log_reflect_begin(coro_fabric=coro_fabric))
 
-        resp = await coro_fabric(session=self._session)
+        mode = (Config.ordered_replication_mode if is_ordered
+                else Config.replication_mode)
+
+        async def replica(provider) -> Any:
+            is_lazy = callable(provider)
+            other_session = provider() if is_lazy else provider
+            log.debug(constants.log_reflect_execution(session=other_session))
+            try:
+                return await self.coro_handler(
+                    coro_item=CoroItem(coro_fabric=coro_fabric,
+                                       coro_kwargs=dict(session=other_session),
+                                       meta_kw=dict(
+                                           repeat_on_failure=repeat_on_failure),
+                                       operation=operation,
+                                       ),
+                    is_ordered=is_ordered,
+                )
+            finally:
+                # deferred items are closed by deferrer once executed
+                if is_lazy and not self.defer_handle:
+                    await other_session.close()
+
+        if mode is ReplicationMode.ALL:
+            resp, *_ = await self._gather(
+                self.write(coro_fabric, operation),
+                *map(replica, self._other_sessions)
+            )
+        else:
+            resp = await self.write(coro_fabric, operation)
+
         if resp is not None:
             log.debug(
                 constants.log_reflect_main_response(
                     response=table_to_json(resp))
             )
 
-        for other_session in self._other_sessions:
-            log.debug(constants.log_reflect_execution(session=other_session))
-            await self.coro_handler(
-                coro_item=CoroItem(coro_fabric=coro_fabric,
-                                   coro_kwargs=dict(session=other_session),
-                                   meta_kw=dict(
-                                       repeat_on_failure=repeat_on_failure)
-                                   ),
-                is_ordered=is_ordered,
-            )
+        if mode is ReplicationMode.REPLICAS:
+            await self._gather(*map(replica, self._other_sessions))
+        elif mode is ReplicationMode.SEQUENTIAL:
+            for provider in self._other_sessions:
+                await replica(provider)
 
         return resp
 
+    async def write(self,
+                    coro_fabric: Callable,
+                    operation: Optional[WriteOperation] = None) -> Any:
+        """
+        Write to main database, through its single writer if any. Cached
+        reads of written table are invalidated once write is over, by row
+        when `operation` describes it.
+        """
+
+        bind = getattr(self._session, 'bind', None)
+        name = SessionFabric.name_of(bind) if bind is not None else None
+        try:
+            if name is not None and \
+                    (writer := SessionFabric.fabrics[name].writer):
+                return await writer.submit(coro_fabric)
+            return await coro_fabric(session=self._session)
+        finally:
+            table = operation.table if operation else self.table.__tablename__
+            self.read_cache.invalidate(table, operation)
+
+    @staticmethod
+    async def _gather(*coroutines: Coroutine) -> list:
+        """ Wait for every coroutine, then raise the first failure. """
+
+        results = await gather(*coroutines, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
     def __init__(
             self,
             sessions: tuple['AsyncSession', ...] = Depends(db_sessions),
@@ -137,8 +277,83 @@ class Create(Service):
     async def post(self,
                    data: 'BaseModel',
                    repeat_on_failure: bool = True) -> 'BaseTable':
-        create = partial(self._create, data=data.model_dump())
-        return await self.replicate(create, repeat_on_failure)
+        values = data.model_dump()
+        create = partial(self._create, data=values)
+        operation = self.write_operation('insert', values)
+        return await self.replicate(create, repeat_on_failure,
+                                    operation=operation)
+
+    def _rows(self, data: list['BaseModel']) -> dict[Any, dict]:
+        """ Column values of items by primary key, last item wins. """
+
+        columns = self.table.__table__.columns
+        key, = self.table.__table__.primary_key.columns
+        rows = {}
+        for item in data:
+            values = {k: v for k, v in item.model_dump().items()
+                      if k in columns}
+            rows[values[key.name]] = values
+        return rows
+
+    async def post_many(self,
+                        data: list['BaseModel'],
+                        chunk_size: int = 500) -> int:
+        """
+        Insert rows whose primary key isn't stored yet, existing ones are
+        left as they are. Keys are looked up and rows inserted `chunk_size`
+        at a time. Returns amount of inserted rows.
+        """
+
+        key, = self.table.__table__.primary_key.columns
+        rows = self._rows(data)
+
+        keys = list(rows)
+        async with self._session.begin():
+            for i in range(0, len(keys), chunk_size):
+                existing = await self._session.scalars(
+                    select(key).where(key.in_(keys[i:i + chunk_size]))
+                )
+                for k in existing:
+                    del rows[k]
+
+        if rows:
+            create = partial(create_rows, table=self.table.__tablename__,
+                             rows=list(rows.values()), chunk_size=chunk_size)
+            await self.replicate(create, repeat_on_failure=True)
+        return len(rows)
+
+    async def upsert_many(self,
+                          data: list['BaseModel'],
+                          chunk_size: int = 500) -> tuple[int, int]:
+        """
+        Insert rows whose primary key isn't stored yet and update stored
+        ones whose values differ, unchanged rows aren't written. Rows are
+        compared and written `chunk_size` at a time. Returns amounts of
+        inserted and updated rows.
+        """
+
+        columns = self.table.__table__.columns
+        key, = self.table.__table__.primary_key.columns
+        rows = self._rows(data)
+
+        changed = []
+        keys = list(rows)
+        async with self._session.begin():
+            for i in range(0, len(keys), chunk_size):
+                stored = await self._session.execute(
+                    select(*columns).where(key.in_(keys[i:i + chunk_size]))
+                )
+                for row in stored.mappings():
+                    values = rows.pop(row[key.name])
+                    if any(row[k] != v for k, v in values.items()):
+                        changed.append(values)
+
+        if rows or changed:
+            upsert = partial(upsert_rows, table=self.table.__tablename__,
+                             rows=list(rows.values()), changed=changed,
+                             chunk_size=chunk_size)
+            await self.replicate(upsert, repeat_on_failure=True)
+        return len(rows), len(changed)
 
 
 class Read(Service):
@@ -193,6 +408,51 @@ class Read(Service):
 
         return object_
 
+    async def cached(self,
+                     specification: 'Specification',
+                     schema: Type['BaseModel'],
+                     load: Optional[Callable[[], Coroutine]] = None,
+                     resolve: Callable[['BaseTable'], Any] = lambda o: o,
+                     depends_on: tuple['BaseTable', ...] = (),
+                     suppress_error: bool = False,
+                     **additional_filters: Any) -> Optional['BaseModel']:
+        """
+        `get` served from `read_cache`. Looked up row, or one returned by
+        `load`, is passed through `resolve` and kept as `schema`, so related
+        objects are snapshotted too, their tables go to `depends_on`.
+        """
+
+        spec = {**specification(), **additional_filters}
+        table = self.table.__tablename__
+        key = (table, schema.__name__, tuple(sorted(spec.items(), key=str)))
+
+        found, value = self.read_cache.lookup(key)
+        if not found:
+            tables = (table, *(t.__tablename__ for t in depends_on))
+            versions = self.read_cache.versions(tables)
+
+            if load is None:
+                load = partial(self.get, specification, suppress_error=True,
+                               **additional_filters)
+            object_ = await load()
+
+            row = None
+            if object_ is not None:
+                row = {c.key: getattr(object_, c.key)
+                       for c in inspect(object_).mapper.column_attrs}
+                if (resolved := resolve(object_)) is not None:
+                    value = schema.model_validate(resolved,
+                                                  from_attributes=True)
+            self.read_cache.store(key, value, table, spec, row, versions)
+
+        if value is None and not suppress_error:
+            details = constants.log_unavailable_object(
+                details=constants.db_request(table_name=self._name,
+                                             specs=format_dict(spec))
+            )
+            raise HTTPException(status_code=404, detail=details)
+        return value
+
     async def all(self,
                   filter_: Optional['BinaryExpression'] = None,
                   specification: Optional['Specification'] = None,
@@ -222,6 +482,14 @@ class Read(Service):
 
 
 class Update(Read):
+    @staticmethod
+    def identity(object_: 'BaseTable') -> dict:
+        """ Primary key columns of orm object with their values. """
+
+        state = inspect(object_)
+        return {column.name: value for column, value
+                in zip(state.mapper.primary_key, state.identity)}
+
     @staticmethod
     async def update(object_: Service,
                      data: 'BaseModel',
@@ -255,8 +523,22 @@ class Update(Read):
                     suppress_error: bool = False,
                     **kwargs) -> 'BaseTable':
 
-        async def _patch(_get: GetORM, session: 'AsyncSession') -> 'BaseTable':
-            object_ = await _get(specification, session, suppress_error)
+        # specification may match several rows, `get` picks one of them on
+        # main and every database updates only it
+        get = get_method or self.get
+        found = await get(specification, self._session, suppress_error)
+        if suppress_error and found is None:
+            return None
+
+        identity = self.identity(found)
+        query = self._query.where(*(self.table.__table__.c[name] == value
+                                    for name, value in identity.items()))
+
+        async def _patch(session: 'AsyncSession') -> 'BaseTable':
+            # by key alone, whatever lookup overrides of `get` add
+            object_ = await Read.get(self, session_=session,
+                                     suppress_error=suppress_error,
+                                     _query=query)
 
             if suppress_error and object_ is None:
                 return None
@@ -264,10 +546,10 @@ class Update(Read):
             await self.update(object_, data, session)
             return object_
 
-        get = get_method or self.get
-        patch = partial(_patch, _get=get)
-
-        return await self.replicate(patch)
+        values = {field: getattr(data, field)
+                  for field in data.model_fields_set}
+        operation = self.write_operation('update', values, identity)
+        return await self.replicate(_patch, operation=operation)
 
 
 class Delete(Read):
@@ -297,7 +579,8 @@ class Delete(Read):
 
             raise NotFoundException
 
-        await self.replicate(_delete)
+        operation = self.write_operation('delete', {}, specification())
+        await self.replicate(_delete, operation=operation)
 
 
 class CreateRead(Create, Read):
@@ -59,6 +59,7 @@ LeaderID = specification_fabric('leader_id', 'leader_id')
 ChannelID = specification_fabric('channel_id', 'channel_id')
 QueryFilter = specification_fabric('query', 'query')
 MusicUserID = specification_fabric('user_id', 'user_id')
+SyncURL = specification_fabric('url', 'url')
 
 ID = specification_fabric('id')
 SessionMember = specification_fabric('user_id')
@@ -2,21 +2,31 @@ import asyncio
 from datetime import datetime
 from contextlib import suppress
 from functools import partial
-from typing import Union, Generator, Optional, Callable
+from typing import Union, Generator, Optional, Callable, TYPE_CHECKING
 
 from sqlalchemy import (
-    Text, and_, or_, DateTime, Integer, ForeignKey,
-    JSON, Engine, BigInteger, UniqueConstraint, create_engine, TypeDecorator
+    Text, and_, DateTime, Integer, ForeignKey, ForeignKeyConstraint, event,
+    Index, make_url, JSON, Engine, BigInteger, UniqueConstraint, create_engine,
+    TypeDecorator, Computed, column
 )
 from sqlalchemy.exc import IllegalStateChangeError
 from sqlalchemy.ext.asyncio import (AsyncSession, AsyncEngine,
                                     async_sessionmaker, create_async_engine)
 from sqlalchemy.dialects import mysql
-from sqlalchemy.orm import (relationship, remote, sessionmaker, mapped_column,
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.orm import (relationship, sessionmaker, mapped_column,
                             Mapped)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
 
+from src.app.pool import (MeasuredAsyncQueuePool, MeasuredQueuePool,
+                          PoolMetrics)
+from src.app.writer import SingleWriter
+
+if TYPE_CHECKING:
+    from src.config import PoolSettings, SqliteSettings
+
 Base = declarative_base()
 
 IntegerVariant = BigInteger().with_variant(Integer, 'sqlite')
@@ -33,6 +43,38 @@ class CustomDateTime(TypeDecorator):
         return value
 
 
+class SecondsBetween(FunctionElement):
+    """ Whole seconds from `begin` to `end`, in date functions of dialect. """
+
+    type = Integer()
+    name = 'seconds_between'
+    inherit_cache = True
+
+
+def _period_of(element: SecondsBetween, compiler, **kw) -> tuple[str, str]:
+    begin, end = element.clauses
+    return compiler.process(begin, **kw), compiler.process(end, **kw)
+
+
+@compiles(SecondsBetween)
+def _seconds_between(element, compiler, **kw):
+    begin, end = _period_of(element, compiler, **kw)
+    return f'CAST(EXTRACT(EPOCH FROM {end} - {begin}) AS INTEGER)'
+
+
+@compiles(SecondsBetween, 'sqlite')
+def _seconds_between_sqlite(element, compiler, **kw):
+    begin, end = _period_of(element, compiler, **kw)
+    return (f'CAST(ROUND((julianday({end}) - julianday({begin})) * 86400)'
+            f' AS INTEGER)')
+
+
+@compiles(SecondsBetween, 'mysql')
+def _seconds_between_mysql(element, compiler, **kw):
+    begin, end = _period_of(element, compiler, **kw)
+    return f'TIMESTAMPDIFF(SECOND, {begin}, {end})'
+
+
 class BaseTimePeriod:
     begin: Mapped[datetime] = mapped_column(CustomDateTime, nullable=False)
     end: Mapped[datetime] = mapped_column(CustomDateTime, nullable=True)
@@ -64,6 +106,11 @@ class SessionLike(BaseTimePeriod):
 
 class Activity(Base, PrimaryBegin):
     __tablename__ = 'activity'
+    __table_args__ = (
+        Index('ix_activity_member_period', 'member_id', 'begin', 'end'),
+    )
+    # fetch `seconds` along writes, instead of lazy loading it afterwards
+    __mapper_args__ = {'eager_defaults': True}
 
     id: Mapped[int] = mapped_column(
         ForeignKey('activity_info.app_id'),
@@ -75,6 +122,11 @@ class Activity(Base, PrimaryBegin):
         primary_key=True,
         index=True
     )
+    # stored by database once activity ends, summed by playtime queries
+    seconds: Mapped[Optional[int]] = mapped_integer(
+        Computed(SecondsBetween(column('begin'), column('end')),
+                 persisted=True),
+    )
 
     info = relationship('ActivityInfo', lazy='selectin')
 
@@ -85,6 +137,9 @@ class Leadership(Base, SessionLike):
 
 class Prescence(Base, SessionLike):
     __tablename__ = 'prescence'
+    __table_args__ = (
+        Index('ix_prescence_member_period', 'member_id', 'begin', 'end'),
+    )
 
 
 class MemberSessionAssociation(Base):
@@ -108,6 +163,43 @@ class MemberSessionAssociation(Base):
     )
 
 
+class SessionActivity(Base):
+    """
+    Activities of session members played while they were in the session,
+    filled in by `src.app.links` as prescences and activities change.
+    """
+    __tablename__ = 'session_activity'
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['app_id', 'member_id', 'begin'],
+            ['activity.id', 'activity.member_id', 'activity.begin'],
+        ),
+    )
+
+    channel_id: Mapped[int] = mapped_integer(
+        ForeignKey('session.channel_id'),
+        primary_key=True,
+    )
+    app_id: Mapped[int] = mapped_integer(primary_key=True)
+    member_id: Mapped[int] = mapped_integer(primary_key=True)
+    begin: Mapped[datetime] = mapped_column(CustomDateTime, primary_key=True)
+
+
+class Playtime(Base):
+    """
+    Seconds played per member and app over their closed activities, kept by
+    `src.app.playtime` as activities end.
+    """
+    __tablename__ = 'playtime'
+
+    member_id: Mapped[int] = mapped_integer(
+        ForeignKey('member.id'),
+        primary_key=True,
+    )
+    app_id: Mapped[int] = mapped_integer(primary_key=True)
+    seconds: Mapped[int] = mapped_integer(nullable=False, default=0)
+
+
 class Member(Base):
     __tablename__ = 'member'
 
@@ -160,35 +252,16 @@ class Session(Base, BaseTimePeriod):
     )
     activities: Mapped[list['Activity']] = relationship(
         'Activity',
-        innerjoin=True,
-        lazy='immediate',
+        secondary='session_activity',
+        primaryjoin=channel_id == SessionActivity.channel_id,
+        secondaryjoin=and_(
+            Activity.id == SessionActivity.app_id,
+            Activity.member_id == SessionActivity.member_id,
+            Activity.begin == SessionActivity.begin,
+        ),
         viewonly=True,
         uselist=True,
         order_by=Activity.begin,
-        primaryjoin=  # noqa
-        and_(
-            channel_id == remote(MemberSessionAssociation.channel_id),
-            MemberSessionAssociation.member_id == Member.id,
-            Member.id == Activity.member_id,
-            Prescence.member_id == Member.id,
-            channel_id == Prescence.channel_id,
-            or_(
-                and_(
-                    Prescence.end.isnot(None),
-                    or_(
-                        Activity.begin.between(Prescence.begin, Prescence.end),
-                        and_(
-                            Activity.end.is_not(None),
-                            Activity.end.between(Prescence.begin, Prescence.end)
-                        )
-                    )
-                ),
-                and_(
-                    Prescence.end.is_(None),
-                    Activity.begin > Prescence.begin
-                )
-            )
-        )
     )
 
 
@@ -208,6 +281,20 @@ class ActivityInfo(Base):
     )
 
 
+class SyncValidators(Base):
+    """ ETag and Last-Modified of upstream list last synced from `url`. """
+
+    __tablename__ = 'sync_validators'
+
+    url: Mapped[str] = mapped_column(
+        Text().with_variant(mysql.VARCHAR(length=512, charset='utf8'),
+                            'mysql'),
+        primary_key=True
+    )
+    etag: Mapped[Optional[str]]
+    last_modified: Mapped[Optional[str]]
+
+
 class Role(Base):
     __tablename__ = 'role'
 
@@ -294,6 +381,7 @@ class Guild(Base):
 
 
 class SessionFabric:
+    fabrics: dict[str, 'SessionFabric'] = {}
 
     def init_tables(self):
         if self.is_async:
@@ -314,54 +402,150 @@ class SessionFabric:
 
         self.is_async = is_async
 
+        self.metrics = PoolMetrics()
+        self.metrics.bind(engine)
+        self.writer: Optional[SingleWriter] = None
+
         self.init_tables()
 
     @staticmethod
-    def _build(db_uri: str,
+    def _engine_options(db_uri: str,
+                        connect_args: dict | None,
+                        pool: Optional['PoolSettings'],
+                        sqlite: Optional['SqliteSettings'],
+                        is_async: bool) -> dict:
+        url = make_url(db_uri)
+        is_sqlite = url.get_backend_name() == 'sqlite'
+        connect_args = dict(connect_args or {})
+        options = dict(echo=False, pool_pre_ping=True,
+                       connect_args=connect_args)
+
+        if is_sqlite and sqlite is not None:
+            connect_args.setdefault('check_same_thread', False)
+            connect_args.setdefault('timeout', sqlite.busy_timeout)
+
+        if pool is not None:
+            options.update(pool_pre_ping=pool.pre_ping,
+                           pool_recycle=pool.recycle)
+            # in-memory sqlite lives in its single static connection
+            if not (is_sqlite and url.database in (None, '', ':memory:')):
+                options.update(
+                    poolclass=(MeasuredAsyncQueuePool if is_async
+                               else MeasuredQueuePool),
+                    pool_size=pool.size,
+                    max_overflow=pool.max_overflow,
+                    pool_timeout=pool.timeout,
+                )
+
+        return options
+
+    @staticmethod
+    def _set_pragmas(engine: Union[AsyncEngine, Engine],
+                     sqlite: 'SqliteSettings') -> None:
+        pragmas = {
+            name: getattr(sqlite, name)
+            for name in ('journal_mode', 'synchronous', 'cache_size',
+                         'mmap_size')
+            if getattr(sqlite, name) is not None
+        }
+        if sqlite.single_writer:
+            pragmas['journal_mode'] = 'wal'  # readers never block the writer
+        if isinstance(engine, AsyncEngine):
+            engine = engine.sync_engine
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
+
+    def _use_single_writer(self,
+                           connect_args: dict,
+                           sqlite: 'SqliteSettings') -> None:
+        """ Writes go through `self.writer`, pooled connections only read. """
+
+        self.writer = SingleWriter(
+            url=self.engine.url,
+            connect_args=connect_args,
+            configure=partial(self._set_pragmas, sqlite=sqlite),
+            window=sqlite.writer_window,
+            max_batch=sqlite.writer_batch,
+        )
+
+        @event.listens_for(self.engine.sync_engine, 'connect')
+        def query_only(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA query_only=1')
+            cursor.close()
+
+        # connections pooled while creating tables are writable ones
+        asyncio.run(self.engine.dispose())
+
+    @classmethod
+    def _build(cls,
+               db_uri: str,
                connect_args: dict | None = None,
-               is_async: bool = True) -> tuple[AsyncEngine, async_sessionmaker]:
-        if connect_args is None:
-            connect_args = {}
+               is_async: bool = True,
+               pool: Optional['PoolSettings'] = None,
+               sqlite: Optional['SqliteSettings'] = None) \
+            -> tuple[AsyncEngine, async_sessionmaker]:
+        options = cls._engine_options(db_uri, connect_args, pool, sqlite,
+                                      is_async)
 
         if is_async:
-            engine = create_async_engine(
-                db_uri,
-                echo=False,
-                pool_pre_ping=True,
-                connect_args=connect_args
-            )
+            engine = create_async_engine(db_uri, **options)
             session_maker = async_sessionmaker(
                 engine, class_=AsyncSession, expire_on_commit=False
             )
         else:
-            engine = create_engine(
-                db_uri,
-                echo=False,
-                pool_pre_ping=True,
-                connect_args=connect_args
-            )
+            engine = create_engine(db_uri, **options)
             session_maker = sessionmaker(engine, expire_on_commit=False)
 
+        if sqlite is not None and engine.dialect.name == 'sqlite':
+            cls._set_pragmas(engine, sqlite)
+
         return engine, session_maker
 
     @classmethod
     def build(cls,
               db_uri: str,
               connect_args: Optional[dict] = None,
-              is_async: bool = True) -> Callable:
+              is_async: bool = True,
+              name: Optional[str] = None,
+              pool: Optional['PoolSettings'] = None,
+              sqlite: Optional['SqliteSettings'] = None) -> Callable:
         engine, session_maker = cls._build(
             db_uri=db_uri,
             connect_args=connect_args,
             is_async=is_async,
+            pool=pool,
+            sqlite=sqlite,
         )
         self = cls(
             engine=engine,
             session_maker=session_maker,
             is_async=is_async,
         )
+        if (is_async and sqlite is not None and sqlite.single_writer
+                and engine.dialect.name == 'sqlite'
+                and engine.url.database not in (None, '', ':memory:')):
+            options = cls._engine_options(db_uri, connect_args, pool, sqlite,
+                                          is_async)
+            self._use_single_writer(options['connect_args'], sqlite)
+        if name is not None:
+            cls.fabrics[name] = self
 
         return self.get_async if self.is_async else self.get_sync
 
+    @classmethod
+    def name_of(cls, engine: Union[AsyncEngine, Engine]) -> Optional[str]:
+        """ Registered name of fabric built around given engine. """
+
+        for name, fabric in cls.fabrics.items():
+            if fabric.engine is engine:
+                return name
+
     async def get_async(self) -> Generator:
         with suppress(IllegalStateChangeError):
             async with self.session_maker() as session:
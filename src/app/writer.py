@@ -0,0 +1,130 @@
+from asyncio import Future, Queue as AsyncQueue, Task, get_running_loop, wait_for
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import URL, event
+from sqlalchemy.ext.asyncio import (AsyncConnection, AsyncEngine, AsyncSession,
+                                    create_async_engine)
+
+from src.constants import constants
+from src.utils import logger
+
+Write = Callable[..., Awaitable[Any]]
+
+
+class SingleWriter:
+    """
+    Funnels writes to a sqlite database through one dedicated connection.
+    Writes arriving within `window` seconds of the first one share a single
+    transaction (group commit), each runs in its own savepoint so a failing
+    write is rolled back alone. Callers get their result once the group is
+    committed, so it is visible to readers right away.
+    """
+
+    def __init__(self,
+                 url: URL,
+                 connect_args: dict,
+                 configure: Callable[[AsyncEngine], None] = lambda _: None,
+                 window: float = 0.002,
+                 max_batch: int = 100):
+        self.url = url
+        self.connect_args = connect_args
+        self.configure = configure  # e.g. set pragmas on new connections
+        self.window = window
+        self.max_batch = max_batch
+
+        self._engine: Optional[AsyncEngine] = None
+        self._connection: Optional[AsyncConnection] = None
+        self._queue: Optional[AsyncQueue] = None
+        self._task: Optional[Task] = None
+
+    def _create_engine(self) -> AsyncEngine:
+        engine = create_async_engine(self.url, connect_args=self.connect_args,
+                                     pool_size=1, max_overflow=0)
+
+        # let SAVEPOINT work with sqlite driver and take write lock upfront
+        @event.listens_for(engine.sync_engine, 'connect')
+        def autocommit_driver(dbapi_connection, _):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine.sync_engine, 'begin')
+        def begin_immediate(connection):
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+        self.configure(engine)
+        return engine
+
+    def _ensure_started(self) -> None:
+        loop = get_running_loop()
+        if self._task is not None and self._task.get_loop() is loop \
+                and not self._task.done():
+            return
+
+        self._queue = AsyncQueue()
+        self._task = loop.create_task(self._run())
+
+    async def submit(self, write: Write) -> Any:
+        """ Run `write(session=...)` in the next group commit. """
+
+        self._ensure_started()
+        future = get_running_loop().create_future()
+        await self._queue.put((write, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if (timeout := deadline - loop.time()) <= 0:
+                    break
+                try:
+                    batch.append(await wait_for(self._queue.get(), timeout))
+                except TimeoutError:
+                    break
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[Write, Future]]) -> None:
+        outcomes = []
+        try:
+            if self._connection is None:
+                self._engine = self._engine or self._create_engine()
+                self._connection = await self._engine.connect()
+
+            async with self._connection.begin():
+                for write, future in batch:
+                    session = AsyncSession(
+                        bind=self._connection,
+                        join_transaction_mode='create_savepoint',
+                        expire_on_commit=False,
+                    )
+                    try:
+                        outcomes.append((future, await write(session=session),
+                                         None))
+                    except Exception as e:  # noqa
+                        outcomes.append((future, None, e))
+                    finally:
+                        await session.close()
+        except Exception as e:  # noqa
+            logger.warning(constants.log_group_commit_failed(error=str(e)))
+            outcomes = [(future, None, e) for _, future in batch]
+
+        logger.debug(constants.log_group_commit(num=len(batch)))
+        for future, result, error in outcomes:
+            if future.done():  # caller was cancelled
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Coroutine, Literal, Optional
+
+from cachetools import TTLCache
+
+from src.constants import constants
+from src.utils import logger
+
+Transition = Literal['begin', 'end']
+# key of member app, transition and request payload of `member_activity`
+Event = tuple[tuple[int, int], Transition, dict]
+
+
+class ActivityIngest:
+    """
+    Activity transitions on their way to the database. Presence updates
+    arrive once per guild shared with the member, so a transition repeating
+    the last one of the same member app within `window` seconds is dropped.
+    An end followed by a begin of the same app within the window, e.g. a
+    game restart, cancel each other out. Events left are submitted in order
+    `window` seconds after the first of them, `max_batch` at most at once,
+    by tasks started by `spawn`. Events of a dropped task wait for the next
+    submit.
+    """
+
+    def __init__(self,
+                 submit: Callable[[list[dict]], Awaitable],
+                 window: float,
+                 max_batch: int = 100,
+                 maxsize: int = 10_000,
+                 spawn: Callable[[Coroutine], Optional[asyncio.Task]] = (
+                     asyncio.create_task
+                 )):
+        self.submit = submit
+        self.window = window
+        self.max_batch = max_batch
+        self.spawn = spawn
+
+        self._last: TTLCache[tuple[int, int], Transition] = TTLCache(
+            maxsize=maxsize, ttl=window
+        )
+        self._pending: list[Event] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._submits: set[asyncio.Task] = set()
+        self._lock = asyncio.Lock()  # batches are submitted one by one
+
+        self.duplicates = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def begin(self, member_id: int, app_id: int, at: datetime) -> None:
+        self._add((member_id, app_id), 'begin',
+                  {'member_id': member_id, 'id': app_id,
+                   'begin': at, 'end': None})
+
+    def end(self, member_id: int, app_id: int, at: datetime) -> None:
+        self._add((member_id, app_id), 'end',
+                  {'member_id': member_id, 'id': app_id, 'end': at})
+
+    def _add(self, key: tuple[int, int], transition: Transition,
+             payload: dict) -> None:
+        if self._last.get(key) == transition:
+            self.duplicates += 1
+            return
+        self._last[key] = transition
+
+        if transition == 'begin':
+            for event in reversed(self._pending):
+                if event[0] == key:
+                    if event[1] == 'end':  # app went on, nothing to write
+                        self._pending.remove(event)
+                        self.coalesced += 1
+                        return
+                    break
+
+        self._pending.append((key, transition, payload))
+        if len(self._pending) >= self.max_batch:
+            self._submit_pending()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.window, self._submit_later
+            )
+
+    def _submit_later(self) -> None:
+        self._timer = None
+        self._submit_pending()
+
+    def _take_pending(self) -> list[Event]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        events, self._pending = self._pending, []
+        return events
+
+    def _submit_pending(self) -> None:
+        if not (events := self._take_pending()):
+            return
+
+        batch = [payload for _, _, payload in events]
+        if (task := self.spawn(self._submit(batch))) is None:
+            self._pending[:0] = events  # dropped, go with the next batch
+            return
+        self._submits.add(task)
+        task.add_done_callback(self._submits.discard)
+
+    async def _submit(self, batch: list[dict]) -> None:
+        async with self._lock:
+            try:
+                await self.submit(batch)
+            except Exception as e:
+                logger.exception(
+                    constants.log_activity_batch_failed(num=len(batch),
+                                                        error=e)
+                )
+
+    async def close(self) -> None:
+        """
+        Wait for every started batch and submit pending events right away,
+        without `spawn`, which may no longer start tasks on shutdown.
+        """
+
+        events = self._take_pending()
+        await asyncio.gather(*self._submits)
+        if events:
+            await self._submit([payload for _, _, payload in events])
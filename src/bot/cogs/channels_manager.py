@@ -30,7 +30,9 @@ class ChannelsManager(DiscordFeaturesMixin):
         calculate possible current behavior
         """
 
+        since = self.sessions.version
         sessions = await self.db.get_unclosed_sessions()
+        self.sessions.reset(sessions, since)
         for session in sessions:
             if (channel := self.bot.get_channel(session['channel_id'])) is None:
                 continue  # channel don't exist
@@ -53,6 +55,9 @@ class ChannelsManager(DiscordFeaturesMixin):
 
     @handle_created_channels.before_loop
     async def distribute_create_channel_members(self) -> None:
+        since = self.sessions.version
+        self.sessions.reset(await self.db.get_unclosed_sessions(), since)
+
         for guild_id, channels in self.bot.guild_channels.items():
             if members := channels.create.members:
                 user = members[0]
@@ -68,6 +73,21 @@ class ChannelsManager(DiscordFeaturesMixin):
     ):
         self.bot.dispatch("activity", before, after)
 
+    @commands.Cog.listener()
+    async def on_session_begin(self, creator: 'Member',
+                               channel: 'VoiceChannel'):
+        self.sessions.begin(channel.id, creator.id, name=channel.name,
+                            creator_id=creator.id)
+
+    @commands.Cog.listener()
+    async def on_leader_change(self, channel: 'VoiceChannel',
+                               leader: 'Member'):
+        self.sessions.change_leader(channel.id, leader.id)
+
+    @commands.Cog.listener()
+    async def on_session_over(self, channel: 'VoiceChannel'):
+        self.sessions.over(channel.id)
+
     @commands.Cog.listener()
     async def on_voice_state_update(self,
                                     member: 'Member',
@@ -109,7 +129,7 @@ class ChannelsManager(DiscordFeaturesMixin):
                                                   overwrites=overwrites)
 
     async def user_create_channel(self, user: 'Member', guild_id: int):
-        if await self.db.get_user_session(user.id) and self._cache.get(user.id):
+        if await self.get_user_session(user.id) and self._cache.get(user.id):
             await user.send(
                 constants.wait_cooldown(cooldown=Config.creation_cooldown),
                 delete_after=10
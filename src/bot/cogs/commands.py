@@ -4,13 +4,15 @@ from contextlib import suppress
 from typing import TYPE_CHECKING
 
 from discord import app_commands, NotFound, Embed
+from discord.ext.commands import Cog
 
 from src.constants import constants
 from src.bot.mixins import DiscordFeaturesMixin
 from src.utils import _init_channels
 
 if TYPE_CHECKING:
-    from discord import Interaction, Member, Guild, VoiceChannel
+    from discord import (Interaction, Member, Guild, VoiceChannel,
+                         RawMessageDeleteEvent)
 
 
 class Commands(DiscordFeaturesMixin):
@@ -170,6 +172,7 @@ class Commands(DiscordFeaturesMixin):
 
     async def update_sess_name(self, channel: 'VoiceChannel', name: str):
         session = await self.db.session_update(channel_id=channel.id, name=name)
+        self.sessions.rename(channel.id, session['name'])
         await self.db.user_update(id=session["leader_id"],
                                   default_sess_name=session['name'])
 
@@ -179,11 +182,11 @@ class Commands(DiscordFeaturesMixin):
 
         logger_channel = guild_channels.logger
 
-        msg = await logger_channel.fetch_message(session['message_id'])
+        msg = await self.messages.get(logger_channel, session['message_id'])
         dct = msg.embeds[0].to_dict()
         dct['title'] = f"Активен сеанс: {name}"
         embed = Embed.from_dict(dct)
-        await msg.edit(embed=embed)
+        self.messages.remember(await msg.edit(embed=embed))
 
     @staticmethod
     async def rename_channel(channel: 'VoiceChannel', name: str):
@@ -204,6 +207,10 @@ class Commands(DiscordFeaturesMixin):
             await self.rename_channel(channel, name)
             await self.update_sess_name(channel, name)
 
+    @Cog.listener()
+    async def on_raw_message_delete(self, payload: 'RawMessageDeleteEvent'):
+        self.messages.forget(payload.message_id)
+
 
 async def setup(bot):
     await bot.add_cog(Commands(bot))
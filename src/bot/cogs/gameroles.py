@@ -1,46 +1,25 @@
 import re
 from contextlib import suppress
-from io import BytesIO
+from functools import partial
 from typing import TYPE_CHECKING
 
 from discord import errors, Color, ActivityType, HTTPException
 from discord.ext.commands import Cog
-from PIL import Image
 from cachetools import TTLCache
-from httpx import AsyncClient
 
+from src.bot.icons import IconCache
 from src.bot.mixins import BaseCogMixin
 
 if TYPE_CHECKING:
     from discord import Emoji, Member, RawReactionActionEvent
 
 
-def get_dominant_color(
-        raw_img: bytes,
-        colors_num: int = 15,
-        resize: int = 64
-) -> tuple[int, int, int] | None:
-    img = Image.open(BytesIO(raw_img))
-    img = img.copy()
-    img.thumbnail((resize, resize))
-
-    paletted = img.convert('P', palette=Image.ADAPTIVE, colors=colors_num)
-    palette = paletted.getpalette()
-    color_counts = sorted(paletted.getcolors(), reverse=True)
-
-    for i in range(colors_num):
-        palette_index = color_counts[i][1]
-        dc = tuple(palette[palette_index * 3:palette_index * 3 + 3])  # dominant
-        sq_dist = dc[0] * dc[0] + dc[1] * dc[1] + dc[2] * dc[2]
-        if sq_dist > 8:  # drop too dark colors
-            return dc
-
-
 class GameRoleHandlers(BaseCogMixin):
 
     def __init__(self, bot):
         super(GameRoleHandlers, self).__init__(bot)
         self.cache = TTLCache(maxsize=100, ttl=2)
+        self.icons = IconCache(spawn=partial(self.tasks.spawn, 'rest'))
 
     async def manage_roles(
             self,
@@ -94,14 +73,10 @@ class GameRoleHandlers(BaseCogMixin):
                :32]
         icon_url = activity_info['icon_url'][:-10]
 
-        async with AsyncClient() as client:
-            r = await client.request('get', icon_url)
-            content = r.content
-
-        if not content:
+        if not (icon := await self.icons.get(app_id, icon_url)):
             raise TypeError('Adding only a roles registered by discord API')
 
-        dominant_color = get_dominant_color(content)
+        content = icon.image
         guild = user.guild
 
         kw = dict(
@@ -110,7 +85,7 @@ class GameRoleHandlers(BaseCogMixin):
             mentionable=True,
             display_icon=content,
             permissions=guild.default_role.permissions,
-            color=Color.from_rgb(*dominant_color)
+            color=Color.from_rgb(*icon.color)
         )
         try:
             role = await guild.create_role(**kw)
@@ -1,21 +1,29 @@
 import asyncio
+import time
 from collections import defaultdict
 from datetime import datetime
 from contextlib import suppress
-from typing import TYPE_CHECKING, Optional
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Coroutine, Optional
 
-from cachetools import TTLCache
-from discord import Embed, Color, NotFound
+from cachetools import LRUCache, TTLCache
+from discord import Embed, Color, HTTPException, NotFound
 from discord.ext.commands import Cog
 
 from src.constants import constants
 from src.config import Config
-from src.utils import now, create_if_not_exists
+from src.utils import logger, now
+from src.bot.activities import ActivityIngest
+from src.bot.messages import MessageCache
 from src.bot.mixins import DiscordFeaturesMixin
 from .views import LoggerView
 
 if TYPE_CHECKING:
-    from discord import Member, VoiceChannel, VoiceState, Guild, Emoji
+    from discord import (Member, VoiceChannel, VoiceState, Guild, Emoji,
+                         TextChannel)
+
+# changes embed in place or returns a new one to replace it
+EmbedChange = Callable[[Embed], Optional[Embed]]
 
 
 def create_embed(
@@ -52,6 +60,95 @@ def create_embed(
     return embed
 
 
+class EmbedEditor:
+    """
+    Coalesces edits of logger messages. Changes are queued per message and
+    applied together to its latest embed, sent as one edit `window` seconds
+    after the first of them and not sooner than `interval` seconds after the
+    previous edit. Messages come from `messages`, which is updated by every
+    edit and forgets a message once its final change is sent. Failed edits
+    are tried again after `interval` seconds. Flushes of messages run as
+    tasks started by `spawn`.
+    """
+
+    def __init__(self,
+                 messages: MessageCache,
+                 window: float,
+                 interval: float,
+                 maxsize: int = 1_000,
+                 spawn: Callable[[Coroutine], Optional[asyncio.Task]] = (
+                     asyncio.create_task
+                 )):
+        self.messages = messages
+        self.window = window
+        self.interval = interval
+        self.spawn = spawn
+
+        self._last_edit: TTLCache[int, float] = TTLCache(maxsize=maxsize,
+                                                         ttl=interval)
+        self._changes: defaultdict[int, list[EmbedChange]] = defaultdict(list)
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._final: LRUCache[int, bool] = LRUCache(maxsize=maxsize)
+
+    def edit(self, channel: 'TextChannel', message_id: int,
+             change: EmbedChange, final: bool = False) -> None:
+        """ Queue change, those after a `final` one are ignored. """
+
+        if message_id in self._final:
+            return
+        if final:
+            self._final[message_id] = True
+        self._changes[message_id].append(change)
+        # task dropped by `spawn` before it started is started again
+        if (task := self._tasks.get(message_id)) is None or task.done():
+            task = self.spawn(self._flush(channel, message_id))
+            if task is not None:
+                self._tasks[message_id] = task
+
+    def forget(self, message_id: int) -> None:
+        if (task := self._tasks.pop(message_id, None)) is not None:
+            task.cancel()
+        self._changes.pop(message_id, None)
+        self._last_edit.pop(message_id, None)
+        self.messages.forget(message_id)
+
+    async def _flush(self, channel: 'TextChannel', message_id: int) -> None:
+        try:
+            while self._changes.get(message_id):
+                last_edit = self._last_edit.get(message_id)
+                delay = self.window if last_edit is None else max(
+                    self.window, last_edit + self.interval - time.monotonic()
+                )
+                await asyncio.sleep(delay)
+
+                changes = self._changes.pop(message_id, [])
+                try:
+                    message = await self.messages.get(channel, message_id)
+                    embed = message.embeds[0].copy()
+                    for change in changes:
+                        embed = change(embed) or embed
+
+                    self.messages.remember(await message.edit(embed=embed))
+                except NotFound:
+                    raise
+                except HTTPException as e:
+                    logger.warning(constants.log_embed_edit_failed(
+                        message_id=message_id, error=e
+                    ))
+                    # applied to a copy, so the same changes are tried again
+                    self._changes[message_id][:0] = changes
+                self._last_edit[message_id] = time.monotonic()
+
+            if message_id in self._final:  # message won't change anymore
+                self.messages.forget(message_id)
+        except NotFound:
+            self.messages.forget(message_id)
+            self._changes.pop(message_id, None)
+        finally:
+            if self._tasks.get(message_id) is asyncio.current_task():
+                del self._tasks[message_id]
+
+
 class LoggerHelpers:
     bot = db = None
 
@@ -64,7 +161,9 @@ class LoggerHelpers:
         return dt.strftime('%H:%M %d.%m.%y')
 
     @staticmethod
-    def dt_from_str(s: str) -> datetime:
+    def dt_from_str(s: str | datetime) -> datetime:
+        if isinstance(s, datetime):  # direct requests backend
+            return s
         return datetime.strptime(s[:19], '%Y-%m-%dT%H:%M:%S')
 
     def datetime_handler(self, x):
@@ -100,9 +199,17 @@ class LoggerEventHandlers(DiscordFeaturesMixin, LoggerHelpers):
         self.cache = TTLCache(maxsize=1_000, ttl=5)
 
         self.vc_status = defaultdict(str)
-
-        self.bot.loop.create_task(self.register_logger_views())
-        self.bot.loop.create_task(self.add_members())
+        self.embeds = EmbedEditor(self.messages,
+                                  window=Config.embed_edit_window,
+                                  interval=Config.embed_edit_interval,
+                                  spawn=partial(self.tasks.spawn, 'rest'))
+        self.activities = ActivityIngest(self.db.member_activities,
+                                         window=Config.activity_window,
+                                         max_batch=Config.activity_batch_size,
+                                         spawn=partial(self.tasks.spawn, 'db'))
+
+        self.tasks.spawn('db', self.register_logger_views())
+        self.tasks.spawn('db', self.add_members())
 
     async def register_logger_views(self):
         sessions = await self.db.get_all_sessions()
@@ -111,18 +218,16 @@ class LoggerEventHandlers(DiscordFeaturesMixin, LoggerHelpers):
             self.bot.add_view(view, message_id=session['message_id'])
 
     async def add_members(self):
-        unique_members = set(member
-                             for guild in self.bot.guilds
-                             for member in guild.members)
-        tasks = (
-            create_if_not_exists(
-                get_url=f'user/{member.id}',
-                post_url='user',
-                object_={'id': member.id, 'name': member.display_name}
-            )
-            for member in unique_members
-        )
-        await asyncio.gather(*tasks)
+        unique_members = {member.id: member.display_name
+                          for guild in self.bot.guilds
+                          for member in guild.members}
+        await self.db.users_create([
+            {'id': member_id, 'name': name}
+            for member_id, name in unique_members.items()
+        ])
+
+    async def cog_unload(self) -> None:
+        await self.activities.close()
 
     async def update_embed_members(self, channel: 'VoiceChannel'):
 
@@ -130,20 +235,21 @@ class LoggerEventHandlers(DiscordFeaturesMixin, LoggerHelpers):
                 channel.guild.id)) is None:
             return
 
-        session = await self.db.get_session(channel.id)
-        msg_id = session['message_id']
-
-        message = await guild_channels.logger.fetch_message(msg_id)
-        members = await self.db.get_session_members(channel.id)
-        embed = message.embeds[0]
+        if (session := await self.db.get_session_detail(channel.id)) is None:
+            return
 
-        embed.set_field_at(
-            2,
-            name='├ Участники',
-            value='└ ' + ', '.join(f'<@{member["id"]}>' for member in members),
-            inline=False
+        members = session['members']
+        self.embeds.edit(
+            guild_channels.logger,
+            session['message_id'],
+            lambda embed: embed.set_field_at(
+                2,
+                name='├ Участники',
+                value='└ ' + ', '.join(f'<@{member["id"]}>'
+                                       for member in members),
+                inline=False
+            ),
         )
-        await message.edit(embed=embed)
 
     async def add_activity_voice_channel(self, channel_id: int, emoji: 'Emoji'):
 
@@ -159,10 +265,9 @@ class LoggerEventHandlers(DiscordFeaturesMixin, LoggerHelpers):
             app_id: int
     ) -> None:
 
-        session = await self.db.get_session(channel.id)
-        app_info = await self.db.get_activity_info(app_id)
+        session = await self.db.get_session_detail(channel.id, app_id)
 
-        if session and app_info:
+        if session and (app_info := session['activity']):
             message_id, icon_url = session['message_id'], app_info['icon_url']
 
             guild_id = channel.guild.id
@@ -172,15 +277,17 @@ class LoggerEventHandlers(DiscordFeaturesMixin, LoggerHelpers):
 
             logger_channel = guild_channels.logger
 
-            msg = await logger_channel.fetch_message(message_id)
-
-            embed = msg.embeds[0]
-            embed.set_thumbnail(url=icon_url)
-            await msg.edit(embed=embed)
-            if emoji_db := await self.db.get_activity_emoji(app_id):
-                emoji = self.bot.get_emoji(emoji_db['id'])
-                self.bot.loop.create_task(msg.add_reaction(emoji))
-                self.bot.loop.create_task(
+            self.embeds.edit(
+                logger_channel,
+                message_id,
+                lambda embed: embed.set_thumbnail(url=icon_url),
+            )
+            if emoji_id := app_info['emoji_id']:
+                emoji = self.bot.get_emoji(emoji_id)
+                msg = await self.messages.get(logger_channel, message_id)
+                self.tasks.spawn('reactions', msg.add_reaction(emoji))
+                self.tasks.spawn(
+                    'rest',
                     self.add_activity_voice_channel(channel_id=channel.id,
                                                     emoji=emoji)
                 )
@@ -278,6 +385,7 @@ class Logger(LoggerEventHandlers):
             embed=embed,
             view=LoggerView(self.bot, self.datetime_handler)
         )
+        self.messages.remember(msg)
         await self.db.session_update(
             name=name,
             creator_id=creator.id,
@@ -291,7 +399,7 @@ class Logger(LoggerEventHandlers):
 
     @Cog.listener()
     async def on_session_over(self, channel: 'VoiceChannel'):
-        session = await self.db.get_session(channel.id)
+        session = await self.db.get_session_detail(channel.id)
         if session is None:
             return
 
@@ -303,7 +411,7 @@ class Logger(LoggerEventHandlers):
 
         name, msg_id = session['name'], session['message_id']
         try:
-            msg = await logger_channel.fetch_message(msg_id)
+            msg = await self.messages.get(logger_channel, msg_id)
         except NotFound:
             return
 
@@ -316,28 +424,31 @@ class Logger(LoggerEventHandlers):
         await self.db.session_update(channel_id=channel.id, end=end)
 
         if sess_duration.seconds < Logger.MIN_SESS_DURATION:
+            self.embeds.forget(msg_id)
             with suppress(NotFound):
                 await msg.delete()
             return
 
         duration_field = f"├ **`{str(sess_duration).split('.')[0]}`**"
         members_mention = (f'<@{member["id"]}>' for member in
-                           await self.db.get_session_members(channel.id))
+                           session['members'])
         members_field = '└ ' + ', '.join(members_mention)
 
-        embed = create_embed(
-            name,
-            members_field,
-            None,
-            self.fmt(begin),
-            self.fmt(end),
-            duration_field,
-            msg.embeds[0].thumbnail.url,
-            msg.embeds[0].footer.text,
-            msg.embeds[0].footer.icon_url
-        )
+        def session_over_embed(embed: Embed) -> Embed:
+            return create_embed(
+                name,
+                members_field,
+                None,
+                self.fmt(begin),
+                self.fmt(end),
+                duration_field,
+                embed.thumbnail.url,
+                embed.footer.text,
+                embed.footer.icon_url
+            )
 
-        await msg.edit(embed=embed)
+        self.embeds.edit(logger_channel, msg_id, session_over_embed,
+                         final=True)
 
     @Cog.listener()
     async def on_activity(
@@ -345,39 +456,26 @@ class Logger(LoggerEventHandlers):
             before: Optional['Member'],
             after: 'Member',
     ):
-        dt = now()
-
-        voice_channel = self.get_voice_channel(after)
         before_app_id = self.get_app_id(before)
         after_app_id = self.get_app_id(after)
+        if before_app_id == after_app_id:  # e.g. rich presence details
+            return
+
+        dt = now()
+        # dispatched once per guild shared with member, ingestion drops
+        # repeated transitions
+        if before_app_id:
+            self.activities.end(before.id, before_app_id, dt)
 
         if after_app_id:
-            # bot call with same data when registered same user from
-            # different guilds
-
-            self.bot.loop.create_task(
-                self.db.member_activity(
-                    member_id=after.id,
-                    id=after_app_id,
-                    begin=dt,
-                    end=None,
-                )
-            )
+            self.activities.begin(after.id, after_app_id, dt)
 
-            if voice_channel:
-                self.bot.loop.create_task(
+            if voice_channel := self.get_voice_channel(after):
+                self.tasks.spawn(
+                    'rest',
                     self.update_activity_icon(voice_channel, after_app_id)
                 )
 
-        if before_app_id:
-            self.bot.loop.create_task(
-                self.db.member_activity(
-                    member_id=before.id,
-                    id=before_app_id,
-                    end=dt
-                )
-            )
-
     @Cog.listener()
     async def on_leader_change(
             self,
@@ -393,14 +491,16 @@ class Logger(LoggerEventHandlers):
             return
         logger_channel = guild_channels.logger
 
-        msg = await logger_channel.fetch_message(session['message_id'])
         name = await self.get_user_sess_name(leader)
-        embed: Embed = msg.embeds[0]
-        embed.title = constants.active_session(name=name)
-        embed.set_field_at(1, name='Текущий лидер', value=leader.mention)
 
-        self.bot.loop.create_task(msg.edit(embed=embed))
-        self.bot.loop.create_task(
+        def leader_embed(embed: Embed) -> Embed:
+            embed.title = constants.active_session(name=name)
+            return embed.set_field_at(1, name='Текущий лидер',
+                                      value=leader.mention)
+
+        self.embeds.edit(logger_channel, session['message_id'], leader_embed)
+        await self.tasks.submit(
+            'db',
             self.db.update_leader(
                 channel_id=channel.id,
                 member_id=leader.id,
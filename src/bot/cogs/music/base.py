@@ -187,7 +187,8 @@ class MusicBase(DiscordFeaturesMixin):
                                inline=False)
             embed.set_thumbnail(url=thumbnail_url)
             try:
-                await message.edit(embed=embed)
+                message = await message.edit(embed=embed)
+                player.store('message', self.messages.remember(message))
             except discord.errors.NotFound:
                 # message were deleted for source reason, just recreate it
                 await self.clear_player_message(player)
@@ -212,12 +213,12 @@ class MusicBase(DiscordFeaturesMixin):
         message = await self.log_message(
             channel.send(embed=embed, view=self.view)
         )
-        player.store('message', message)
+        player.store('message', self.messages.remember(message))
 
-    @staticmethod
-    async def clear_player_message(player: lavalink.DefaultPlayer):
+    async def clear_player_message(self, player: lavalink.DefaultPlayer):
         with suppress(AttributeError):
             message = player.fetch('message')
+            self.messages.forget(message.id)
             await message.delete()
         player.store('message', None)
 
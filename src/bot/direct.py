@@ -0,0 +1,292 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Type, TypeVar
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import inspect, Row
+
+from src.app import schemas, tables
+from src.app.database import open_sessions
+from src.app.dependencies import default_period, limit
+from src.app.routers.activity.services import SrvActivities
+from src.app.routers.activity_info import SrvActivityInfo, SrvSyncValidators
+from src.app.routers.emoji import SrvEmoji
+from src.app.routers.guild import SrvGuild
+from src.app.routers.leadership.services import SrvLeadership
+from src.app.routers.music.services import SrvFavoriteMusic
+from src.app.routers.prescence.services import SrvPrescence
+from src.app.routers.role.services import SrvRole
+from src.app.routers.sent_message import SrvSentMessage
+from src.app.routers.session.services import SrvSession
+from src.app.routers.user.services import SrvUser
+from src.app.service import Service
+from src.app.specification import (ActivityID, AppID, EmojiID, LeaderID,
+                                   MessageID, MusicUserID, RoleID, SessionID,
+                                   SessionMember, SyncURL, UserID)
+from src.app.tables import Base as BaseTable
+from src.bot.requests import BasicRequests
+from src.utils import logger
+
+ServiceT = TypeVar('ServiceT', bound=Service)
+
+
+def as_record(obj: Any) -> Any:
+    """ Plain column values of orm rows, without json encoding. """
+
+    if obj is None or isinstance(obj, dict):
+        return obj
+    if isinstance(obj, BaseModel):  # cached snapshot
+        return obj.model_dump()
+    if isinstance(obj, Row):
+        return obj._asdict()
+    if isinstance(obj, BaseTable):
+        mapper = inspect(obj).mapper
+        return {attr.key: getattr(obj, attr.key)
+                for attr in mapper.column_attrs}
+    if isinstance(obj, (list, tuple)):
+        return [as_record(item) for item in obj]
+    return obj
+
+
+@asynccontextmanager
+async def service(service_type: Type[ServiceT]) -> AsyncIterator[ServiceT]:
+    """
+    Service bound to pooled sessions of every backend. API errors are
+    swallowed the same way the HTTP backend turns them into `detail`
+    payloads, so the calling method just returns None.
+    """
+
+    async with open_sessions() as sessions:
+        try:
+            yield service_type(sessions=sessions)
+        except (HTTPException, ValidationError) as e:
+            logger.debug(getattr(e, 'detail', e))
+
+
+class DirectRequests(BasicRequests):
+    """ Calls API services in-process, skipping HTTP and JSON encoding. """
+
+    async def update_leader(
+            self,
+            *,
+            channel_id,
+            member_id,
+            begin,
+            update_sess=True
+    ) -> None:
+        if update_sess and member_id is not None:  # close session
+            await self.session_update(
+                channel_id=channel_id,
+                leader_id=member_id
+            )
+        async with service(SrvLeadership) as srv:
+            await srv.post(
+                schemas.SessionLike(channel_id=channel_id,
+                                    member_id=member_id,
+                                    begin=begin)
+            )
+
+    async def member_activity(self, **activity: dict[int | str]) -> None:
+        async with service(SrvActivities) as srv:
+            if activity.get('end'):  # update
+                await srv.patch(schemas.EndActivity(**activity))
+            else:  # create
+                await srv.post(schemas.Activity(**activity))
+
+    async def member_activities(self, events: list[dict]) -> dict:
+        async with service(SrvActivities) as srv:
+            events = [schemas.ActivityEvent(**event) for event in events]
+            return {'applied': await srv.ingest(events)}
+
+    async def session_update(self, **session: dict[int | str]) -> dict:
+        create_channel = session.get('creator_id')
+
+        if create_channel:  # create
+            async with service(SrvSession) as srv:
+                sess = as_record(await srv.post(schemas.Session(**session)))
+            await self.update_leader(
+                channel_id=session['channel_id'],
+                member_id=session['leader_id'],
+                begin=session['begin'],
+                update_sess=False,
+            )
+            return sess
+
+        channel_id = session.pop('channel_id')  # update
+        async with service(SrvSession) as srv:
+            return as_record(
+                await srv.patch(SessionID(channel_id),
+                                schemas.AnyFields(**session))
+            )
+
+    async def user_create(self, **user: dict[int | str]) -> None:
+        async with service(SrvUser) as srv:
+            await srv.post(schemas.User(**user))
+
+    async def users_create(self, users: list[dict]) -> dict:
+        async with service(SrvUser) as srv:
+            users = [schemas.User(**user) for user in users]
+            return {'created': await srv.post_many(users)}
+
+    async def activity_infos_upsert(self, infos: list[dict]) -> dict:
+        async with service(SrvActivityInfo) as srv:
+            infos = [schemas.ActivityInfo(**info) for info in infos]
+            created, updated = await srv.upsert_many(infos)
+            return {'created': created, 'updated': updated}
+
+    async def sync_validators_upsert(self, validators: dict) -> dict:
+        async with service(SrvSyncValidators) as srv:
+            await srv.upsert_many([schemas.SyncValidators(**validators)])
+            return validators
+
+    async def user_update(self, **user: dict[int | str: int | str]) -> None:
+        user_id: int = user.pop('id')
+        async with service(SrvUser) as srv:
+            await srv.patch(SessionMember(user_id), schemas.AnyFields(**user))
+
+    async def role_create(self, role_id: int, app_id: int, guild_id: int):
+        async with service(SrvRole) as srv:
+            await srv.post(
+                schemas.Role(id=role_id, app_id=app_id, guild_id=guild_id)
+            )
+
+    async def role_delete(self, role_id: int) -> None:
+        async with service(SrvRole) as srv:
+            await srv.delete(RoleID(role_id))
+
+    async def emoji_create(self, emoji_id: int, role_id: int):
+        async with service(SrvEmoji) as srv:
+            await srv.post(schemas.Emoji(id=emoji_id, role_id=role_id))
+
+    async def music_create(self, data: dict) -> dict:
+        async with service(SrvFavoriteMusic) as srv:
+            return as_record(await srv.post(schemas.FavoriteMusic(**data)))
+
+    async def prescence_update(self, **prescence) -> None:
+        async with service(SrvPrescence) as srv:
+            if prescence.get('end'):  # update
+                await srv.patch(schemas.SessionLike(**prescence))
+            else:  # create
+                await srv.post(schemas.SessionLike(**prescence))
+
+    async def session_add_member(self, channel_id: int, member_id: int):
+        r = None
+        async with service(SrvSession) as srv:
+            r = as_record(
+                await srv.add_member(SessionID(channel_id),
+                                     SessionMember(member_id))
+            )
+        if r is None:
+            raise ValueError('Session still not exist probably!')
+        return r
+
+    async def create_sent_message(self, msg_id: int):
+        async with service(SrvSentMessage) as srv:
+            return as_record(await srv.post(schemas.SentMessage(id=msg_id)))
+
+    async def get_member(self, member_id: int) -> dict:
+        async with service(SrvUser) as srv:
+            return as_record(
+                await srv.cached(SessionMember(member_id), schemas.User)
+            )
+
+    async def get_session(self, channel_id: int) -> dict:
+        async with service(SrvSession) as srv:
+            return as_record(await srv.get(SessionID(channel_id)))
+
+    async def get_unclosed_sessions(self) -> list[dict]:
+        async with service(SrvSession) as srv:
+            return as_record(await srv.unclosed())
+
+    async def get_user_session(self, user_id: int) -> dict:
+        async with service(SrvSession) as srv:
+            return as_record(
+                await srv.cached_user_unclosed(LeaderID(user_id))
+            )
+
+    async def get_all_sessions(self, begin=None, end=None) -> list[dict]:
+        period = SrvSession.filter_by_timeperiod(default_period(begin, end))
+        async with service(SrvSession) as srv:
+            return as_record(await srv.all(period))
+
+    async def get_session_members(self, session_id: int) -> list[dict]:
+        async with service(SrvSession) as srv:
+            sess = await srv.get(SessionID(session_id))
+            return as_record(sess.members)
+
+    async def get_session_detail(self,
+                                 session_id: int,
+                                 app_id: int | None = None) -> dict:
+        async with service(SrvSession) as srv:
+            return as_record(await srv.detail(SessionID(session_id), app_id))
+
+    async def get_sync_validators(self, url: str) -> dict:
+        async with service(SrvSyncValidators) as srv:
+            return as_record(await srv.get(SyncURL(url)))
+
+    async def get_activity_info(self, app_id: int) -> dict:
+        async with service(SrvActivities) as srv:
+            activity = await srv.get(AppID(app_id))
+            return as_record(activity.info)
+
+    async def get_activity_emoji(self, app_id: int) -> dict:
+        async with service(SrvActivities) as srv:
+            return as_record(
+                await srv.emoji(AppID(app_id), suppress_error=True)
+            )
+
+    async def get_activity_duration(self, user_id: int, role_id: int) -> dict:
+        async with service(SrvUser) as srv:
+            return as_record(
+                await srv.concrete_duration(UserID(user_id), RoleID(role_id))
+            )
+
+    async def get_emoji_role(self, emoji_id: int) -> dict:
+        async with service(SrvEmoji) as srv:
+            return as_record(
+                await srv.cached(EmojiID(emoji_id), schemas.Role,
+                                 resolve=lambda emoji: emoji.role,
+                                 depends_on=(tables.Role,))
+            )
+
+    async def get_role(self, app_id: int, guild_id: int) -> dict:
+        async with service(SrvRole) as srv:
+            return as_record(await srv.by_app(ActivityID(app_id), guild_id))
+
+    async def get_all_roles(self) -> dict:
+        async with service(SrvRole) as srv:
+            return as_record(await srv.all())
+
+    async def get_role_id(self, role_id: int) -> dict:
+        async with service(SrvRole) as srv:
+            return as_record(await srv.get(RoleID(role_id)))
+
+    async def get_activityinfo(self, app_id: int) -> dict:
+        async with service(SrvActivityInfo) as srv:
+            return as_record(await srv.get(ActivityID(app_id)))
+
+    async def get_user_favorite_music(self, user_id: int) -> dict:
+        async with service(SrvFavoriteMusic) as srv:
+            return as_record(
+                await srv.first_of_all(MusicUserID(user_id), amount=limit())
+            )
+
+    async def get_session_leadership(self, message_id: int) -> list[dict]:
+        async with service(SrvSession) as srv:
+            sess = await srv.get(MessageID(message_id))
+            return as_record(sess.leadership)
+
+    async def get_session_activities(self, message_id: int) -> list[dict]:
+        async with service(SrvSession) as srv:
+            return as_record(await srv.activities(MessageID(message_id)))
+
+    async def get_session_prescence(self, message_id: int) -> list[dict]:
+        async with service(SrvSession) as srv:
+            sess = await srv.get(MessageID(message_id))
+            return as_record(sess.prescence)
+
+    async def post_guild_ids(self, data: dict) -> int | None:
+        r = None
+        async with service(SrvGuild) as srv:
+            r = await srv.post(schemas.GuildChannels(**data))
+        return r.id if r else None
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Coroutine, Optional
+
+from httpx import AsyncClient
+from PIL import Image
+
+from src.config import Config
+from src.utils import external_client
+
+try:
+    import numpy as np
+except ImportError:  # palette quantization of Pillow is used instead
+    np = None
+
+RGB = tuple[int, int, int]
+
+# Pillow and NumPy release the GIL for their heavy lifting, so threads keep
+# the event loop responsive without pickling images around
+image_executor = ThreadPoolExecutor(max_workers=Config.image_workers,
+                                    thread_name_prefix='images')
+
+
+def palette_dominant_color(
+        img: Image.Image,
+        colors_num: int = 15,
+        resize: int = 64
+) -> RGB | None:
+    """ Most frequent colour of adaptive palette, not too dark. """
+
+    img = img.copy()
+    img.thumbnail((resize, resize))
+
+    paletted = img.convert('P', palette=Image.ADAPTIVE, colors=colors_num)
+    palette = paletted.getpalette()
+    color_counts = sorted(paletted.getcolors(), reverse=True)
+
+    for _, palette_index in color_counts:
+        dc = tuple(palette[palette_index * 3:palette_index * 3 + 3])  # dominant
+        sq_dist = dc[0] * dc[0] + dc[1] * dc[1] + dc[2] * dc[2]
+        if sq_dist > 8:  # drop too dark colors
+            return dc
+
+
+def _cluster_totals(labels: 'np.ndarray',
+                    values: 'np.ndarray',
+                    clusters: int) -> 'np.ndarray':
+    """ Sums of pixel values by image and cluster label of the pixel. """
+
+    images = len(labels)
+    bins = (labels + clusters * np.arange(images)[:, None]).ravel()
+    return np.bincount(bins, weights=values.ravel(),
+                       minlength=images * clusters).reshape(images, clusters)
+
+
+def dominant_colors(
+        images: list[Image.Image],
+        clusters: int = 5,
+        resize: int = 32,
+        iterations: int = 10
+) -> list[RGB | None]:
+    """
+    Centre of the largest k-means cluster of pixels per image, None for
+    images without opaque pixels that aren't too dark. All images are
+    clustered at once, as one array of `resize` x `resize` pixels each.
+    """
+
+    if not images:
+        return []
+
+    # nearest sampling keeps colours of real pixels, unblended by resampling
+    def small(img: Image.Image) -> Image.Image:
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        return img.resize((resize, resize), Image.Resampling.NEAREST)
+
+    pixels = np.stack([
+        np.asarray(small(img).convert('RGBA')) for img in images
+    ]).reshape(len(images), -1, 4).astype(np.float32)
+    rgb = pixels[..., :3]
+    valid = (pixels[..., 3] >= 128) & ((rgb ** 2).sum(axis=-1) > 8)
+    counts = valid.sum(axis=1)
+
+    # initial centres spread over brightness order of valid pixels
+    brightness = np.where(valid, rgb.sum(axis=-1), np.inf)
+    order = np.argsort(brightness, axis=1)
+    ranks = (np.arange(clusters) + 0.5) / clusters * counts[:, None]
+    picked = np.take_along_axis(order, ranks.astype(np.intp), axis=1)
+    centres = np.take_along_axis(rgb, picked[..., None], axis=1)
+
+    weights = valid.astype(np.float32)
+    labels = np.full(valid.shape, -1)
+    active = np.arange(len(images))  # images whose clusters still move
+    for _ in range(iterations):
+        x, c, w = rgb[active], centres[active], weights[active]
+        # squared distances to centres, less the constant of each pixel
+        distances = ((c ** 2).sum(axis=-1)[:, None, :]
+                     - 2 * x @ c.transpose(0, 2, 1))
+        new_labels = distances.argmin(axis=-1)
+        moved = (new_labels != labels[active]).any(axis=1)
+        labels[active] = new_labels
+        if not moved.any():
+            break
+
+        sizes = _cluster_totals(new_labels, w, clusters)
+        sums = np.stack([_cluster_totals(new_labels, w * x[..., i], clusters)
+                         for i in range(3)], axis=-1)
+        centres[active] = np.where(sizes[..., None] > 0,
+                                   sums / np.maximum(sizes, 1)[..., None], c)
+        active = active[moved]
+
+    sizes = _cluster_totals(labels, weights, clusters)
+    largest = sizes.argmax(axis=1)
+    colors = centres[np.arange(len(images)), largest].round().astype(int)
+    return [tuple(map(int, color)) if count else None
+            for color, count in zip(colors, counts)]
+
+
+@dataclass(frozen=True)
+class Icon:
+    image: bytes  # PNG, `size` pixels at most per side
+    color: Optional[RGB]
+
+
+def process_icons(raws: list[bytes], size: int = 256) -> list[Optional[Icon]]:
+    """
+    Icons normalized to small PNGs, with their dominant colours computed in
+    one call. None for data Pillow can't read as an image, such as
+    truncated or oversized ones, the rest of the batch is processed anyway.
+    """
+
+    images = []
+    for raw in raws:
+        try:
+            with Image.open(BytesIO(raw)) as img:
+                img = img.convert('RGBA')
+            img.thumbnail((size, size))
+        except (OSError, ValueError, Image.DecompressionBombError):
+            img = None
+        images.append(img)
+
+    opened = [img for img in images if img is not None]
+    if np is None:
+        colors = iter(map(palette_dominant_color, opened))
+    else:
+        colors = iter(dominant_colors(opened))
+
+    icons = []
+    for img in images:
+        if img is None:
+            icons.append(None)
+            continue
+        buffer = BytesIO()
+        img.save(buffer, format='PNG', optimize=True)
+        icons.append(Icon(image=buffer.getvalue(), color=next(colors)))
+    return icons
+
+
+def process_icon(raw: bytes, size: int = 256) -> Optional[Icon]:
+    return process_icons([raw], size)[0]
+
+
+class IconCache:
+    """
+    Processed icons of apps by app id, on disk under `directory`. Icons are
+    downloaded through `client`, the shared external one by default, and
+    processed, as well as read and written, in `executor`. Concurrent
+    requests of one app wait for the same work, run as task started by
+    `spawn`, and icons downloaded while others are processed make up the
+    next batch. Icons of work `spawn` dropped or cancelled are missing.
+    """
+
+    def __init__(self,
+                 directory: str = Config.icon_cache_dir,
+                 executor: Executor = image_executor,
+                 client: Optional[AsyncClient] = None,
+                 spawn: Callable[[Coroutine], Optional[asyncio.Task]] = (
+                     asyncio.create_task
+                 )):
+        self.directory = directory
+        self.executor = executor
+        self.client = client
+        self.spawn = spawn
+        self._pending: dict[int, asyncio.Future] = {}
+        self._batch: list[tuple[int, bytes, asyncio.Future]] = []
+        self._flushing = False
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, app_id: int, url: str) -> Optional[Icon]:
+        """ Icon of app, None if it can't be downloaded or read. """
+
+        if (future := self._pending.get(app_id)) is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[app_id] = future
+            future.add_done_callback(lambda _: self._pending.pop(app_id, None))
+
+            def missing(_=None) -> None:
+                if not future.done():
+                    future.set_result(None)
+
+            task = self.spawn(self._resolve(app_id, url, future))
+            if task is None:
+                missing()
+            else:
+                task.add_done_callback(missing)
+        return await asyncio.shield(future)
+
+    async def _resolve(self,
+                       app_id: int,
+                       url: str,
+                       future: asyncio.Future) -> None:
+        try:
+            icon = await self._get(app_id, url)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(icon)
+
+    async def _get(self, app_id: int, url: str) -> Optional[Icon]:
+        loop = asyncio.get_running_loop()
+        icon = await loop.run_in_executor(self.executor, self._load, app_id)
+        if icon is not None:
+            self.hits += 1
+            return icon
+
+        self.misses += 1
+        client = self.client or external_client.client
+        response = await client.get(url)
+        if response.is_error or not response.content:
+            return
+
+        future = loop.create_future()
+        self._batch.append((app_id, response.content, future))
+        if not self._flushing:
+            await self._flush()
+        return await future
+
+    async def _flush(self) -> None:
+        """
+        Process batches until none is left, in `_get` which found no flush
+        going on, while others wait for their futures.
+        """
+
+        loop = asyncio.get_running_loop()
+        self._flushing = True
+        batch = []
+        try:
+            while self._batch:
+                batch, self._batch = self._batch, []
+                app_ids, raws, futures = zip(*batch)
+                try:
+                    icons = await loop.run_in_executor(
+                        self.executor, self._process, app_ids, raws
+                    )
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for future, icon in zip(futures, icons):
+                    if not future.done():
+                        future.set_result(icon)
+        finally:
+            self._flushing = False
+            # flush cancelled midway leaves its icons missing
+            for _, _, future in batch + self._batch:
+                if not future.done():
+                    future.set_result(None)
+            self._batch = []
+
+    def _path(self, app_id: int, extension: str) -> str:
+        return os.path.join(self.directory, f'{app_id}.{extension}')
+
+    def _load(self, app_id: int) -> Optional[Icon]:
+        try:  # colour is written last, so its file marks a complete entry
+            with open(self._path(app_id, 'json')) as f:
+                color = json.load(f)['color']
+            with open(self._path(app_id, 'png'), 'rb') as f:
+                image = f.read()
+        except (OSError, ValueError, KeyError):
+            return
+        return Icon(image=image, color=color and tuple(color))
+
+    def _write(self, path: str, data: bytes) -> None:
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(f'{path}.tmp', path)
+
+    def _process(self,
+                 app_ids: list[int],
+                 raws: list[bytes]) -> list[Optional[Icon]]:
+        icons = process_icons(raws)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for app_id, icon in zip(app_ids, icons):
+            if icon is None:
+                continue
+            self._write(self._path(app_id, 'png'), icon.image)
+            self._write(self._path(app_id, 'json'),
+                        json.dumps({'color': icon.color}).encode())
+        return icons
@@ -8,10 +8,28 @@ from discord import Intents, PermissionOverwrite
 from discord.ext import commands
 
 from src.config import Config
+from src.app.database import close_writers
 from src.app.service import Service
-from src.utils import CustomWarning, _init_channels, _fill_activity_info, logger
+from src.bot.icons import image_executor
+from src.bot.mixins import BaseCogMixin
+from src.utils import (CustomWarning, _init_channels, _fill_activity_info,
+                       logger, api_client, external_client)
 
-bot = commands.Bot(
+
+class Bot(commands.Bot):
+
+    async def close(self) -> None:
+        # cog tasks still need the connection to Discord
+        await BaseCogMixin.tasks.close(timeout=Config.tasks_drain_timeout)
+        await super().close()
+        await api_client.close()
+        await external_client.close()
+        image_executor.shutdown(wait=False, cancel_futures=True)
+        await Service.deferrer.close()
+        await close_writers()
+
+
+bot = Bot(
     command_prefix='!',
     intents=Intents.all(),
     fetch_offline_members=False,
@@ -36,12 +54,16 @@ class Permissions:
 async def on_ready():
     asyncio.set_event_loop(bot.loop)
     asyncio.create_task(Service.deferrer.start(bot.loop))  # noqa
+    await api_client.start()
 
     bot.permissions = Permissions
 
-    bot.guild_channels, *_ = await asyncio.gather(
-        _init_channels(bot),
-        _fill_activity_info(),
+    bot.guild_channels = await _init_channels(bot)
+    db = BaseCogMixin.db
+    BaseCogMixin.tasks.spawn(
+        'db', _fill_activity_info(db.activity_infos_upsert,
+                                  db.get_sync_validators,
+                                  db.sync_validators_upsert)
     )
     with suppress(commands.ExtensionAlreadyLoaded):
         await bot.load_extension('src.bot')  # load only after init data
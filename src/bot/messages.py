@@ -0,0 +1,44 @@
+from typing import TYPE_CHECKING, Optional
+
+from cachetools import LRUCache
+
+if TYPE_CHECKING:
+    from discord import Message
+    from discord.abc import Messageable
+
+
+class MessageCache:
+    """
+    Bot own messages by id, kept after they are sent, fetched or edited so
+    repeat accesses don't cost a REST request. Callers store the message
+    an edit returns and forget messages once done with them or deleted.
+    """
+
+    def __init__(self, maxsize: int = 1_000):
+        self._messages: LRUCache[int, 'Message'] = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.fetches = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._messages
+
+    def remember(self, message: Optional['Message']) -> Optional['Message']:
+        if message is not None:
+            self._messages[message.id] = message
+        return message
+
+    def forget(self, message_id: int) -> None:
+        self._messages.pop(message_id, None)
+
+    async def get(self, channel: 'Messageable', message_id: int) -> 'Message':
+        """ Cached message, fetched from channel on first access. """
+
+        if (message := self._messages.get(message_id)) is not None:
+            self.hits += 1
+            return message
+
+        self.fetches += 1
+        return self.remember(await channel.fetch_message(message_id))
@@ -5,9 +5,13 @@ from typing import Awaitable, TYPE_CHECKING, Optional
 from discord import ActivityType, NotFound
 from discord.ext import commands
 
-from src.bot.requests import BasicRequests
+from src.bot.messages import MessageCache
+from src.bot.requests import requests_backend
+from src.bot.sessions import SessionRegistry
+from src.bot.tasks import TaskSupervisor
+from src.config import Config
 from src.constants import constants
-from src.utils import request, logger
+from src.utils import logger
 
 
 if TYPE_CHECKING:
@@ -15,7 +19,12 @@ if TYPE_CHECKING:
 
 
 class BaseCogMixin(commands.Cog):
-    db = BasicRequests()
+    db = requests_backend()
+    sessions = SessionRegistry()
+    messages = MessageCache()
+    tasks = TaskSupervisor({'db': Config.db_tasks,
+                            'rest': Config.rest_tasks,
+                            'reactions': Config.reaction_tasks})
 
     def __init__(self, bot, sub_cog=False):
         super(BaseCogMixin, self).__init__()
@@ -36,11 +45,18 @@ class BaseCogMixin(commands.Cog):
 
 class DiscordFeaturesMixin(BaseCogMixin):
 
+    async def get_user_session(self, user_id: int) -> Optional[dict]:
+        """ Unclosed session led by user, from registry once loaded. """
+
+        if self.sessions.loaded:
+            return self.sessions.by_leader(user_id)
+        return await self.db.get_user_session(user_id)
+
     async def get_user_channel(
         self,
         user_id: int
     ) -> Optional['VoiceChannel']:
-        session = await self.db.get_user_session(user_id)
+        session = await self.get_user_session(user_id)
         if session is None:
             return
         return self.bot.get_channel(session['channel_id'])
@@ -50,7 +66,7 @@ class DiscordFeaturesMixin(BaseCogMixin):
         if member and member.get('default_sess_name'):
             sess_name = member['default_sess_name']
         else:
-            session = await self.db.get_user_session(user.id)
+            session = await self.get_user_session(user.id)
             sess_name = session['name'] if session else constants.session_name(name=user.display_name)
         return sess_name
 
@@ -100,5 +116,5 @@ class DiscordFeaturesMixin(BaseCogMixin):
     async def log_message(sendable: Awaitable):
         msg = await sendable
         with suppress(AttributeError):
-            await request(f'sent_message', 'post', data={'id': msg.id})
+            await BaseCogMixin.db.create_sent_message(msg.id)
         return msg
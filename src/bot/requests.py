@@ -1,5 +1,6 @@
 from src.app.dependencies import default_period
 from src.bot.meta import GettersWrapping
+from src.config import Config
 from src.utils import request
 
 
@@ -25,6 +26,10 @@ class BasicRequests(metaclass=GettersWrapping):
         method = 'patch' if activity.get('end') else 'post'  # update/create
         await request('activity', method, data=activity)
 
+    async def member_activities(self, events: list[dict]) -> dict:
+        """ Activity begins and ends, applied in order. """
+        return await request('activity/batch', 'post', data=events)
+
     async def session_update(self, **session: dict[int | str]) -> dict:
         create_channel = session.get('creator_id')
 
@@ -47,6 +52,19 @@ class BasicRequests(metaclass=GettersWrapping):
     async def user_create(self, **user: dict[int | str]) -> None:
         await request('user', 'post', data=user)
 
+    async def users_create(self, users: list[dict]) -> dict:
+        """ Register users not known yet, in one request. """
+        return await request('user/bulk', 'post', data=users)
+
+    async def activity_infos_upsert(self, infos: list[dict]) -> dict:
+        """ Store new apps and update changed ones, in one request. """
+        return await request('activity_info/bulk', 'post', data=infos)
+
+    async def sync_validators_upsert(self, validators: dict) -> dict:
+        """ Keep validators of synced upstream list along its rows. """
+        return await request('activity_info/sync/validators', 'put',
+                             data=validators)
+
     async def user_update(self, **user: dict[int | str: int | str]) -> None:
         user_id: int = user.pop('id')
         await request(f'user/{user_id}', 'patch', data=user)
@@ -112,6 +130,12 @@ class BasicRequests(metaclass=GettersWrapping):
     async def get_session_members(self, session_id: int) -> list[dict]:
         return await request(f'session/{session_id}/members')
 
+    async def get_session_detail(self,
+                                 session_id: int,
+                                 app_id: int | None = None) -> dict:
+        params = {'app_id': app_id} if app_id is not None else None
+        return await request(f'session/{session_id}/detail', params=params)
+
     async def get_activity_info(self, app_id: int) -> dict:
         return await request(f'activity/{app_id}/info')
 
@@ -135,6 +159,10 @@ class BasicRequests(metaclass=GettersWrapping):
     async def get_role_id(self, role_id: int) -> dict:
         return await request(f'role/{role_id}')
 
+    async def get_sync_validators(self, url: str) -> dict:
+        return await request('activity_info/sync/validators',
+                             params={'url': url})
+
     async def get_activityinfo(self, app_id: int) -> dict:
         return await request(f'activity_info/{app_id}')
 
@@ -153,3 +181,12 @@ class BasicRequests(metaclass=GettersWrapping):
     async def post_guild_ids(self, data: dict) -> int | None:
         r = await request('guild', 'post', data=data)
         return r['id'] if r else None
+
+
+def requests_backend() -> BasicRequests:
+    if Config.requests_backend == 'http':
+        return BasicRequests()
+
+    from src.bot.direct import DirectRequests
+
+    return DirectRequests()
@@ -0,0 +1,89 @@
+from typing import Iterable, Optional
+
+
+class SessionRegistry:
+    """
+    Unclosed sessions known to the bot, by leader and by channel. Loaded from
+    the database once, then kept current by session events, so voice state
+    handling doesn't have to ask the database who leads which channel.
+    """
+
+    def __init__(self):
+        self._by_channel: dict[int, dict] = {}
+        self._by_leader: dict[int, dict] = {}
+        self._version = 0
+        self._touched: dict[int, int] = {}  # channel id: version of change
+        self.loaded = False
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def __len__(self) -> int:
+        return len(self._by_channel)
+
+    def _touch(self, channel_id: int) -> None:
+        self._version += 1
+        self._touched[channel_id] = self._version
+
+    def _put(self, session: dict) -> None:
+        self._by_channel[session['channel_id']] = session
+        if session.get('leader_id') is not None:
+            self._by_leader[session['leader_id']] = session
+
+    def _pop(self, channel_id: int) -> Optional[dict]:
+        session = self._by_channel.pop(channel_id, None)
+        if session is not None and \
+                self._by_leader.get(session.get('leader_id')) is session:
+            del self._by_leader[session['leader_id']]
+        return session
+
+    def reset(self, sessions: Iterable[dict], since: int = None) -> None:
+        """
+        Replace known sessions by the database ones, newest first as
+        `get_unclosed_sessions` returns them. Changes made after `version`
+        was `since` are newer than the database snapshot and kept.
+        """
+
+        since = self._version if since is None else since
+        newer = {channel_id: self._by_channel.get(channel_id)
+                 for channel_id, version in self._touched.items()
+                 if version > since}
+
+        self._by_channel.clear()
+        self._by_leader.clear()
+        for session in reversed(list(sessions)):  # newest wins per leader
+            if session['channel_id'] not in newer:
+                self._put(dict(session))
+        for session in newer.values():
+            if session is not None:
+                self._put(session)
+
+        self._touched = {channel_id: self._touched[channel_id]
+                         for channel_id in newer}
+        self.loaded = True
+
+    def begin(self, channel_id: int, leader_id: int, **fields) -> None:
+        self._touch(channel_id)
+        self._pop(channel_id)
+        self._put(dict(fields, channel_id=channel_id, leader_id=leader_id))
+
+    def change_leader(self, channel_id: int, leader_id: int) -> None:
+        self._touch(channel_id)
+        if (session := self._pop(channel_id)) is not None:
+            self._put(dict(session, leader_id=leader_id))
+
+    def rename(self, channel_id: int, name: str) -> None:
+        self._touch(channel_id)
+        if (session := self._pop(channel_id)) is not None:
+            self._put(dict(session, name=name))
+
+    def over(self, channel_id: int) -> None:
+        self._touch(channel_id)
+        self._pop(channel_id)
+
+    def by_leader(self, leader_id: int) -> Optional[dict]:
+        return self._by_leader.get(leader_id)
+
+    def by_channel(self, channel_id: int) -> Optional[dict]:
+        return self._by_channel.get(channel_id)
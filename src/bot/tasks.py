@@ -0,0 +1,135 @@
+import asyncio
+from typing import TYPE_CHECKING, Coroutine, Optional
+
+from src.constants import constants
+from src.utils import logger
+
+if TYPE_CHECKING:
+    from src.config import TaskSettings
+
+
+class _Category:
+    def __init__(self, name: str, settings: 'TaskSettings'):
+        self.name = name
+        self.settings = settings
+        self.slots = asyncio.Semaphore(settings.limit)
+        self.room = asyncio.Event()
+
+        # tasks waiting to run and their coroutines, oldest first
+        self.queued: dict[asyncio.Task, Coroutine] = {}
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.queued) >= self.settings.queue_size
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'queued': len(self.queued),
+            'done': self.done,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }
+
+
+class TaskSupervisor:
+    """
+    Background tasks of cogs, by category. A category runs `limit` tasks at
+    once and keeps up to `queue_size` more waiting. Beyond that `spawn`
+    drops the new task, or the oldest waiting one for `drop_oldest`
+    categories, while `submit` waits for room. Failures are logged, and
+    `close` lets started work finish before shutdown.
+    """
+
+    def __init__(self, categories: dict[str, 'TaskSettings']):
+        self._categories = {name: _Category(name, settings)
+                            for name, settings in categories.items()}
+        self._tasks: set[asyncio.Task] = set()
+        self._closing = False
+
+    def spawn(self, category: str, coro: Coroutine) -> Optional[asyncio.Task]:
+        """ Run coroutine in background, None if it was dropped. """
+
+        cat = self._categories[category]
+        if self._closing:
+            return self._drop(cat, coro)
+
+        if cat.full:
+            if cat.settings.overflow != 'drop_oldest' or not cat.queued:
+                return self._drop(cat, coro)
+            oldest = next(iter(cat.queued))
+            oldest.cancel()
+            cat.queued.pop(oldest).close()
+            cat.dropped += 1
+        return self._start(cat, coro)
+
+    async def submit(self,
+                     category: str,
+                     coro: Coroutine) -> Optional[asyncio.Task]:
+        """ Run coroutine in background once category has room for it. """
+
+        cat = self._categories[category]
+        while cat.full and not self._closing:
+            cat.room.clear()
+            await cat.room.wait()
+        if self._closing:
+            return self._drop(cat, coro)
+        return self._start(cat, coro)
+
+    def _drop(self, cat: _Category, coro: Coroutine) -> None:
+        coro.close()
+        cat.dropped += 1
+        logger.warning(constants.log_task_dropped(category=cat.name))
+
+    def _start(self, cat: _Category, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(self._run(cat, coro))
+        cat.queued[task] = coro
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, cat: _Category, coro: Coroutine) -> None:
+        try:
+            await cat.slots.acquire()
+        except asyncio.CancelledError:  # dropped while waiting
+            coro.close()
+            raise
+        cat.queued.pop(asyncio.current_task(), None)
+        cat.room.set()
+        cat.running += 1
+        try:
+            await coro
+        except Exception as e:
+            cat.failed += 1
+            logger.exception(constants.log_task_failed(category=cat.name,
+                                                       error=e))
+        else:
+            cat.done += 1
+        finally:
+            cat.running -= 1
+            cat.slots.release()
+
+    def stats(self) -> dict[str, dict]:
+        """ Live counters of every category. """
+        return {name: cat.stats() for name, cat in self._categories.items()}
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting tasks and wait for started ones, cancelling those
+        still unfinished after `timeout` seconds.
+        """
+
+        self._closing = True
+        for cat in self._categories.values():
+            cat.room.set()  # release waiting `submit` calls
+
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -1,14 +1,58 @@
 import os
+from enum import Enum
+from typing import Literal
 
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import HttpUrl, IPvAnyAddress, computed_field
+from pydantic import BaseModel, HttpUrl, IPvAnyAddress, computed_field
+
+
+class ReplicationMode(Enum):
+    SEQUENTIAL = 'sequential'  # main session, then replicas one by one
+    REPLICAS = 'replicas'  # main session, then replicas concurrently
+    ALL = 'all'  # main session and replicas concurrently
+
+
+class PoolSettings(BaseModel):
+    """ Connection pool of one database, unused for in-memory sqlite. """
+
+    size: int = 5
+    max_overflow: int = 10
+    recycle: int = -1  # seconds, -1 keeps connections forever
+    timeout: float = 30  # seconds to wait for a free connection
+    # test connection on every checkout, costs a round trip each time
+    pre_ping: bool = True
+
+
+class SqliteSettings(BaseModel):
+    """ Pragmas set on every new connection, None keeps sqlite default. """
+
+    busy_timeout: float = 120  # seconds
+    journal_mode: str | None = 'wal'
+    synchronous: str | None = 'normal'
+    cache_size: int | None = -20_000  # negative value is in KiB
+    mmap_size: int | None = 256 * 1024 * 1024
+
+    # funnel writes to a database file through one connection, in WAL mode,
+    # committing writes that arrive within `writer_window` seconds together
+    single_writer: bool = False
+    writer_window: float = 0.002
+    writer_batch: int = 100
+
+
+class TaskSettings(BaseModel):
+    """ One category of bot background tasks, see `TaskSupervisor`. """
+
+    limit: int = 10  # tasks running at once
+    queue_size: int = 1_000  # tasks waiting to run
+    overflow: Literal['drop', 'drop_oldest'] = 'drop'  # when queue is full
 
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=os.environ.get('ENV_PATH', './envs/stable.env'),
         env_file_encoding='utf-8',
+        env_nested_delimiter='__',
         validate_default=False
     )
 
@@ -20,6 +64,28 @@ class Settings(BaseSettings):
     min_sess_duration: int = 300  # 5 minutes in seconds
     creation_cooldown: int = 15  # seconds
     channel_creation_wait_duration: int = 30  # seconds
+    # logger message edits arriving within window are sent as one edit, and
+    # one message is edited not more often than once per interval
+    embed_edit_window: float = 1  # seconds
+    embed_edit_interval: float = 5  # seconds
+    # repeated activity transitions within window are dropped, the rest is
+    # written in batches of up to `activity_batch_size` events
+    activity_window: float = 2  # seconds
+    activity_batch_size: int = 100
+
+    # processed app icons, see `IconCache`
+    icon_cache_dir: str = './icons'
+    image_workers: int = 2  # threads decoding and quantizing icons
+
+    # background tasks of cogs per category, e.g. `DB_TASKS__LIMIT=20`
+    db_tasks: TaskSettings = TaskSettings(limit=10, queue_size=1_000)
+    rest_tasks: TaskSettings = TaskSettings(limit=5, queue_size=200,
+                                            overflow='drop_oldest')
+    reaction_tasks: TaskSettings = TaskSettings(limit=2, queue_size=100)
+    tasks_drain_timeout: float = 10  # seconds to finish them on shutdown
+
+    # `direct` calls API services in-process, `http` goes through the API
+    requests_backend: Literal['direct', 'http'] = 'direct'
 
     api_host: IPvAnyAddress = '127.0.0.1'
     api_port: int = 8000
@@ -34,7 +100,40 @@ class Settings(BaseSettings):
     remote_db_engine: MultiHostUrl = 'mysql+asyncmy://'
     remote_connection: str = ''
 
+    # per database pool and sqlite options, e.g. `LOCAL_POOL__SIZE=10`
+    local_pool: PoolSettings = PoolSettings(pre_ping=False)
+    local_sqlite: SqliteSettings = SqliteSettings()
+    remote_pool: PoolSettings = PoolSettings(recycle=3600)
+    remote_sqlite: SqliteSettings = SqliteSettings()
+
     defer_sleep_seconds: float = 30
+    # drain deferred writes in batches of this size, zero disables batching
+    defer_batch_size: int = 0
+    # wake deferred tasks processor before its timer once this many queued
+    defer_wakeup_size: int = 100
+    # sqlite file keeping pending replica writes across restarts, e.g.
+    # `deferred.sqlite3`; empty string keeps them in memory only
+    defer_journal_path: str = ''
+    # failed deferred tasks wait up to `base * 2 ** failures` seconds
+    defer_backoff_base: float = 1
+    defer_backoff_cap: float = 300
+    # consecutive connection failures that stop writes to a replica, and
+    # how often it is probed afterwards
+    defer_breaker_threshold: int = 5
+    defer_breaker_probe_seconds: float = 30
+
+    # hot lookups served from memory, zero size or ttl disables the cache
+    read_cache_ttl: float = 30  # seconds
+    read_cache_size: int = 1024
+
+    # database of heavy aggregate reads such as playtime, the bigger remote
+    # one may take them off the local database
+    statistics_backend: Literal['local', 'remote'] = 'local'
+
+    # how replicated writes fan out, for `is_ordered=False` and
+    # `is_ordered=True` items respectively
+    replication_mode: ReplicationMode = ReplicationMode.SEQUENTIAL
+    ordered_replication_mode: ReplicationMode = ReplicationMode.SEQUENTIAL
 
     @computed_field
     def base_uri(self) -> HttpUrl:
@@ -28,27 +28,6 @@ class Constants:
     discord_detectable_apps_url = 'https://discord.com/api/v10/applications/detectable'
     icon_url = String('https://cdn.discordapp.com/app-icons/{app_id}/{icon}.png?size=4096')
 
-    duration = String('sum(COALESCE(CAST(24 * 60 * 60 * (julianday(a."end") - julianday(a.begin)) AS INTEGER),0))')
-    duration_query = String(
-        """
-            SELECT a.id app_id, {duration} seconds
-                FROM activity a
-                    WHERE a.member_id = {member_id}
-                GROUP BY a.id, a.member_id
-        """.format(duration=duration, member_id='{member_id}')
-    )
-
-    concrete_duration_query = String(
-        """
-            SELECT a.id app_id, {duration} seconds
-            FROM activity a
-                JOIN role r ON r.id = {role_id} and r.app_id = a.id
-                WHERE a.member_id = {member_id}
-            GROUP BY a.id, a.member_id
-        """.format(duration=duration, member_id='{member_id}',
-                   role_id='{role_id}')
-    )
-
     wait_cooldown = String('Для создания нужно подождать {cooldown} секунд!')
     already_created = String('Каналы уже созданы!')
     cleaning_started = String('Начата очистка переписки . . .')
@@ -84,6 +63,23 @@ class Constants:
     log_cant_delete = String("Can't delete object!")
     log_unordered_tasks = String('Current unordered tasks num: {num}')
     log_unordered_tasks_complete = String('Successfully completed {num} tasks!')
+    log_deferred_batch = String('Draining batch of {num} deferred tasks')
+    log_deferred_coalesced = String('Coalesced {num} deferred writes into {statements} statements')
+    log_deferred_batch_failed = String('Batch of deferred writes failed: {error}')
+    log_journal_replayed = String('Replayed {num} journaled deferred writes')
+    log_journal_skipped = String('Deferred write is not journaled, kept in memory only: {fabric}')
+    log_deferred_postponed = String('Deferred task postponed for {delay} seconds')
+    log_group_commit = String('Committed group of {num} writes')
+    log_group_commit_failed = String('Group commit failed: {error}')
+    log_reconciled = String('Reconciled {table}: {inserted} inserted, {updated} updated, {deleted} deleted')
+    log_playtime_rebuilt = String('Rebuilt playtime of {num} member apps')
+    log_activity_batch_failed = String('Batch of {num} activity events failed: {error}')
+    log_activity_event_skipped = String('Activity event skipped: {error}')
+    log_task_dropped = String('Background task of {category} dropped, too many pending')
+    log_task_failed = String('Background task of {category} failed: {error}')
+    log_embed_edit_failed = String('Edit of logger message {message_id} failed, retrying: {error}')
+    log_activity_info_synced = String('Synced activity info: {created} created, {updated} updated')
+    log_activity_info_not_modified = String('Activity info is up to date')
 
 
 constants = Constants
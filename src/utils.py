@@ -1,16 +1,25 @@
+import json
 import logging
+import random
+import re
+import time
 import warnings
+from collections import Counter
 from contextlib import suppress
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from enum import Enum
+from functools import partial
+from importlib import import_module
+from inspect import iscoroutinefunction
 from logging.handlers import RotatingFileHandler
-from typing import Callable, Type, Coroutine, TYPE_CHECKING, Iterable
+from typing import (Any, AsyncIterator, Awaitable, Callable, Type, Coroutine,
+                    TYPE_CHECKING, Iterable, Literal, Optional)
 
 from discord import NotFound
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
-from httpx import AsyncClient
+from httpx import AsyncClient, Limits, URL
 
 from .config import Config
 from .constants import constants
@@ -127,6 +136,59 @@ async def clear_messages(bot: 'Client', guild_id: int):
                     )
 
 
+class ApiClient:
+    """ Long-lived in-process ASGI client shared by bot-to-API calls. """
+
+    def __init__(self, base_url: str = Config.base_uri):
+        self.base_url = base_url
+        self._client: AsyncClient | None = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None or self._client.is_closed:
+            from src.app.main import app
+
+            self._client = AsyncClient(app=app, base_url=self.base_url)
+        return self._client
+
+    async def start(self) -> AsyncClient:
+        return self.client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+api_client = ApiClient()
+
+
+class ExternalClient:
+    """ Long-lived pooled client shared by requests to other hosts. """
+
+    def __init__(self, max_connections: int = 20, timeout: float = 30):
+        self.limits = Limits(max_connections=max_connections,
+                             max_keepalive_connections=max_connections)
+        self.timeout = timeout
+        self._client: AsyncClient | None = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = AsyncClient(limits=self.limits,
+                                       timeout=self.timeout,
+                                       follow_redirects=True)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+external_client = ExternalClient()
+
+
 async def request(
         url: str,
         method: str = 'get',
@@ -134,19 +196,20 @@ async def request(
         params: dict | None = None,
         base_url: str = Config.base_uri,
 ) -> dict | list[dict]:
-    from src.app.main import app
-
-    async with AsyncClient(app=app, base_url=base_url) as client:
-        if method in ('get', 'delete'):
-            response = await client.request(method, url, params=params)
-        else:
-            json = jsonable_encoder(data)
-            response = await client.request(
-                method,
-                url,
-                params=params,
-                json=json
-            )
+    client = api_client.client
+    if base_url != api_client.base_url:
+        url = URL(base_url).join(url)
+
+    if method in ('get', 'delete'):
+        response = await client.request(method, url, params=params)
+    else:
+        json = jsonable_encoder(data)
+        response = await client.request(
+            method,
+            url,
+            params=params,
+            json=json
+        )
 
     return response.json()
 
@@ -191,14 +254,69 @@ class CustomWarning(Warning):
 warnings.formatwarning = CustomWarning.formatwarning
 
 
+@dataclass
+class WriteOperation:
+    """
+    Data description of a replicated write, lets deferred writes be merged
+    into batches. Updates and deletes touch every row matching `filters`.
+    """
+    table: str
+    kind: Literal['insert', 'update', 'delete']
+    values: dict
+    filters: dict = field(default_factory=dict)
+
+    def matches(self, filters: dict) -> bool:
+        """ Inserted row satisfies `filters`. """
+        return all(self.values.get(k) == v for k, v in filters.items())
+
+    def is_disjoint(self, other: 'WriteOperation') -> bool:
+        """ Filters of both updates can't match the same row. """
+        return any(
+            k in other.filters and other.filters[k] != v
+            and k not in self.values and k not in other.values
+            for k, v in self.filters.items()
+        )
+
+
+@dataclass(frozen=True)
+class WriteCall:
+    """
+    Replicated write as a call of module level coroutine function, known
+    by its import path, with keyword arguments besides `session`. Lets
+    writes that aren't plain inserts or updates be journaled as data.
+    """
+    function: str  # `module:name`
+    kwargs: dict
+
+    @classmethod
+    def of(cls, coro_fabric: Callable) -> Optional['WriteCall']:
+        """ Call made by `partial` of module function, None for others. """
+
+        if not isinstance(coro_fabric, partial) or coro_fabric.args:
+            return None
+        func = coro_fabric.func
+        module = import_module(func.__module__)
+        if (not iscoroutinefunction(func)
+                or getattr(module, func.__qualname__, None) is not func):
+            return None  # methods and closures can't be imported back
+        return cls(function=f'{func.__module__}:{func.__qualname__}',
+                   kwargs=dict(coro_fabric.keywords))
+
+    def resolve(self) -> Callable:
+        module, name = self.function.split(':')
+        return partial(getattr(import_module(module), name), **self.kwargs)
+
+
 @dataclass
 class CoroItem:
     coro_fabric: Callable
     coro_kwargs: dict
     meta_kw: dict
+    operation: Optional[WriteOperation] = None
 
     def __post_init__(self):
         self.meta_kw.setdefault('attempts_remain', 5)
+        self.meta_kw.setdefault('queued_at', time.time())
 
     def build_coro(self) -> Coroutine:
         return self.coro_fabric(**self.coro_kwargs)
@@ -206,6 +324,18 @@ class CoroItem:
     def decr(self):
         self.meta_kw['attempts_remain'] -= 1
 
+    def backoff(self, base: float, cap: float) -> float:
+        """ Postpone next attempt exponentially, with full jitter. """
+
+        failures = self.meta_kw['failures'] = self.meta_kw.get('failures', 0) + 1
+        delay = random.uniform(0, min(cap, base * 2 ** failures))
+        self.meta_kw['retry_at'] = time.time() + delay
+        return delay
+
+    @property
+    def is_due(self) -> bool:
+        return time.time() >= self.meta_kw.get('retry_at', 0)
+
     @property
     def is_active(self) -> bool:
         return (self.meta_kw['repeat_on_failure'] and
@@ -232,47 +362,92 @@ async def _init_channels(bot: 'Client') -> dict[int, dataclass]:
     return channels
 
 
-async def create_if_not_exists(
-        get_url: str,
-        post_url: str,
-        object_: dict
-) -> dict | None:
-    data = await request(url=get_url)
-    if 'detail' not in data:
-        return
-
-    return await request(post_url, 'post', data=object_)
+def _app_info(app: dict) -> Optional[dict]:
+    """ Activity info of detectable app, None for apps without icon. """
 
-
-async def _fill_activity_info():
-    from src.app.service import Service
-
-    all_activities = await request('activity_info')
-    activity_ids = {row['app_id'] for row in all_activities}
-
-    url = constants.discord_detectable_apps_url
-
-    async with AsyncClient() as client:
-        response = await client.request('get', url)
-        data = response.json()
-
-    for x in data:
-        if not (icon := x.get('icon', x.get('cover_image'))):
-            continue
-
-        app_id, app_name = int(x['id']), x['name']
-
-        if app_id in activity_ids:
-            continue
-
-        icon_url = constants.icon_url(app_id=app_id, icon=icon)
-        game_data = {'icon_url': icon_url, 'app_id': app_id,
-                     'app_name': app_name}
-
-        await Service.deferrer.add(
-            CoroItem(coro_fabric=create_if_not_exists,
-                     coro_kwargs=dict(get_url=f'activity_info/{app_id}',
-                                      post_url='activity_info',
-                                      object_=game_data),
-                     meta_kw=dict(repeat_on_failure=True)),
-        )
+    if not (icon := app.get('icon', app.get('cover_image'))):
+        return
+    app_id = int(app['id'])
+    return {'app_id': app_id, 'app_name': app['name'],
+            'icon_url': constants.icon_url(app_id=app_id, icon=icon)}
+
+
+_whitespace = re.compile(r'\s*')
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator:
+    """ Items of JSON array, decoded as soon as their text arrives. """
+
+    decoder = json.JSONDecoder()
+    buffer, pos, opened = '', 0, False
+    async for chunk in chunks:
+        buffer, pos = buffer[pos:] + chunk, 0
+        while (pos := _whitespace.match(buffer, pos).end()) < len(buffer):
+            char = buffer[pos]
+            if not opened:
+                if char != '[':
+                    raise ValueError('JSON array expected')
+                opened, pos = True, pos + 1
+            elif char == ',':
+                pos += 1
+            elif char == ']':
+                return
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # incomplete item
+                if end == len(buffer):
+                    break  # number or literal may go on in next chunk
+                yield item
+                pos = end
+    raise ValueError('JSON array is not terminated')
+
+
+async def _fill_activity_info(
+        upsert: Callable[[list[dict]], Awaitable[dict]],
+        get_validators: Callable[[str], Awaitable[Optional[dict]]],
+        store_validators: Callable[[dict], Awaitable[Any]],
+        url: str = constants.discord_detectable_apps_url,
+        client: Optional[AsyncClient] = None,
+        chunk_size: int = 500,
+) -> None:
+    """
+    Upsert detectable apps of Discord into activity info, `chunk_size` apps
+    at a time while the list is downloaded. ETag and Last-Modified of the
+    synced list are stored in the database along the apps, an unchanged
+    list isn't downloaded again.
+    """
+
+    validators = await get_validators(url) or {}
+    headers = {}
+    if etag := validators.get('etag'):
+        headers['If-None-Match'] = etag
+    if modified := validators.get('last_modified'):
+        headers['If-Modified-Since'] = modified
+
+    totals = Counter()
+    client = client or external_client.client
+    async with client.stream('get', url, headers=headers) as response:
+        if response.status_code == 304:
+            logger.info(constants.log_activity_info_not_modified)
+            return
+        response.raise_for_status()
+
+        infos = []
+        async for app in iter_json_array(response.aiter_text()):
+            if (info := _app_info(app)) is not None:
+                infos.append(info)
+            if len(infos) == chunk_size:
+                totals.update(await upsert(infos))
+                infos = []
+        if infos:
+            totals.update(await upsert(infos))
+
+    await store_validators({
+        'url': url,
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+    })
+    logger.info(constants.log_activity_info_synced(created=totals['created'],
+                                                   updated=totals['updated']))
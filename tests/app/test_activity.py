@@ -1,5 +1,18 @@
+import asyncio
+from datetime import datetime
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.app import tables
+from src.app.links import overlapping
+from src.app.playtime import end_activity
+from src.app.routers.activity.services import SrvActivities
+from src.app.specification import UserID
+from src.app.tables import SessionFabric
 
 activity_id = 12345
 member_id = 112
@@ -36,3 +49,106 @@ async def test_get_activity_info(client: AsyncClient, post_activity_info):
     data = response.json()
     assert response.status_code == 200
     assert isinstance(data, dict)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('begin, end, found', [
+    ('2000-01-01 03:00:00', '2000-01-01 04:00:00', True),  # ends within
+    ('2000-01-01 01:00:00', '2000-01-01 02:30:00', True),  # begins within
+    ('2000-01-01 02:30:00', '2000-01-01 03:00:00', True),  # spans period
+    ('2000-01-01 01:00:00', '2000-01-01 05:00:00', True),  # within period
+    ('2000-01-01 01:00:00', '2000-01-01 02:00:00', False),  # ends at begin
+    ('2000-01-01 04:00:00', '2000-01-01 05:00:00', False),
+    ('2000-01-01 01:00:00', None, True),
+    ('2000-01-01 03:00:00', None, True),  # still running at 03:00
+    ('2000-01-01 04:00:00', None, False),
+])
+async def test_overlapping_activities(begin, end, found):
+    period = [datetime.fromisoformat(t) if t else None for t in (begin, end)]
+
+    async with SessionFabric.fabrics['local'].session_maker() as session:
+        service = SrvActivities(sessions=(session,), defer_handle=False)
+        activities = await service.overlapping(UserID(member_id), *period)
+    assert [a.id for a in activities] == ([activity_id] if found else [])
+
+
+@pytest.mark.asyncio
+async def test_overlapping_uses_period_index():
+    query = select(tables.Activity).where(
+        tables.Activity.member_id == member_id,
+        overlapping(tables.Activity, datetime(2000, 1, 1, 3),
+                    datetime(2000, 1, 1, 4))
+    )
+
+    async with SessionFabric.fabrics['local'].session_maker() as session:
+        compiled = query.compile(session.bind,
+                                 compile_kwargs={'literal_binds': True})
+        plan = await session.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))
+
+    assert 'ix_activity_member_period' in ' '.join(r[-1] for r in plan)
+
+
+@pytest.mark.asyncio
+async def test_activity_seconds_stored():
+    query = select(tables.Activity.seconds).filter_by(id=activity_id,
+                                                      member_id=member_id)
+
+    async with SessionFabric.fabrics['local'].session_maker() as session:
+        assert await session.scalar(query) == 6_355
+
+
+@pytest.mark.parametrize('dialect, expected', [
+    (sqlite.dialect(), 'julianday'),
+    (mysql.dialect(), 'TIMESTAMPDIFF(SECOND'),
+    (postgresql.dialect(), 'EXTRACT(EPOCH'),
+])
+def test_seconds_between_dialects(dialect, expected):
+    seconds = tables.SecondsBetween(tables.Activity.begin,
+                                    tables.Activity.end)
+    assert expected in str(seconds.compile(dialect=dialect))
+
+
+@pytest.mark.asyncio
+async def test_activity_batch(client: AsyncClient):
+    events = [
+        {'id': 777, 'member_id': 700, 'begin': '2000-01-05 01:00:00'},
+        {'id': 777, 'member_id': 700, 'end': '2000-01-05 02:00:00'},
+        {'id': 777, 'member_id': 700, 'end': '2000-01-05 03:00:00'},
+        {'id': 778, 'member_id': 700},  # neither begin nor end
+    ]
+    response = await client.post("/activity/batch", json=events)
+    assert response.status_code == 200
+    assert response.json() == {'applied': 2}
+
+    async with SessionFabric.fabrics['local'].session_maker() as session:
+        seconds = await session.scalar(
+            select(tables.Activity.seconds).filter_by(id=777, member_id=700)
+        )
+    assert seconds == 3_600
+
+
+@pytest.mark.asyncio
+async def test_end_activity_adds_playtime_once(tmp_path):
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/db.sqlite3')
+    async with engine.begin() as conn:
+        await conn.run_sync(tables.Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        session.add(tables.Activity(id=activity_id, member_id=member_id,
+                                    begin=datetime(2000, 1, 1, 1)))
+        await session.commit()
+
+    async def end() -> tables.Activity | None:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            return await end_activity(session, member_id, activity_id,
+                                      datetime(2000, 1, 1, 2))
+
+    ended = await asyncio.gather(end(), end())
+    again = await end()
+
+    async with AsyncSession(engine) as session:
+        seconds = await session.scalar(select(tables.Playtime.seconds))
+    await engine.dispose()
+
+    assert sum(activity is not None for activity in ended) == 1
+    assert again is None
+    assert seconds == 3_600
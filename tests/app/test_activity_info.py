@@ -26,3 +26,41 @@ async def test_get_all_activity_info(client: AsyncClient):
     data = response.json()
     assert response.status_code == 200
     assert isinstance(data, list) and len(data) == 1
+
+
+@pytest.mark.asyncio
+async def test_post_activity_info_bulk(client: AsyncClient):
+    infos = [{'app_id': activity_id, 'app_name': 'AppName',  # unchanged
+              'icon_url': 'url'},
+             {'app_id': 701, 'app_name': 'App-701', 'icon_url': 'url-701'},
+             {'app_id': 702, 'app_name': 'App-702', 'icon_url': 'url-702'}]
+
+    response = await client.post("/activity_info/bulk", json=infos)
+    assert response.status_code == 200
+    assert response.json() == {'created': 2, 'updated': 0}
+
+    infos[1]['app_name'] = 'Renamed-701'
+    response = await client.post("/activity_info/bulk", json=infos)
+    assert response.json() == {'created': 0, 'updated': 1}
+
+    response = await client.get("/activity_info/701")
+    assert response.json()['app_name'] == 'Renamed-701'
+
+
+@pytest.mark.asyncio
+async def test_sync_validators(client: AsyncClient):
+    url = 'https://discord.test/applications/detectable'
+    response = await client.get("/activity_info/sync/validators",
+                                params={'url': url})
+    assert response.status_code == 404
+
+    validators = {'url': url, 'etag': '"v1"', 'last_modified': None}
+    response = await client.put("/activity_info/sync/validators",
+                                json=validators)
+    assert response.status_code == 200
+
+    validators['etag'] = '"v2"'
+    await client.put("/activity_info/sync/validators", json=validators)
+    response = await client.get("/activity_info/sync/validators",
+                                params={'url': url})
+    assert response.json() == validators
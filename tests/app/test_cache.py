@@ -0,0 +1,85 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from src.app.cache import ReadCache
+from src.app.service import Service
+from src.utils import WriteOperation
+
+
+def stored(cache: ReadCache, spec: dict, row: dict | None,
+           table: str = 'member', tables=('member',)) -> tuple:
+    key = (table, tuple(spec.items()))
+    cache.store(key, row, table, spec, row, cache.versions(tables))
+    return key
+
+
+def test_row_invalidation():
+    cache = ReadCache()
+    user = stored(cache, {'id': 1}, {'id': 1, 'name': 'one'})
+    other = stored(cache, {'id': 2}, {'id': 2, 'name': 'two'})
+    missing = stored(cache, {'id': 3}, None)
+
+    cache.invalidate('member', WriteOperation(
+        table='member', kind='update', values={'name': 'uno'},
+        filters={'id': 1}))
+    assert cache.lookup(user) == (False, None)
+    assert cache.lookup(other)[0]
+
+    cache.invalidate('member', WriteOperation(
+        table='member', kind='insert', values={'id': 3, 'name': 'three'}))
+    assert cache.lookup(missing) == (False, None)
+    assert cache.lookup(other)[0]
+
+    cache.invalidate('member')  # unknown write drops whole table
+    assert cache.lookup(other) == (False, None)
+
+
+def test_dependent_tables_and_stale_loads():
+    cache = ReadCache()
+    versions = cache.versions(('emoji', 'role'))
+    cache.invalidate('role')  # written while value was loading
+    key = ('emoji', 1)
+    cache.store(key, 'role', 'emoji', {'id': 1}, {'id': 1}, versions)
+    assert cache.lookup(key) == (False, None)
+
+    key = stored(cache, {'id': 1}, {'id': 1}, 'emoji', ('emoji', 'role'))
+    cache.invalidate('role', WriteOperation(
+        table='role', kind='update', values={}, filters={'id': 5}))
+    assert cache.lookup(key) == (False, None)
+
+
+def test_eviction(monkeypatch):
+    cache = ReadCache(ttl=10, max_size=2)
+    first = stored(cache, {'id': 1}, {'id': 1})
+    second = stored(cache, {'id': 2}, {'id': 2})
+    cache.lookup(first)  # second is least recently used now
+    third = stored(cache, {'id': 3}, {'id': 3})
+    assert cache.lookup(second) == (False, None)
+    assert cache.lookup(first)[0] and cache.lookup(third)[0]
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 11)
+    assert cache.lookup(first) == (False, None)
+    assert cache.stats()['hit_rate'] == 3 / 5
+
+
+@pytest.mark.asyncio
+async def test_cached_user(client: AsyncClient, post_users):
+    hits = Service.read_cache.hits
+    for _ in range(2):
+        response = await client.get(f"/user/112")
+        assert response.json()['name'] == 'USER'
+    assert Service.read_cache.hits == hits + 1
+
+    await client.patch(f"/user/112", json={'name': 'Renamed'})
+    response = await client.get(f"/user/112")
+    assert response.json()['name'] == 'Renamed'
+
+    await client.patch(f"/user/112", json={'name': 'USER'})
+    assert (await client.get("/user/-1")).status_code == 404
+
+    response = await client.get("/metrics/cache")
+    assert response.status_code == 200
+    assert response.json()['hits'] >= 1
@@ -0,0 +1,382 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from functools import partial
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.app import tables
+from src.app.deffered import (BreakerState, DeferredTasksProcessor,
+                              apply_operations, coalesce)
+from src.app.journal import ReplicaJournal
+from src.app.routers.activity.services import SrvActivities
+from src.app.routers.music.services import increment_counter
+from src.app.schemas import EndActivity
+from src.app.service import Update, create_rows
+from src.app.specification import AppID, UserID, Unclosed
+from src.utils import CoroItem, WriteOperation
+
+BEGIN = datetime(2000, 1, 1, 2)
+END = datetime(2000, 1, 1, 3)
+
+
+def prescence_begin(member_id: int) -> WriteOperation:
+    return WriteOperation(
+        table='prescence', kind='insert',
+        values={'channel_id': 1, 'member_id': member_id, 'begin': BEGIN,
+                'end': None}
+    )
+
+
+def prescence_end(member_id: int) -> WriteOperation:
+    return WriteOperation(
+        table='prescence', kind='update', values={'end': END},
+        filters={'channel_id': 1, 'member_id': member_id, 'end': None}
+    )
+
+
+def user_update(user_id: int, **values) -> WriteOperation:
+    return WriteOperation(table='member', kind='update', values=values,
+                          filters={'id': user_id})
+
+
+def test_coalesce():
+    operations = [
+        prescence_begin(1),
+        prescence_begin(2),
+        user_update(1, name='first'),
+        prescence_end(1),
+        user_update(2, name='other'),
+        user_update(1, name='second'),
+    ]
+    coalesced = coalesce(operations)
+
+    assert coalesced == [
+        WriteOperation(
+            table='prescence', kind='insert',
+            values={'channel_id': 1, 'member_id': 1, 'begin': BEGIN,
+                    'end': END}
+        ),
+        prescence_begin(2),
+        user_update(1, name='second'),
+        user_update(2, name='other'),
+    ]
+    assert operations[0] == prescence_begin(1)  # input is untouched
+
+
+def test_coalesce_keeps_overlapping_updates():
+    operations = [
+        user_update(1, name='first'),
+        WriteOperation(table='member', kind='update',
+                       values={'default_sess_name': 'name'},
+                       filters={'name': 'first'}),
+        user_update(1, name='second'),
+    ]
+    assert coalesce(operations) == operations
+
+
+
+def test_coalesce_keeps_updates_apart_across_delete():
+    operations = [
+        user_update(1, name='first'),
+        WriteOperation(table='member', kind='delete', values={},
+                       filters={'id': 1}),
+        user_update(1, name='second'),
+    ]
+    assert coalesce(operations) == operations
+
+@pytest_asyncio.fixture()
+async def engine():
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as conn:
+        await conn.run_sync(tables.Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_insert_operations_skip_only_duplicates(engine):
+    await apply_operations(engine, [prescence_begin(1)])
+    await apply_operations(engine, [prescence_begin(1)])  # already stored
+
+    missing_icon = WriteOperation(table='activity_info', kind='insert',
+                                  values={'app_id': 1, 'app_name': 'App'})
+    with pytest.raises(IntegrityError):  # NOT NULL violation isn't ignored
+        await apply_operations(engine, [missing_icon])
+
+
+@pytest.mark.asyncio
+async def test_patch_operation_targets_resolved_row(engine):
+    deferred = []
+
+    async def defer(coro_item: CoroItem, is_ordered: bool) -> None:
+        deferred.append(coro_item)
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all([tables.Activity(id=10, member_id=1, begin=begin)
+                         for begin in (BEGIN, END)])  # both left open
+        await session.commit()
+
+        service = SrvActivities(sessions=(session, 'replica'))
+        service.coro_handler = defer
+        await Update.patch(
+            service,
+            AppID(10) & UserID(1) & Unclosed(),
+            EndActivity(id=10, member_id=1, end=datetime(2000, 1, 2)),
+            get_method=partial(service.get,
+                               _ordering=tables.Activity.begin.desc()),
+        )
+
+    operation, = [item.operation for item in deferred]
+    assert operation.filters == {'id': 10, 'member_id': 1, 'begin': END}
+
+
+
+@pytest.mark.asyncio
+async def test_patch_of_missing_row_defers_nothing(engine):
+    deferred = []
+
+    async def defer(coro_item: CoroItem, is_ordered: bool) -> None:
+        deferred.append(coro_item)
+
+    async with AsyncSession(engine) as session:
+        service = SrvActivities(sessions=(session, 'replica'))
+        service.coro_handler = defer
+        patched = await Update.patch(
+            service,
+            AppID(10) & UserID(1) & Unclosed(),
+            EndActivity(id=10, member_id=1, end=datetime(2000, 1, 2)),
+            suppress_error=True,
+        )
+
+    assert patched is None
+    assert deferred == []  # no write, spec filters never reach replicas
+
+@pytest.mark.asyncio
+async def test_batched_drain(engine):
+    processor = DeferredTasksProcessor(batch_size=100)
+    session = AsyncSession(engine)
+
+    executed_closures = []
+
+    async def closure(session: AsyncSession):
+        executed_closures.append(session)
+
+    def item(operation: WriteOperation = None) -> CoroItem:
+        return CoroItem(coro_fabric=closure,
+                        coro_kwargs=dict(session=session),
+                        meta_kw=dict(repeat_on_failure=True),
+                        operation=operation)
+
+    users = [
+        WriteOperation(table='member', kind='insert',
+                       values={'id': i, 'name': f'user {i}'})
+        for i in (1, 2)
+    ]
+    for operation in (*users, users[0], prescence_begin(1),
+                      prescence_begin(2), prescence_end(1)):
+        await processor.add(item(operation))
+    await processor.add(item())  # not described as data
+    await processor.add(item(user_update(2, name='renamed')))
+
+    await processor._run_batched()
+
+    assert executed_closures == [session]  # described writes used no closure
+    async with AsyncSession(engine) as s:
+        members = (await s.scalars(select(tables.Member))).all()
+        prescences = (await s.scalars(select(tables.Prescence))).all()
+
+    assert {(m.id, m.name) for m in members} == {(1, 'user 1'),
+                                                 (2, 'renamed')}
+    assert {(p.member_id, p.end) for p in prescences} == {(1, END),
+                                                          (2, None)}
+
+
+@pytest.mark.asyncio
+async def test_batched_drain_isolates_failures(engine):
+    processor = DeferredTasksProcessor(batch_size=100)
+    session = AsyncSession(engine)
+    failed = []
+
+    async def closure(session: AsyncSession):
+        failed.append(session)
+        raise ValueError
+
+    broken = WriteOperation(table='prescence', kind='insert',
+                            values={'channel_id': 1, 'member_id': 3,
+                                    'begin': 'not a date'})
+    valid = WriteOperation(table='member', kind='insert',
+                           values={'id': 4, 'name': 'user 4'})
+    for operation in (broken, valid):
+        await processor.add(
+            CoroItem(coro_fabric=closure, coro_kwargs=dict(session=session),
+                     meta_kw=dict(repeat_on_failure=False),
+                     operation=operation)
+        )
+
+    await processor._run_batched()
+
+    # whole batch is rolled back, then every write retried on its own
+    assert len(failed) == 2
+    assert processor._ordered_items.empty()
+
+
+@pytest.mark.asyncio
+async def test_journal_replays_after_restart(engine, tmp_path, monkeypatch):
+    monkeypatch.setitem(tables.SessionFabric.fabrics, 'replica',
+                        SimpleNamespace(engine=engine))
+    path = str(tmp_path / 'journal.sqlite3')
+
+    processor = DeferredTasksProcessor(journal=ReplicaJournal(path))
+    await processor.add(
+        CoroItem(coro_fabric=None, coro_kwargs=dict(session=AsyncSession(engine)),
+                 meta_kw=dict(repeat_on_failure=True),
+                 operation=prescence_begin(5))
+    )
+    queued = processor._ordered_items.get_nowait()
+    assert queued.coro_kwargs == dict(backend='replica',
+                                      operation=prescence_begin(5))
+    assert queued.meta_kw['journal_id'] == 1
+    await processor.close()  # stopped before drain
+
+    journal = ReplicaJournal(path)
+    restarted = DeferredTasksProcessor(journal=journal)
+    await restarted._replay(asyncio.get_running_loop())
+    await restarted._run_ordered()
+
+    async with AsyncSession(engine) as s:
+        prescence = await s.scalar(
+            select(tables.Prescence).filter_by(member_id=5)
+        )
+    assert prescence.begin == BEGIN
+
+    assert await journal.compact() == 1
+    assert [row async for row in journal.pending()] == []
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_journal_replays_calls_and_deletes(engine, tmp_path,
+                                                 monkeypatch):
+    monkeypatch.setitem(tables.SessionFabric.fabrics, 'replica',
+                        SimpleNamespace(engine=engine))
+    path = str(tmp_path / 'journal.sqlite3')
+    members = [{'id': 8, 'name': 'user 8', 'default_sess_name': None},
+               {'id': 9, 'name': 'user 9', 'default_sess_name': None}]
+    music = [{'user_id': 8, 'title': 'title', 'query': 'query',
+              'counter': 1}]
+    writes = [
+        (partial(create_rows, table='member', rows=members, chunk_size=1),
+         None),
+        (None, WriteOperation(table='member', kind='delete', values={},
+                              filters={'id': 9})),
+        (partial(create_rows, table='favorite_music', rows=music,
+                 chunk_size=1), None),
+        (partial(increment_counter, user_id=8, query='query'), None),
+    ]
+
+    processor = DeferredTasksProcessor(journal=ReplicaJournal(path))
+    for coro_fabric, operation in writes:
+        await processor.add(
+            CoroItem(coro_fabric=coro_fabric,
+                     coro_kwargs=dict(session=AsyncSession(engine)),
+                     meta_kw=dict(repeat_on_failure=True),
+                     operation=operation)
+        )
+    queued = [processor._ordered_items.get_nowait() for _ in writes]
+    assert all('session' not in item.coro_kwargs for item in queued)
+    await processor.close()  # stopped before drain
+
+    restarted = DeferredTasksProcessor(journal=ReplicaJournal(path))
+    await restarted._replay(asyncio.get_running_loop())
+    await restarted._run_ordered()
+    await restarted.close()
+
+    async with AsyncSession(engine) as s:
+        stored = (await s.scalars(select(tables.Member.id))).all()
+        counter = await s.scalar(select(tables.FavoriteMusic.counter))
+    assert stored == [8]
+    assert counter == 2
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_items_added_meanwhile(engine, tmp_path,
+                                                  monkeypatch):
+    monkeypatch.setitem(tables.SessionFabric.fabrics, 'replica',
+                        SimpleNamespace(engine=engine))
+    path = str(tmp_path / 'journal.sqlite3')
+
+    processor = DeferredTasksProcessor(journal=ReplicaJournal(path))
+    await processor.add(
+        CoroItem(coro_fabric=None, coro_kwargs=dict(backend='replica'),
+                 meta_kw=dict(repeat_on_failure=True),
+                 operation=prescence_begin(6))
+    )
+    await processor.close()  # stopped before drain
+
+    restarted = DeferredTasksProcessor(journal=ReplicaJournal(path))
+    pending = restarted.journal.pending
+
+    async def slow_pending():
+        # write deferred by a request while journal is read
+        await restarted.add(
+            CoroItem(coro_fabric=None, coro_kwargs=dict(backend='replica'),
+                     meta_kw=dict(repeat_on_failure=True),
+                     operation=prescence_begin(7))
+        )
+        async for row in pending():
+            yield row
+
+    monkeypatch.setattr(restarted.journal, 'pending', slow_pending)
+    await restarted._replay(asyncio.get_running_loop())
+
+    queued = restarted._take(restarted._ordered_items)
+    assert [item.operation.values['member_id'] for item in queued] == [6, 7]
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_breaker_stops_writes_to_unavailable_backend(engine):
+    processor = DeferredTasksProcessor(backoff_base=0, breaker_threshold=2,
+                                       breaker_probe_seconds=3600)
+    session = AsyncSession(engine)
+    calls = []
+    available = False
+
+    async def closure(session: AsyncSession, n: int):
+        calls.append(n)
+        if not available:
+            raise OperationalError('INSERT', {}, ConnectionError('down'))
+
+    items = [CoroItem(coro_fabric=closure,
+                      coro_kwargs=dict(session=session, n=n),
+                      meta_kw=dict(repeat_on_failure=False))
+             for n in range(3)]
+    for item in items:
+        await processor.add(item)
+
+    await processor._run_ordered()
+    await processor._run_ordered()
+    assert calls == [0, 0]  # later writes wait behind the failing one
+    breaker = processor._breaker(engine)
+    assert breaker.state is BreakerState.OPEN
+
+    await processor._run_ordered()
+    assert calls == [0, 0]  # no writes while breaker is open
+    stats = processor.stats()
+    assert stats['ordered'] == 3
+    assert stats['backends'][str(engine)]['state'] == 'open'
+    # outage does not use up attempts, even of non repeatable writes
+    assert all(item.meta_kw['attempts_remain'] == 5 for item in items)
+
+    breaker.opened_at = 0  # time to probe
+    available = True
+    await processor._run_ordered()
+    assert calls == [0, 0, 0, 1, 2]
+    assert breaker.state is BreakerState.CLOSED
+    assert processor._ordered_items.empty()
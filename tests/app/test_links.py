@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.app import tables
+from src.app.links import (link_activities, link_activity, link_prescence,
+                           overlapping)
+
+channel_id = 1
+member_id = 112
+app_id = 12345
+
+
+def at(hour: int) -> datetime:
+    return datetime(2000, 1, 1, hour)
+
+
+@pytest_asyncio.fixture
+async def session():
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as conn:
+        await conn.run_sync(tables.Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
+
+
+async def linked(session: AsyncSession) -> list[datetime]:
+    links = await session.scalars(select(tables.SessionActivity.begin))
+    return sorted(links)
+
+
+async def join(session: AsyncSession) -> None:
+    session.add(tables.MemberSessionAssociation(channel_id=channel_id,
+                                                member_id=member_id))
+    await session.commit()
+
+
+def activity(begin: int, end: int = None) -> tables.Activity:
+    return tables.Activity(id=app_id, member_id=member_id, begin=at(begin),
+                           end=end and at(end))
+
+
+def prescence(begin: int, end: int = None) -> tables.Prescence:
+    return tables.Prescence(channel_id=channel_id, member_id=member_id,
+                            begin=at(begin), end=end and at(end))
+
+
+@pytest.mark.asyncio
+async def test_activity_begun_during_open_prescence(session):
+    await join(session)
+    # played before, but never linked: activity writes leave it alone
+    session.add_all([prescence(1), activity(2, 3), activity(4)])
+    await session.commit()
+
+    await link_activity(session, app_id, member_id, at(4))
+    assert await linked(session) == [at(4)]
+
+
+@pytest.mark.asyncio
+async def test_activity_ended_inside_closed_prescence(session):
+    await join(session)
+    session.add_all([activity(1, 3), prescence(2, 4)])
+    await session.commit()
+
+    await link_prescence(session, channel_id, member_id, at(1))
+    assert await linked(session) == []
+
+    await link_prescence(session, channel_id, member_id, at(2))
+    assert await linked(session) == [at(1)]
+
+
+@pytest.mark.asyncio
+async def test_member_joined_later(session):
+    session.add_all([prescence(1), activity(2)])
+    await session.commit()
+
+    await link_prescence(session, channel_id, member_id, at(1))
+    await link_activity(session, app_id, member_id, at(2))
+    assert await linked(session) == []
+
+    await join(session)
+    await link_activities(session, member_id, channel_id)
+    assert await linked(session) == [at(2)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('begin, end, found', [
+    (3, 4, True),
+    (3, None, True),
+    (1, 2, False),
+])
+async def test_overlapping_open_activity(session, begin, end, found):
+    session.add(activity(2))
+    await session.commit()
+
+    period = overlapping(tables.Activity, at(begin), end and at(end))
+    activities = await session.scalars(select(tables.Activity).where(period))
+    assert bool(activities.all()) is found
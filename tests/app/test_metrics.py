@@ -0,0 +1,33 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_deferred_metrics(client: AsyncClient):
+    response = await client.get("/metrics/deferred")
+    data = response.json()
+    assert response.status_code == 200
+    assert data['ordered'] >= 0
+    assert data['oldest_age'] >= 0
+    assert isinstance(data['backends'], dict)
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics(client: AsyncClient):
+    await client.get("/user")  # checks out a connection of local database
+
+    response = await client.get("/metrics/pools")
+    data = response.json()
+    assert response.status_code == 200
+    assert {'local', 'remote'} <= set(data)
+    assert data['local']['checkouts'] > 0
+
+
+@pytest.mark.asyncio
+async def test_read_leaves_replica_alone(client: AsyncClient):
+    from src.app.tables import SessionFabric
+
+    metrics = SessionFabric.fabrics['remote'].metrics
+    checkouts = metrics.checkouts
+    await client.get("/user")
+    assert metrics.checkouts == checkouts
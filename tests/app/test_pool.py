@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import text
+
+from src.app.pool import MeasuredAsyncQueuePool
+from src.app.tables import SessionFabric
+from src.config import PoolSettings, SqliteSettings
+
+
+@pytest.fixture
+def fabric(tmp_path) -> SessionFabric:
+    # built outside of event loop, table creation runs its own
+    SessionFabric.build(
+        db_uri=f'sqlite+aiosqlite:///{tmp_path / "db.sqlite3"}',
+        pool=PoolSettings(size=2, max_overflow=0, pre_ping=False),
+        sqlite=SqliteSettings(cache_size=-1000),
+        name='pool_test',
+    )
+    return SessionFabric.fabrics.pop('pool_test')
+
+
+@pytest.mark.asyncio
+async def test_sqlite_file_pool(fabric: SessionFabric):
+    async with fabric.session_maker() as session:
+        journal_mode = await session.scalar(text('PRAGMA journal_mode'))
+        cache_size = await session.scalar(text('PRAGMA cache_size'))
+    await fabric.engine.dispose()
+
+    assert (journal_mode, cache_size) == ('wal', -1000)
+    assert isinstance(fabric.engine.pool, MeasuredAsyncQueuePool)
+
+    stats = fabric.metrics.stats(fabric.engine.pool)
+    assert stats['size'] == 2
+    assert stats['in_use'] == 0
+    assert stats['checkouts'] >= 2  # creating tables and the session
+    assert stats['wait_max_ms'] > 0
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.app import tables
+from src.app import reconcile as module
+from src.app.reconcile import TableReport, reconcile
+
+BEGIN = datetime(2000, 1, 1, 1)
+
+
+async def create_engine(rows: dict[type, list[dict]]):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as conn:
+        await conn.run_sync(tables.Base.metadata.create_all)
+        for table, values in rows.items():
+            await conn.execute(insert(table), values)
+    return engine
+
+
+@pytest_asyncio.fixture()
+async def engines():
+    session = {'channel_id': 1, 'name': 'name', 'creator_id': 1,
+               'leader_id': 1, 'message_id': 1, 'begin': BEGIN}
+    source = await create_engine({
+        tables.Member: [{'id': i, 'name': f'user {i}'} for i in range(1, 6)],
+        tables.Session: [session],
+        tables.MemberSessionAssociation: [
+            {'id': 1, 'member_id': 1, 'channel_id': 1},
+            {'id': 2, 'member_id': 2, 'channel_id': 1},
+        ],
+    })
+    target = await create_engine({
+        tables.Member: [{'id': 1, 'name': 'user 1'},
+                        {'id': 2, 'name': 'outdated'},
+                        {'id': 7, 'name': 'deleted'}],
+        tables.Session: [{**session, 'name': 'outdated'}],
+        tables.MemberSessionAssociation: [  # other surrogate ids
+            {'id': 5, 'member_id': 2, 'channel_id': 1},
+            {'id': 6, 'member_id': 7, 'channel_id': 1},
+        ],
+    })
+    yield source, target
+    await source.dispose()
+    await target.dispose()
+
+
+async def dump(engine, table) -> list[tuple]:
+    async with AsyncSession(engine) as session:
+        return sorted(tuple(row) for row in await session.execute(
+            select(*(c for c in table.__table__.columns if c.name != 'id'
+                     or table is not tables.MemberSessionAssociation))
+        ))
+
+
+@pytest.mark.asyncio
+async def test_reconcile(engines):
+    source, target = engines
+    reports = await reconcile(source, target, chunk_size=2)
+    reports = {r.table: r for r in reports}
+
+    assert reports['member'] == TableReport('member', inserted=3, updated=1,
+                                            deleted=1)
+    assert reports['session'] == TableReport('session', updated=1)
+    assert reports['member_session'] == TableReport('member_session',
+                                                    inserted=1, deleted=1)
+    for table in (tables.Member, tables.Session,
+                  tables.MemberSessionAssociation):
+        assert await dump(source, table) == await dump(target, table)
+
+    reports = await reconcile(source, target, chunk_size=2)
+    assert all(r.inserted == r.updated == r.deleted == 0 for r in reports)
+
+
+@pytest.mark.asyncio
+async def test_equal_ranges_fetch_no_rows(monkeypatch):
+    members = [{'id': i, 'name': f'user {i}'} for i in range(1, 7)]
+    source = await create_engine({tables.Member: members})
+    target = await create_engine({tables.Member: [
+        {**member, 'name': 'outdated'} if member['id'] == 5 else member
+        for member in members
+    ]})
+    fetched = []
+    range_rows = module.range_rows
+
+    async def spy(session, table, columns, where):
+        rows = await range_rows(session, table, columns, where)
+        fetched.append(sorted(rows))
+        return rows
+
+    monkeypatch.setattr(module, 'range_rows', spy)
+    reports = await reconcile(source, target, ['member'], chunk_size=2)
+
+    assert reports == [TableReport('member', updated=1)]
+    assert fetched == [[(5,), (6,)], [(5,), (6,)]]  # from both sides
+    assert await dump(source, tables.Member) == \
+        await dump(target, tables.Member)
+    await source.dispose()
+    await target.dispose()
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.config import Config, ReplicationMode
+from src.app import tables
+from src.app.routers.user.services import SrvUser
+from src.app.service import create_rows
+
+MAIN, REPLICA_1, REPLICA_2 = 'main', 'replica-1', 'replica-2'
+
+
+def build_service() -> tuple[SrvUser, list, callable]:
+    events = []
+
+    async def coro_fabric(session: str) -> SimpleNamespace:
+        events.append(('begin', session))
+        await asyncio.sleep(0.01)
+        events.append(('end', session))
+        return SimpleNamespace(session=session)
+
+    service = SrvUser(sessions=(MAIN, REPLICA_1, REPLICA_2),
+                      defer_handle=False)
+    return service, events, coro_fabric
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', list(ReplicationMode))
+async def test_replication_modes(monkeypatch, mode):
+    monkeypatch.setattr(Config, 'ordered_replication_mode', mode)
+    service, events, coro_fabric = build_service()
+
+    response = await service.replicate(coro_fabric)
+    assert response.session == MAIN
+
+    begins = [session for event, session in events if event == 'begin']
+    assert begins == [MAIN, REPLICA_1, REPLICA_2]
+
+    # amount of writes which have begun before the main session is over
+    main_end = events.index(('end', MAIN))
+    overlapping = len([e for e in events[:main_end] if e[0] == 'begin'])
+    # amount of writes which have begun before the first replica is over
+    replica_end = events.index(('end', REPLICA_1))
+    replicas_overlapping = len(
+        [e for e in events[main_end:replica_end] if e[0] == 'begin']
+    )
+
+    if mode is ReplicationMode.ALL:
+        assert overlapping == 3
+    elif mode is ReplicationMode.REPLICAS:
+        assert overlapping == 1 and replicas_overlapping == 2
+    else:
+        assert overlapping == 1 and replicas_overlapping == 1
+
+
+@pytest.mark.asyncio
+async def test_unordered_replication_mode(monkeypatch):
+    monkeypatch.setattr(Config, 'replication_mode', ReplicationMode.ALL)
+    service, events, coro_fabric = build_service()
+
+    await service.replicate(coro_fabric, is_ordered=True)
+    assert events[1] == ('end', MAIN)  # ordered items stay sequential
+
+    events.clear()
+    await service.replicate(coro_fabric, is_ordered=False)
+    assert events[:3] == [('begin', MAIN), ('begin', REPLICA_1),
+                          ('begin', REPLICA_2)]
+
+
+@pytest.mark.asyncio
+async def test_lazy_replica_sessions():
+    opened, closed = [], []
+
+    class FakeSession(str):
+        async def close(self):
+            closed.append(self)
+
+    def provider() -> FakeSession:
+        opened.append(FakeSession(REPLICA_1))
+        return opened[-1]
+
+    service, events, coro_fabric = build_service()
+    service._other_sessions = [provider]
+
+    await service.replicate(coro_fabric)
+    assert events[-1] == ('end', REPLICA_1)
+    assert opened == closed == [REPLICA_1]
+
+
+@pytest.mark.asyncio
+async def test_create_rows_skips_only_duplicates():
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as conn:
+        await conn.run_sync(tables.Base.metadata.create_all)
+
+    info = {'app_id': 1, 'app_name': 'App', 'icon_url': 'url'}
+    async with AsyncSession(engine) as session:
+        await create_rows(session, 'activity_info', [info], chunk_size=10)
+        await create_rows(session, 'activity_info',  # already stored
+                          [{**info, 'app_name': 'Other'}], chunk_size=10)
+        names = await session.scalars(select(tables.ActivityInfo.app_name))
+        assert names.all() == ['App']
+
+        with pytest.raises(IntegrityError):  # NOT NULL violation isn't ignored
+            await create_rows(session, 'activity_info',
+                              [{'app_id': 2, 'app_name': 'App'}],
+                              chunk_size=10)
+    await engine.dispose()
@@ -135,3 +135,21 @@ async def test_get_session_activities(client: AsyncClient):
     data = response.json()
     assert response.status_code == 200
     assert isinstance(data, list) and len(data) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_session_detail(client: AsyncClient):
+    response = await client.get(f"/session/{TEST_CHANNEL_ID}/detail",
+                                params={'app_id': 12345})
+    data = response.json()
+    assert response.status_code == 200
+    assert data['channel_id'] == TEST_CHANNEL_ID
+    assert [member['id'] for member in data['members']] == [TEST_USER_ID]
+    assert data['activity']['icon_url'] == 'url'
+
+    response = await client.get(f"/session/{TEST_CHANNEL_ID}/detail")
+    assert response.status_code == 200
+    assert response.json()['activity'] is None  # leader plays nothing
+
+    response = await client.get("/session/-1/detail")
+    assert response.status_code == 404
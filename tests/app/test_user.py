@@ -1,6 +1,10 @@
 import pytest
 from httpx import AsyncClient
 
+from src.app.playtime import rebuild_backend
+from src.app.tables import SessionFabric
+from src.config import Config
+
 
 @pytest.mark.asyncio
 async def get_user_112(client: AsyncClient):
@@ -105,4 +109,45 @@ async def test_get_user_concrete_activity_duration(
     data = response.json()
 
     assert response.status_code == 200
-    assert data['seconds'] == 6_354
+    assert data['seconds'] == 6_355
+
+
+
+@pytest.mark.asyncio
+async def test_rebuild_playtime(client: AsyncClient):
+    assert await rebuild_backend('local') >= 1
+
+    response = await client.get("/user/112/activities/duration/")
+    assert response.json() == [{'app_id': 12_345, 'seconds': 6_355}]
+
+
+@pytest.mark.asyncio
+async def test_durations_from_statistics_backend(client: AsyncClient,
+                                                 monkeypatch):
+    monkeypatch.setattr(Config, 'statistics_backend', 'remote')
+    metrics = SessionFabric.fabrics['remote'].metrics
+    checkouts = metrics.checkouts
+
+    response = await client.get("/user/112/activities/duration/")
+    assert response.status_code == 200
+    assert metrics.checkouts > checkouts
+
+
+@pytest.mark.asyncio
+async def test_post_users_bulk(client: AsyncClient):
+    users = [{'id': 112, 'name': 'renamed'},  # already stored
+             {'id': 601, 'name': 'USER-601'},
+             {'id': 602, 'name': 'USER-602'},
+             {'id': 602, 'name': 'USER-602'}]
+
+    response = await client.post("/user/bulk", json=users)
+    assert response.status_code == 200
+    assert response.json() == {'created': 2}
+
+    response = await client.post("/user/bulk", json=users)
+    assert response.json() == {'created': 0}
+
+    response = await client.get("/user/602")
+    assert response.json()['name'] == 'USER-602'
+    response = await client.get("/user/112")
+    assert response.json()['name'] != 'renamed'
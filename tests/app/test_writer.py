@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from src.app import tables
+from src.app.tables import SessionFabric
+from src.config import SqliteSettings
+
+
+@pytest.fixture
+def fabric(tmp_path) -> SessionFabric:
+    # built outside of event loop, table creation runs its own
+    SessionFabric.build(
+        db_uri=f'sqlite+aiosqlite:///{tmp_path / "db.sqlite3"}',
+        sqlite=SqliteSettings(single_writer=True, writer_window=0.05),
+        name='writer_test',
+    )
+    return SessionFabric.fabrics.pop('writer_test')
+
+
+@pytest.mark.asyncio
+async def test_single_writer(fabric: SessionFabric):
+    writer = fabric.writer
+    groups = []
+
+    commit = writer._commit
+
+    async def counting_commit(batch):
+        groups.append(len(batch))
+        await commit(batch)
+
+    writer._commit = counting_commit
+
+    def create_member(member_id: int):
+        async def write(session):
+            async with session.begin():
+                if member_id < 0:
+                    session.add(tables.Member(id=member_id, name=None))
+                else:
+                    session.add(tables.Member(id=member_id, name='name'))
+            return member_id
+        return write
+
+    results = await asyncio.gather(
+        *(writer.submit(create_member(i)) for i in (1, 2, -1, 3)),
+        return_exceptions=True
+    )
+    async with fabric.session_maker() as session:
+        ids = (await session.scalars(select(tables.Member.id))).all()
+        with pytest.raises(OperationalError, match='readonly'):
+            await session.execute(insert(tables.Member),
+                                  {'id': 4, 'name': 'name'})
+    await writer.close()
+    await fabric.engine.dispose()
+
+    assert groups == [4]  # one group commit for all of them
+    assert results[:2] == [1, 2] and results[3] == 3
+    assert isinstance(results[2], Exception)  # rolled back on its own
+    assert sorted(ids) == [1, 2, 3]
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+
+from src.bot.activities import ActivityIngest
+from src.bot.tasks import TaskSupervisor
+from src.config import TaskSettings
+
+AT = datetime(2001, 1, 1)
+
+
+def build(window: float = 0.05, max_batch: int = 100, **kwargs):
+    batches = []
+
+    async def submit(events: list[dict]) -> None:
+        batches.append([(e['id'], 'end' if e['end'] else 'begin')
+                        for e in events])
+
+    ingest = ActivityIngest(submit, window=window, max_batch=max_batch,
+                            **kwargs)
+    return ingest, batches
+
+
+@pytest.mark.asyncio
+async def test_repeated_transitions_are_dropped():
+    ingest, batches = build()
+    for _ in range(5):  # same update from every shared guild
+        ingest.end(1, 10, AT)
+        ingest.begin(1, 20, AT)
+
+    await asyncio.sleep(0.1)
+    assert batches == [[(10, 'end'), (20, 'begin')]]
+    assert ingest.duplicates == 8
+
+
+@pytest.mark.asyncio
+async def test_restart_is_coalesced():
+    ingest, batches = build()
+    ingest.begin(1, 10, AT)
+    await asyncio.sleep(0.1)
+
+    ingest.end(1, 10, AT)
+    ingest.begin(1, 10, AT)
+    await asyncio.sleep(0.1)
+
+    assert batches == [[(10, 'begin')]]
+    assert ingest.coalesced == 1
+
+
+@pytest.mark.asyncio
+async def test_short_activity_is_kept():
+    ingest, batches = build()
+    ingest.begin(1, 10, AT)
+    ingest.end(1, 10, AT)
+    ingest.begin(2, 10, AT)
+
+    await ingest.close()
+    assert batches == [[(10, 'begin'), (10, 'end'), (10, 'begin')]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_submitted_right_away():
+    ingest, batches = build(window=10, max_batch=2)
+    ingest.begin(1, 10, AT)
+    ingest.begin(2, 10, AT)
+    ingest.begin(3, 10, AT)
+    await asyncio.sleep(0)
+
+    assert batches == [[(10, 'begin'), (10, 'begin')]]
+    assert len(ingest) == 1
+
+    await ingest.close()
+    assert len(batches) == 2 and len(ingest) == 0
+
+
+@pytest.mark.asyncio
+async def test_supervised_batches():
+    supervisor = TaskSupervisor({'db': TaskSettings(limit=1)})
+    ingest, batches = build(window=10, max_batch=2,
+                            spawn=partial(supervisor.spawn, 'db'))
+    ingest.begin(1, 10, AT)
+    ingest.begin(2, 10, AT)
+    ingest.begin(3, 10, AT)
+
+    await supervisor.close()  # drains started batch
+    assert batches == [[(10, 'begin'), (10, 'begin')]]
+    assert supervisor.stats()['db']['done'] == 1
+
+    ingest.begin(4, 10, AT)
+    ingest.begin(5, 10, AT)  # dropped by closed supervisor, kept pending
+    assert len(ingest) == 3
+
+    await ingest.close()
+    assert batches[1:] == [[(10, 'begin')] * 3]
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from httpx import AsyncClient, MockTransport, Request, Response
+
+from src.utils import _fill_activity_info, iter_json_array
+
+URL = 'https://discord.test/applications/detectable'
+APPS = [{'id': '1', 'name': 'One', 'icon': 'i1'},
+        {'id': '2', 'name': 'Two', 'cover_image': 'c2'},
+        {'id': '3', 'name': 'No icon'},
+        {'id': '4', 'name': 'Four', 'icon': 'i4'}]
+
+
+class Upstream:
+    """ Detectable apps endpoint honouring If-None-Match. """
+
+    def __init__(self):
+        self.requests: list[Request] = []
+
+    def __call__(self, request: Request) -> Response:
+        self.requests.append(request)
+        if request.headers.get('if-none-match') == '"v1"':
+            return Response(304)
+
+        body = json.dumps(APPS).encode()
+        return Response(200, content=chunks(body, 7),
+                        headers={'ETag': '"v1"'})
+
+
+async def chunks(text: str | bytes, size: int):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', [1, 3, 1000])
+async def test_iter_json_array(size: int):
+    text = ' [{"a": [1, "],"]}, 12345, true , {}] '
+    items = [item async for item in iter_json_array(chunks(text, size))]
+    assert items == [{'a': [1, '],']}, 12345, True, {}]
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_unterminated():
+    with pytest.raises(ValueError):
+        _ = [item async for item in iter_json_array(chunks('[1, 2', 2))]
+
+
+@pytest.mark.asyncio
+async def test_fill_activity_info_is_conditional():
+    upstream, batches, stored = Upstream(), [], {}
+
+    async def upsert(infos: list[dict]) -> dict:
+        batches.append([info['app_id'] for info in infos])
+        return {'created': len(infos), 'updated': 0}
+
+    async def get_validators(url: str) -> dict | None:
+        return stored.get(url)
+
+    async def store_validators(validators: dict) -> None:
+        stored[validators['url']] = validators
+
+    async def fill():
+        await _fill_activity_info(upsert, get_validators, store_validators,
+                                  URL, client, chunk_size=2)
+
+    async with AsyncClient(transport=MockTransport(upstream)) as client:
+        await fill()
+        assert batches == [[1, 2], [4]]
+        assert 'if-none-match' not in upstream.requests[0].headers
+        assert stored[URL]['etag'] == '"v1"'
+
+        await fill()
+        assert batches == [[1, 2], [4]]
+        assert upstream.requests[1].headers['if-none-match'] == '"v1"'
+
+        stored.clear()  # database emptied, validators went along
+        await fill()
+        assert batches == [[1, 2], [4], [1, 2], [4]]
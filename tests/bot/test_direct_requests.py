@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+
+from src.bot.direct import DirectRequests
+
+TEST_USER_ID = 900
+TEST_CHANNEL_ID = 901
+
+db = DirectRequests()
+
+
+@pytest.mark.asyncio
+async def test_user_create_and_get():
+    await db.user_create(id=TEST_USER_ID, name='Direct USER')
+
+    member = await db.get_member(TEST_USER_ID)
+    assert member == {'id': TEST_USER_ID, 'name': 'Direct USER',
+                      'default_sess_name': None}
+
+    await db.user_update(id=TEST_USER_ID, default_sess_name='Direct session')
+    member = await db.get_member(TEST_USER_ID)
+    assert member['default_sess_name'] == 'Direct session'
+
+
+@pytest.mark.asyncio
+async def test_users_create():
+    users = [{'id': TEST_USER_ID, 'name': 'Direct USER'},
+             {'id': TEST_USER_ID + 100, 'name': 'Direct USER 2'}]
+
+    assert await db.users_create(users) == {'created': 1}
+    assert (await db.get_member(TEST_USER_ID + 100))['name'] == 'Direct USER 2'
+
+
+@pytest.mark.asyncio
+async def test_sync_validators():
+    url = 'https://discord.test/direct'
+    assert await db.get_sync_validators(url) is None
+
+    validators = {'url': url, 'etag': '"v1"', 'last_modified': None}
+    await db.sync_validators_upsert(validators)
+    assert await db.get_sync_validators(url) == validators
+
+
+@pytest.mark.asyncio
+async def test_missing_rows_are_none():
+    assert await db.get_member(-1) is None
+    assert await db.get_session(-1) is None
+    with pytest.raises(ValueError):
+        await db.session_add_member(-1, TEST_USER_ID)
+
+
+@pytest.mark.asyncio
+async def test_session_lifecycle():
+    begin = datetime.datetime(2001, 1, 1, 1)
+    sess = await db.session_update(
+        name='Direct',
+        creator_id=TEST_USER_ID,
+        leader_id=TEST_USER_ID,
+        channel_id=TEST_CHANNEL_ID,
+        begin=begin,
+        message_id=TEST_CHANNEL_ID,
+    )
+    assert sess['channel_id'] == TEST_CHANNEL_ID
+    assert sess['begin'] == begin
+
+    unclosed = await db.get_user_session(TEST_USER_ID)
+    assert unclosed['channel_id'] == TEST_CHANNEL_ID
+
+    member = await db.session_add_member(TEST_CHANNEL_ID, TEST_USER_ID)
+    assert member['id'] == TEST_USER_ID
+    members = await db.get_session_members(TEST_CHANNEL_ID)
+    assert [m['id'] for m in members] == [TEST_USER_ID]
+
+    detail = await db.get_session_detail(TEST_CHANNEL_ID)
+    assert detail['leader']['id'] == TEST_USER_ID
+    assert [m['id'] for m in detail['members']] == [TEST_USER_ID]
+
+    leadership = await db.get_session_leadership(TEST_CHANNEL_ID)
+    assert [row['member_id'] for row in leadership] == [TEST_USER_ID]
+
+    sess = await db.session_update(channel_id=TEST_CHANNEL_ID, name='Renamed')
+    assert sess['name'] == 'Renamed'
@@ -0,0 +1,86 @@
+import asyncio
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+from discord import Embed, HTTPException
+
+from src.bot.cogs.logger.logger import EmbedEditor
+from src.bot.messages import MessageCache
+from src.bot.tasks import TaskSupervisor
+from src.config import TaskSettings
+
+
+class FakeMessage:
+    def __init__(self, channel: 'FakeChannel', embed: Embed):
+        self.id = 1
+        self.channel = channel
+        self.embeds = [embed]
+
+    async def edit(self, embed: Embed) -> 'FakeMessage':
+        if self.channel.failures:
+            self.channel.failures -= 1
+            response = SimpleNamespace(status=500, reason='Server Error')
+            raise HTTPException(response, 'edit failed')
+        self.channel.edits.append(embed.title)
+        return FakeMessage(self.channel, embed)
+
+
+class FakeChannel:
+    def __init__(self, failures: int = 0):
+        self.fetches = 0
+        self.edits = []
+        self.failures = failures
+
+    async def fetch_message(self, _) -> FakeMessage:
+        self.fetches += 1
+        return FakeMessage(self, Embed(title='initial'))
+
+
+def titled(title: str):
+    def change(embed: Embed) -> None:
+        embed.title = title
+    return change
+
+
+@pytest.mark.asyncio
+async def test_changes_are_coalesced():
+    channel = FakeChannel()
+    messages = MessageCache()
+    editor = EmbedEditor(messages, window=0.01, interval=0.05)
+
+    for n in range(15):
+        editor.edit(channel, 1, titled(f'join {n}'))
+    await asyncio.sleep(0.03)
+    assert channel.edits == ['join 14']
+
+    editor.edit(channel, 1, titled('leader'))
+    editor.edit(channel, 1, lambda _: Embed(title='over'), final=True)
+    editor.edit(channel, 1, titled('late'))  # ignored after final one
+    await asyncio.sleep(0.02)
+    assert channel.edits == ['join 14']  # interval not passed yet
+
+    await asyncio.sleep(0.05)
+    assert channel.edits == ['join 14', 'over']
+    assert channel.fetches == 1
+    assert 1 not in messages  # forgotten after final edit
+
+
+@pytest.mark.asyncio
+async def test_failed_edit_is_retried():
+    channel = FakeChannel(failures=2)
+    messages = MessageCache()
+    supervisor = TaskSupervisor({'rest': TaskSettings(limit=1)})
+    editor = EmbedEditor(messages, window=0.01, interval=0.02,
+                         spawn=partial(supervisor.spawn, 'rest'))
+
+    editor.edit(channel, 1, titled('join'))
+    editor.edit(channel, 1, lambda _: Embed(title='over'), final=True)
+    await asyncio.sleep(0.02)
+    assert channel.edits == []
+    assert supervisor.stats()['rest']['running'] == 1
+
+    await supervisor.close()
+    assert channel.edits == ['over']
+    assert 1 not in messages
+    assert supervisor.stats()['rest']['done'] == 1
@@ -0,0 +1,149 @@
+import asyncio
+from functools import partial
+from io import BytesIO
+
+import pytest
+from httpx import AsyncClient, MockTransport, Request, Response
+from PIL import Image
+
+from src.bot.icons import (IconCache, palette_dominant_color, process_icon,
+                           process_icons)
+from src.bot.tasks import TaskSupervisor
+from src.config import TaskSettings
+
+URL = 'https://cdn.test/app-icons/1/icon.png'
+
+
+def png(size: int = 512, color: tuple = (200, 30, 30)) -> bytes:
+    buffer = BytesIO()
+    Image.new('RGBA', (size, size), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_process_icon():
+    icon = process_icon(png(), size=128)
+    with Image.open(BytesIO(icon.image)) as img:
+        assert img.size == (128, 128)
+    assert icon.color == (200, 30, 30)
+
+
+def test_process_icon_skips_dark_colors():
+    assert process_icon(png(color=(0, 0, 0))).color is None
+
+
+def test_process_icons_skips_unreadable_data():
+    icons = process_icons([png(), b'not an image', png(color=(0, 90, 0))])
+    assert [icon and icon.color for icon in icons] == [(200, 30, 30), None,
+                                                       (0, 90, 0)]
+
+
+def test_process_icons_skips_broken_images(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1_000)
+    truncated = png(size=16)[:-30]
+    bomb = png(size=64)
+
+    icons = process_icons([truncated, bomb, png(size=16)])
+    assert [icon and icon.color for icon in icons] == [None, None,
+                                                       (200, 30, 30)]
+
+
+def test_process_icons_without_numpy(monkeypatch):
+    monkeypatch.setattr('src.bot.icons.np', None)
+    assert process_icons([png()])[0].color == (200, 30, 30)
+
+
+def test_dominant_colors():
+    np = pytest.importorskip('numpy')
+    from src.bot.icons import dominant_colors
+
+    rng = np.random.default_rng(1)
+    pixels = np.zeros((64, 64, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    pixels[:40] = (30, 90, 200, 255)
+    pixels[40:52] = (240, 200, 10, 255)  # smaller cluster
+    pixels[:40, :32, :3] += rng.integers(0, 6, (40, 32, 3), dtype=np.uint8)
+    noisy = Image.fromarray(pixels)
+    transparent = Image.new('RGBA', (16, 16), (200, 30, 30, 0))
+
+    colors = dominant_colors([noisy, transparent, noisy.convert('RGB')])
+    assert colors[1] is None
+    assert colors[0] == colors[2]
+    assert all(abs(c - e) <= 3 for c, e in zip(colors[0], (30, 90, 200)))
+
+    expected = palette_dominant_color(noisy)
+    assert all(abs(c - e) <= 8 for c, e in zip(colors[0], expected))
+
+
+@pytest.mark.asyncio
+async def test_icon_cache(tmp_path):
+    requests = []
+
+    async def handler(request: Request) -> Response:
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        return Response(200, content=png())
+
+    async with AsyncClient(transport=MockTransport(handler)) as client:
+        icons = IconCache(str(tmp_path), client=client)
+        first, second = await asyncio.gather(icons.get(1, URL),
+                                             icons.get(1, URL))
+        assert first is second and len(requests) == 1
+
+        # another process finds the icon on disk
+        icon = await IconCache(str(tmp_path), client=client).get(1, URL)
+        assert icon == first and len(requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_icon_cache_batches_misses(tmp_path):
+    batches = []
+
+    class Spy(IconCache):
+        def _process(self, app_ids, raws):
+            batches.append(list(app_ids))
+            return super()._process(app_ids, raws)
+
+    async def handler(request: Request) -> Response:
+        await asyncio.sleep(0.01)
+        return Response(200, content=png())
+
+    async with AsyncClient(transport=MockTransport(handler)) as client:
+        icons = Spy(str(tmp_path), client=client)
+        results = await asyncio.gather(*(icons.get(app_id, URL)
+                                         for app_id in range(5)))
+
+    assert all(icon.color == (200, 30, 30) for icon in results)
+    assert sorted(sum(batches, [])) == list(range(5))
+    assert len(batches) < 5
+
+
+@pytest.mark.asyncio
+async def test_icon_cache_missing_icon(tmp_path):
+    transport = MockTransport(lambda request: Response(404))
+
+    async with AsyncClient(transport=transport) as client:
+        icons = IconCache(str(tmp_path), client=client)
+        assert await icons.get(1, URL) is None
+        assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_icon_cache_dropped_work(tmp_path):
+    requests = []
+
+    async def handler(request: Request) -> Response:
+        requests.append(request)
+        return Response(200, content=png())
+
+    async with AsyncClient(transport=MockTransport(handler)) as client:
+        icons = IconCache(str(tmp_path), client=client,
+                          spawn=lambda coro: coro.close())
+        assert await icons.get(1, URL) is None
+        assert requests == []
+
+        supervisor = TaskSupervisor({'rest': TaskSettings(limit=1)})
+        icons = IconCache(str(tmp_path), client=client,
+                          spawn=partial(supervisor.spawn, 'rest'))
+        assert (await icons.get(1, URL)).color == (200, 30, 30)
+        await supervisor.close()
+        assert supervisor.stats()['rest']['done'] == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from src.bot.messages import MessageCache
+
+
+class FakeMessage:
+    def __init__(self, id_: int):
+        self.id = id_
+
+
+class FakeChannel:
+    def __init__(self):
+        self.fetches = 0
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        self.fetches += 1
+        return FakeMessage(message_id)
+
+
+@pytest.mark.asyncio
+async def test_message_cache():
+    channel, messages = FakeChannel(), MessageCache(maxsize=2)
+
+    first = await messages.get(channel, 1)
+    assert await messages.get(channel, 1) is first
+    assert channel.fetches == 1
+
+    edited = messages.remember(FakeMessage(1))  # returned by edit
+    assert await messages.get(channel, 1) is edited
+
+    messages.forget(1)  # deleted or session is over
+    await messages.get(channel, 1)
+    await messages.get(channel, 2)
+    await messages.get(channel, 3)  # least recent one is evicted
+    assert 1 not in messages and len(messages) == 2
+    assert channel.fetches == 4
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.bot.cogs.commands import Commands
+from src.bot.mixins import BaseCogMixin
+from src.bot.sessions import SessionRegistry
+
+
+def test_events_keep_registry_current():
+    registry = SessionRegistry()
+    registry.reset([
+        {'channel_id': 2, 'leader_id': 10, 'name': 'newer'},
+        {'channel_id': 1, 'leader_id': 10, 'name': 'older'},
+    ])
+    assert registry.loaded and len(registry) == 2
+    assert registry.by_leader(10)['channel_id'] == 2
+
+    registry.begin(3, 20, name='third')
+    assert registry.by_channel(3)['name'] == 'third'
+
+    registry.change_leader(3, 30)
+    assert registry.by_leader(20) is None
+    assert registry.by_leader(30)['channel_id'] == 3
+
+    registry.rename(3, 'renamed')
+    assert registry.by_leader(30)['name'] == 'renamed'
+
+    registry.over(3)
+    assert registry.by_leader(30) is None
+    assert registry.by_channel(3) is None
+
+
+def test_reset_keeps_changes_newer_than_snapshot():
+    registry = SessionRegistry()
+    registry.reset([{'channel_id': 1, 'leader_id': 10}])
+
+    since = registry.version
+    registry.begin(2, 20)  # not in database snapshot yet
+    registry.over(1)  # still unclosed in database snapshot
+    registry.reset([{'channel_id': 1, 'leader_id': 10}], since)
+
+    assert registry.by_channel(1) is None
+    assert registry.by_leader(20)['channel_id'] == 2
+
+    registry.reset([])  # database caught up and has no sessions
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_renamed_session_is_registered(monkeypatch):
+    class FakeDB:
+        async def session_update(self, **session) -> dict:
+            return {'channel_id': 1, 'leader_id': 10, 'message_id': 5,
+                    **session}
+
+        async def user_update(self, **user) -> None:
+            pass
+
+    registry = SessionRegistry()
+    registry.reset([{'channel_id': 1, 'leader_id': 10, 'name': 'old'}])
+    monkeypatch.setattr(BaseCogMixin, 'sessions', registry)
+    monkeypatch.setattr(BaseCogMixin, 'db', FakeDB())
+
+    cog = Commands(SimpleNamespace(guild_channels={}))
+    channel = SimpleNamespace(id=1, guild=SimpleNamespace(id=100))
+    await cog.update_sess_name(channel, 'new')
+
+    assert (await cog.get_user_session(10))['name'] == 'new'
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from src.bot.tasks import TaskSupervisor
+from src.config import TaskSettings
+
+
+def build(limit: int = 1, queue_size: int = 2, overflow: str = 'drop'):
+    return TaskSupervisor({'db': TaskSettings(limit=limit,
+                                              queue_size=queue_size,
+                                              overflow=overflow)})
+
+
+async def job(log: list, name: str, gate: asyncio.Event = None):
+    if gate is not None:
+        await gate.wait()
+    log.append(name)
+
+
+@pytest.mark.asyncio
+async def test_limit_runs_tasks_one_by_one():
+    supervisor, log, gate = build(), [], asyncio.Event()
+    supervisor.spawn('db', job(log, 'a', gate))
+    supervisor.spawn('db', job(log, 'b'))
+    await asyncio.sleep(0)
+
+    assert supervisor.stats()['db'] == {
+        'running': 1, 'queued': 1, 'done': 0, 'failed': 0, 'dropped': 0
+    }
+    gate.set()
+    await supervisor.close()
+    assert log == ['a', 'b']
+    assert supervisor.stats()['db']['done'] == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_new_task():
+    supervisor, log, gate = build(), [], asyncio.Event()
+    supervisor.spawn('db', job(log, 'a', gate))
+    await asyncio.sleep(0)
+    for name in 'bcd':
+        supervisor.spawn('db', job(log, name))
+
+    gate.set()
+    await supervisor.close()
+    assert log == ['a', 'b', 'c']
+    assert supervisor.stats()['db']['dropped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest_task():
+    supervisor, log, gate = build(overflow='drop_oldest'), [], asyncio.Event()
+    supervisor.spawn('db', job(log, 'a', gate))
+    await asyncio.sleep(0)
+    for name in 'bcd':
+        supervisor.spawn('db', job(log, name))
+
+    gate.set()
+    await supervisor.close()
+    assert log == ['a', 'c', 'd']
+    assert supervisor.stats()['db']['dropped'] == 1
+
+
+@pytest.mark.asyncio
+async def test_submit_waits_for_room():
+    supervisor, log, gate = build(queue_size=1), [], asyncio.Event()
+    supervisor.spawn('db', job(log, 'a', gate))
+    await asyncio.sleep(0)
+    supervisor.spawn('db', job(log, 'b'))
+
+    submit = asyncio.create_task(supervisor.submit('db', job(log, 'c')))
+    await asyncio.sleep(0.01)
+    assert not submit.done()
+
+    gate.set()
+    await submit
+    await supervisor.close()
+    assert log == ['a', 'b', 'c']
+    assert supervisor.stats()['db']['dropped'] == 0
+
+
+@pytest.mark.asyncio
+async def test_failure_is_counted():
+    async def fail():
+        raise ValueError
+
+    supervisor, log = build(), []
+    supervisor.spawn('db', fail())
+    supervisor.spawn('db', job(log, 'a'))
+    await supervisor.close()
+
+    assert log == ['a']
+    assert supervisor.stats()['db']['failed'] == 1
+    assert supervisor.stats()['db']['done'] == 1
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_tasks_after_timeout():
+    supervisor, log = build(), []
+    supervisor.spawn('db', job(log, 'a', asyncio.Event()))
+    await asyncio.sleep(0)
+    await supervisor.close(timeout=0.01)
+
+    assert supervisor.spawn('db', job(log, 'b')) is None
+    assert log == []
+    assert supervisor.stats()['db']['running'] == 0